@@ -0,0 +1,216 @@
+# app/core/admission.py
+"""
+Admission control: rate limits and load shedding ahead of the routes.
+
+AdmissionMiddleware rejects work before FastAPI parses or validates it:
+
+- Load shedding: when the number of requests in flight reaches a route's
+  shed_at threshold, the request gets 503 straight away. OTP routes shed at
+  a lower threshold than everything else, so an OTP flood is turned away
+  while payments and dashboards still have headroom.
+- Rate limits: token buckets per client IP and, for OTP routes, per phone
+  number (read from the small JSON body, which is then replayed to the
+  route). Over the limit gets 429.
+
+Both carry Retry-After. Limits are "requests/seconds" strings in Settings,
+so each route's limits can be tuned or disabled ("") per deployment.
+"""
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import Counter
+
+ADMISSION_REJECTED = Counter(
+    "http_admission_rejected_total", "Requests rejected by admission control",
+    ("route", "reason")
+)
+
+MAX_PEEK_BODY = 4096  # bodies larger than this skip the per-phone limit
+
+
+def parse_rate(spec: str) -> Optional[tuple]:
+    """'30/60' -> (30, 60.0) i.e. 30 requests per 60 seconds; '' -> None"""
+    if not spec:
+        return None
+    count, seconds = spec.split("/")
+    return int(count), float(seconds)
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by client IP, phone number, ...
+
+    Each key holds two floats. A bucket left idle long enough to refill
+    completely is indistinguishable from a new one, so idle keys are
+    dropped from the front of the LRU order as they go stale; max_keys
+    bounds memory under a flood of distinct keys.
+    """
+
+    def __init__(self, name: str, capacity: int, period: float, max_keys: int):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / period  # tokens per second
+        self.idle_ttl = period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last_seen]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _expire(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, last_seen) = next(iter(buckets.items()))
+            if now - last_seen < self.idle_ttl and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def acquire(self, key: str) -> float:
+        """Take a token; returns 0 if allowed, else seconds until one is free"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.capacity - 1, now]
+            self._expire(now)
+            return 0.0
+
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._buckets.move_to_end(key)
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+
+class RoutePolicy:
+    def __init__(self, name: str, shed_at: int, ip_rate: str = "", phone_rate: str = ""):
+        self.name = name
+        self.shed_at = shed_at
+        self.ip_limiter = self._limiter(f"{name}:ip", ip_rate)
+        self.phone_limiter = self._limiter(f"{name}:phone", phone_rate)
+
+    @staticmethod
+    def _limiter(name: str, spec: str) -> Optional[RateLimiter]:
+        rate = parse_rate(spec)
+        if rate is None:
+            return None
+        return RateLimiter(name, rate[0], rate[1], settings.RATE_LIMIT_MAX_KEYS)
+
+
+DEFAULT_POLICY = RoutePolicy("default", settings.SHED_MAX_IN_FLIGHT)
+
+ROUTE_POLICIES = {
+    "/users/send-otp": RoutePolicy(
+        "send-otp", settings.SHED_OTP_MAX_IN_FLIGHT,
+        settings.RATE_LIMIT_SEND_OTP_IP, settings.RATE_LIMIT_SEND_OTP_PHONE
+    ),
+    "/users/verify-otp": RoutePolicy(
+        "verify-otp", settings.SHED_OTP_MAX_IN_FLIGHT,
+        settings.RATE_LIMIT_VERIFY_OTP_IP, settings.RATE_LIMIT_VERIFY_OTP_PHONE
+    ),
+    "/users/pay-credit": RoutePolicy(
+        "pay-credit", settings.SHED_MAX_IN_FLIGHT, settings.RATE_LIMIT_PAY_CREDIT_IP
+    ),
+}
+
+# Never shed or limited, so probes and scrapes keep working under load
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+
+class AdmissionMiddleware:
+    """Pure ASGI; the fast path is a dict lookup and a comparison"""
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+
+    @staticmethod
+    def _client_ip(scope) -> str:
+        if settings.TRUST_FORWARDED_FOR:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "-"
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_body(receive) -> tuple:
+        """Buffer a small request body; returns (body, messages to replay)"""
+        messages = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body") or len(body) > MAX_PEEK_BODY:
+                break
+        return body, messages
+
+    @staticmethod
+    def _phone(body: bytes) -> Optional[str]:
+        if len(body) > MAX_PEEK_BODY:
+            return None
+        try:
+            phone = json.loads(body).get("phone_number")
+        except (ValueError, AttributeError):
+            return None
+        return phone if isinstance(phone, str) else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        policy = ROUTE_POLICIES.get(scope["path"], DEFAULT_POLICY)
+
+        if self.in_flight >= policy.shed_at:
+            ADMISSION_REJECTED.inc((policy.name, "shed"))
+            return await self._reject(send, 503, "Server busy, please retry", 1)
+
+        if policy.ip_limiter is not None:
+            wait = policy.ip_limiter.acquire(self._client_ip(scope))
+            if wait:
+                ADMISSION_REJECTED.inc((policy.name, "ip_rate"))
+                return await self._reject(send, 429, "Too many requests", wait)
+
+        if policy.phone_limiter is not None:
+            body, messages = await self._read_body(receive)
+            phone = self._phone(body)
+            if phone is not None:
+                wait = policy.phone_limiter.acquire(phone)
+                if wait:
+                    ADMISSION_REJECTED.inc((policy.name, "phone_rate"))
+                    return await self._reject(send, 429, "Too many requests for this number", wait)
+
+            upstream = receive
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                return await upstream()
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -6,13 +6,122 @@ load_dotenv()
 class Settings:
     PROJECT_NAME: str = "Paynaka Backend API"
     ENV: str = os.getenv("ENV", "development")
+    # "eager" warms up before serving; "lazy" serves at once and warms up in
+    # the background (watch /health/ready)
+    STARTUP_MODE: str = os.getenv("STARTUP_MODE", "eager")
 
     # MongoDB
     MONGODB_URL: str = os.getenv("MONGODB_URL")
+    MONGODB_DB: str = os.getenv("MONGODB_DB", "paynaka_db")
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))  # pre-opened on startup
+    MONGODB_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    MONGODB_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGODB_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0"))  # 0 = no timeout
+    MONGODB_COMPRESSORS: str = os.getenv("MONGODB_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+    MONGODB_WRITE_CONCERN: str = os.getenv("MONGODB_WRITE_CONCERN", "")  # e.g. "majority" or "1"
+    MONGODB_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "-1"))  # -1 = any, else >= 90
+
+    # Read preference per read-only endpoint (primary, primaryPreferred,
+    # secondary, secondaryPreferred, nearest)
+    READ_PREFERENCE_CHECK: str = os.getenv("READ_PREFERENCE_CHECK", "secondaryPreferred")
+    READ_PREFERENCE_DASHBOARD: str = os.getenv("READ_PREFERENCE_DASHBOARD", "nearest")
+    READ_PREFERENCE_VENDOR: str = os.getenv("READ_PREFERENCE_VENDOR", "secondaryPreferred")
 
     # JWT Config
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "PAYNAKA_SECRET_2025")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 1 day
 
+    # Auth caches (verified token payloads and user profiles)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+    # ID generation: unique per live process; leased from MongoDB when unset
+    ID_WORKER_ID: str = os.getenv("ID_WORKER_ID", "")
+
+    # Password hashing (bcrypt runs in a bounded thread pool)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+    # Vendor catalog cache
+    VENDOR_CACHE_SIZE: int = int(os.getenv("VENDOR_CACHE_SIZE", "50000"))
+    VENDOR_CACHE_TTL_SECONDS: int = int(os.getenv("VENDOR_CACHE_TTL_SECONDS", "600"))
+    VENDOR_NEGATIVE_CACHE_TTL_SECONDS: int = int(os.getenv("VENDOR_NEGATIVE_CACHE_TTL_SECONDS", "30"))
+    VENDOR_POLL_INTERVAL_SECONDS: int = int(os.getenv("VENDOR_POLL_INTERVAL_SECONDS", "10"))
+
+    # Dashboard ETag version cache
+    DASHBOARD_VERSION_CACHE_SIZE: int = int(os.getenv("DASHBOARD_VERSION_CACHE_SIZE", "100000"))
+    DASHBOARD_VERSION_TTL_SECONDS: int = int(os.getenv("DASHBOARD_VERSION_TTL_SECONDS", "10"))
+
+    # Dashboard push over WebSocket (per process)
+    DASHBOARD_WS_MAX_SUBSCRIBERS: int = int(os.getenv("DASHBOARD_WS_MAX_SUBSCRIBERS", "10000"))
+    DASHBOARD_WS_QUEUE_SIZE: int = int(os.getenv("DASHBOARD_WS_QUEUE_SIZE", "32"))
+
+    # Transaction history
+    HISTORY_MAX_PAGE_SIZE: int = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Vendor customer import (CSV)
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+    IMPORT_MAX_RECORD_CHARS: int = int(os.getenv("IMPORT_MAX_RECORD_CHARS", "8192"))
+
+    # OTP ("memory" is per-process, "mongo" is shared between workers)
+    OTP_STORE: str = os.getenv("OTP_STORE", "memory")
+    OTP_TTL_SECONDS: int = int(os.getenv("OTP_TTL_SECONDS", "300"))
+    OTP_MEMORY_MAX_ENTRIES: int = int(os.getenv("OTP_MEMORY_MAX_ENTRIES", "100000"))
+
+    # Idempotency-Key for pay-credit
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+    IDEMPOTENCY_CACHE_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "600"))
+    # How long an unfinished request holds its key; a few seconds past the
+    # load balancer's 60s request timeout. A retry after that takes it over.
+    IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "65"))
+
+    # Credit limits: default for new relations, and the scoring job's bounds
+    DEFAULT_CREDIT_LIMIT: float = float(os.getenv("DEFAULT_CREDIT_LIMIT", "500"))
+    CREDIT_LIMIT_MIN: float = float(os.getenv("CREDIT_LIMIT_MIN", "100"))
+    CREDIT_LIMIT_MAX: float = float(os.getenv("CREDIT_LIMIT_MAX", "5000"))
+    CREDIT_SCORE_LOOKBACK_DAYS: int = int(os.getenv("CREDIT_SCORE_LOOKBACK_DAYS", "90"))
+    CREDIT_SCORE_MAX_STEP: float = float(os.getenv("CREDIT_SCORE_MAX_STEP", "0.5"))
+
+    # Transaction archival: whole months older than this move to
+    # transactions_archive_YYYYMM, in batches with a pause in between
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+    ARCHIVE_BATCH_PAUSE_MS: int = int(os.getenv("ARCHIVE_BATCH_PAUSE_MS", "50"))
+
+    # Group commit for transaction inserts (off = one insert_one per payment)
+    TRANSACTION_GROUP_COMMIT: bool = os.getenv("TRANSACTION_GROUP_COMMIT", "false").lower() == "true"
+    GROUP_COMMIT_WINDOW_MS: float = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+    GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+    GROUP_COMMIT_MAX_QUEUE: int = int(os.getenv("GROUP_COMMIT_MAX_QUEUE", "5000"))
+
+    # Admission control: load shedding on requests in flight, then token
+    # buckets per client IP / phone number as "requests/seconds" ("" = off)
+    SHED_MAX_IN_FLIGHT: int = int(os.getenv("SHED_MAX_IN_FLIGHT", "512"))
+    SHED_OTP_MAX_IN_FLIGHT: int = int(os.getenv("SHED_OTP_MAX_IN_FLIGHT", "128"))
+    RATE_LIMIT_SEND_OTP_PHONE: str = os.getenv("RATE_LIMIT_SEND_OTP_PHONE", "3/60")
+    RATE_LIMIT_SEND_OTP_IP: str = os.getenv("RATE_LIMIT_SEND_OTP_IP", "30/60")
+    RATE_LIMIT_VERIFY_OTP_PHONE: str = os.getenv("RATE_LIMIT_VERIFY_OTP_PHONE", "10/60")
+    RATE_LIMIT_VERIFY_OTP_IP: str = os.getenv("RATE_LIMIT_VERIFY_OTP_IP", "60/60")
+    RATE_LIMIT_PAY_CREDIT_IP: str = os.getenv("RATE_LIMIT_PAY_CREDIT_IP", "")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    TRUST_FORWARDED_FOR: bool = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+    # Per-request profiling: requests carrying an X-Profile header signed
+    # with PROFILE_SECRET, plus a PROFILE_SAMPLE_RATE fraction of all
+    # requests. Off (middleware not installed) when both are unset.
+    PROFILE_SECRET: str = os.getenv("PROFILE_SECRET", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_BUFFER_SIZE: int = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_MAX_COMMANDS: int = int(os.getenv("PROFILE_MAX_COMMANDS", "500"))
+
 settings = Settings()
@@ -1,6 +1,174 @@
 # app/core/database.py
+import asyncio
+import base64
+import binascii
+import logging
+from collections.abc import Mapping
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import bson
+from bson.errors import BSONError
+from bson.timestamp import Timestamp
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
 from app.core.config import settings
+from app.core.metrics import mongo_command_metrics, mongo_pool_metrics
 
-client = AsyncIOMotorClient(settings.MONGODB_URL)
-db = client["paynaka_db"]
+logger = logging.getLogger(__name__)
+
+client: Optional[AsyncIOMotorClient] = None
+
+# Read-only endpoints and where their reads go. Anything not listed reads
+# from the primary. A secondary can lag; endpoints that must see a client's
+# own write take a consistency token (see causal_session).
+READ_PREFERENCES = {
+    "check": settings.READ_PREFERENCE_CHECK,
+    "dashboard": settings.READ_PREFERENCE_DASHBOARD,
+    "vendor": settings.READ_PREFERENCE_VENDOR,
+}
+_readers = {}
+
+
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS or None,
+        "appname": settings.PROJECT_NAME,
+        "event_listeners": [mongo_command_metrics, mongo_pool_metrics],
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    if settings.MONGODB_WRITE_CONCERN:
+        w = settings.MONGODB_WRITE_CONCERN
+        options["w"] = int(w) if w.isdigit() else w
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The shared client; created on first use if the lifespan has not run"""
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(settings.MONGODB_URL, **_client_options())
+    return client
+
+
+def get_database():
+    return get_client()[settings.MONGODB_DB]
+
+
+class _Database:
+    """
+    Stand-in for the Motor database that resolves against the current
+    client on every access, so modules can `from app.core.database import db`
+    at import time while the client itself is owned by the app lifespan.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+
+db = _Database()
+
+
+def _read_preference(mode: str):
+    max_staleness = settings.MONGODB_MAX_STALENESS_SECONDS
+    if mode == "primary":
+        max_staleness = -1  # not allowed with primary
+    return make_read_preference(read_pref_mode_from_name(mode), None, max_staleness)
+
+
+def read_db(endpoint: str):
+    """Database handle whose reads follow the endpoint's read preference"""
+    reader = _readers.get(endpoint)
+    if reader is None:
+        mode = READ_PREFERENCES.get(endpoint) or "primary"
+        reader = _readers[endpoint] = get_database().with_options(
+            read_preference=_read_preference(mode)
+        )
+    return reader
+
+
+# ============ CAUSAL CONSISTENCY ============
+
+def encode_consistency_token(session) -> Optional[str]:
+    """
+    Opaque token for the client to send back on its next read, or None when
+    the server reports no operation time (standalone mongod).
+    """
+    if session is None or session.operation_time is None:
+        return None
+    raw = bson.encode({"op": session.operation_time, "ct": session.cluster_time})
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_consistency_token(token: str) -> Optional[dict]:
+    """The token's state, or None unless it has the shape encode produced"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = bson.decode(base64.urlsafe_b64decode(padded))
+    except (ValueError, binascii.Error, BSONError):
+        return None
+    if not isinstance(state.get("op"), Timestamp):
+        return None
+    cluster_time = state.get("ct")
+    if cluster_time is not None and not (
+        isinstance(cluster_time, Mapping) and "clusterTime" in cluster_time
+    ):
+        return None
+    return state
+
+
+@asynccontextmanager
+async def causal_session(token: Optional[str] = None) -> AsyncIterator:
+    """
+    Causally consistent session. Writes made in it can be turned into a
+    token with encode_consistency_token; reads made in a session opened
+    with that token wait until the chosen member has caught up with it.
+    """
+    async with await get_client().start_session(causal_consistency=True) as session:
+        state = decode_consistency_token(token) if token else None
+        if state:
+            if state.get("ct"):
+                session.advance_cluster_time(state["ct"])
+            session.advance_operation_time(state["op"])
+        yield session
+
+
+async def connect_to_mongo() -> int:
+    """
+    Create the client and pre-open MONGODB_MIN_POOL_SIZE connections.
+    Returns how many warm-up pings succeeded.
+    """
+    mongo = get_client()
+    # Concurrent pings each need their own connection, which fills the pool
+    # now instead of on the first burst of real traffic.
+    warm = max(settings.MONGODB_MIN_POOL_SIZE, 1)
+    results = await asyncio.gather(
+        *(mongo.admin.command("ping") for _ in range(warm)),
+        return_exceptions=True
+    )
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        logger.warning("MongoDB warm-up: %d of %d pings failed: %s", len(failures), warm, failures[0])
+    return warm - len(failures)
+
+
+def close_mongo_connection() -> None:
+    global client
+    if client is not None:
+        client.close()
+        client = None
+        _readers.clear()
+
+
+def pool_stats() -> dict:
+    """Open, checked-out and waiting connections per server"""
+    return mongo_pool_metrics.stats()
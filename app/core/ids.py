@@ -0,0 +1,190 @@
+# app/core/ids.py
+"""
+Collision-free, time-sortable IDs without a database round trip.
+
+Layout (Snowflake style, 63 bits):
+
+    41 bits  milliseconds since ID_EPOCH   (~69 years)
+    10 bits  worker id                     (1024 concurrent processes)
+    12 bits  per-millisecond sequence      (4096 ids/ms per process)
+
+IDs are rendered as 13 Crockford base32 characters, so string order equals
+numeric order equals creation order.
+
+Each process needs a worker id no other live process holds. Set
+ID_WORKER_ID explicitly, or let start_worker_lease() claim one from the
+id_worker_leases collection at startup. A lease is renewed in the
+background and expires if the process dies, freeing the id. If the lease
+is lost, or cannot be renewed before it would expire, the generator has
+no worker id and next_id() raises until a new lease is claimed; it never
+keeps issuing ids under a worker id another process may now hold.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.config import settings
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+ID_EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+LEASE_SECONDS = 600
+LEASE_RENEW_SECONDS = 60
+LEASE_RETRY_SECONDS = 5
+
+
+def encode_base32(value: int, width: int = 13) -> str:
+    chars = []
+    for _ in range(width):
+        chars.append(CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class IdsUnavailable(RuntimeError):
+    """No worker id is held, so no ids can be issued"""
+
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id: Optional[int] = None):
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        # Read once: the lease task may clear it at any time
+        worker_id = self.worker_id
+        if worker_id is None:
+            raise IdsUnavailable("ID generator has no worker id; set ID_WORKER_ID or start a lease")
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back: keep counting
+                # from the last timestamp so IDs stay monotonic.
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (
+                ((self._last_ms - ID_EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS))
+                | (worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def next_str(self) -> str:
+        return encode_base32(self.next_id())
+
+    @property
+    def available(self) -> bool:
+        return self.worker_id is not None
+
+
+def configured_worker_id() -> Optional[int]:
+    """ID_WORKER_ID, if set; anything outside 0..MAX_WORKER_ID is refused"""
+    if not settings.ID_WORKER_ID:
+        return None
+    worker_id = int(settings.ID_WORKER_ID)
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        # It would spill into the timestamp bits and collide with other workers
+        raise ValueError(f"ID_WORKER_ID must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+    return worker_id
+
+
+id_generator = SnowflakeGenerator(configured_worker_id())
+
+
+def new_customer_id() -> str:
+    return f"CUST_{id_generator.next_str()}"
+
+
+# ============ WORKER LEASES ============
+
+_lease_owner = f"{socket.gethostname()}:{os.getpid()}:{random.getrandbits(32):08x}"
+_lease_task: Optional[asyncio.Task] = None
+
+
+async def _claim_worker_id() -> int:
+    candidates = list(range(MAX_WORKER_ID + 1))
+    random.shuffle(candidates)
+    for worker_id in candidates:
+        now = datetime.utcnow()
+        lease = {"owner": _lease_owner, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}
+        try:
+            await db.id_worker_leases.insert_one({"_id": worker_id, **lease})
+            return worker_id
+        except DuplicateKeyError:
+            # Taken; reuse it only if the holder let it expire
+            result = await db.id_worker_leases.update_one(
+                {"_id": worker_id, "expires_at": {"$lt": now}},
+                {"$set": lease}
+            )
+            if result.modified_count:
+                return worker_id
+    raise RuntimeError("No free ID worker ids")
+
+
+async def _renew_lease() -> None:
+    renewed_at = time.monotonic()
+    while True:
+        await asyncio.sleep(LEASE_RENEW_SECONDS if id_generator.worker_id is not None else LEASE_RETRY_SECONDS)
+        try:
+            if id_generator.worker_id is not None:
+                result = await db.id_worker_leases.update_one(
+                    {"_id": id_generator.worker_id, "owner": _lease_owner},
+                    {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+                )
+                if not result.matched_count:
+                    logger.warning("ID worker lease %s lost, claiming a new one", id_generator.worker_id)
+                    # Another process may hold it now: stop issuing ids first
+                    id_generator.worker_id = None
+            if id_generator.worker_id is None:
+                id_generator.worker_id = await _claim_worker_id()
+                logger.info("Claimed ID worker id %s", id_generator.worker_id)
+            renewed_at = time.monotonic()
+        except (PyMongoError, RuntimeError) as e:
+            # RuntimeError: every worker id is taken; keep retrying
+            logger.warning("Could not renew ID worker lease: %s", e)
+            if (id_generator.worker_id is not None
+                    and time.monotonic() - renewed_at > LEASE_SECONDS - LEASE_RENEW_SECONDS):
+                logger.error("ID worker lease %s may have expired, issuing no ids until renewed",
+                             id_generator.worker_id)
+                id_generator.worker_id = None
+
+
+async def start_worker_lease() -> None:
+    """Claim a worker id unless one is configured, and keep it renewed"""
+    global _lease_task
+    if id_generator.worker_id is not None:
+        return
+    id_generator.worker_id = await _claim_worker_id()
+    _lease_task = asyncio.create_task(_renew_lease())
+    logger.info("Claimed ID worker id %s", id_generator.worker_id)
+
+
+async def stop_worker_lease() -> None:
+    global _lease_task
+    if _lease_task is None:
+        return
+    _lease_task.cancel()
+    _lease_task = None
+    try:
+        await db.id_worker_leases.delete_one({"_id": id_generator.worker_id, "owner": _lease_owner})
+    except PyMongoError:
+        pass
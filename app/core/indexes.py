@@ -0,0 +1,160 @@
+# app/core/indexes.py
+"""
+Declarative index registry.
+
+Every index the app relies on is listed in INDEXES and applied at startup by
+ensure_indexes(). create_index is a no-op when an identical index already
+exists, so applying the registry on every boot is safe.
+
+QUERY_SHAPES lists the filters used on hot paths. check_query_plans() runs
+explain() on each of them and reports any that would scan the collection:
+
+    python -m app.core.indexes --check
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "customer_vendor_relations": [
+        # /users/check, /users/register
+        IndexModel(
+            [("customer_phone", ASCENDING), ("vendor_id", ASCENDING)],
+            name="customer_phone_vendor_unique",
+            unique=True,
+        ),
+        # /users/dashboard, /users/pay-credit
+        IndexModel(
+            [("customer_id", ASCENDING), ("vendor_id", ASCENDING)],
+            name="customer_id_vendor",
+        ),
+    ],
+    "users": [
+        # UserService.register_user / login_user
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "vendors": [
+        # VendorService polling fallback when change streams are unavailable
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "transactions": [
+        # /transactions/history for one customer (keyset on created_at, _id)
+        IndexModel(
+            [("vendor_id", ASCENDING), ("customer_id", ASCENDING),
+             ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="vendor_customer_created_at",
+        ),
+        # /transactions/history for a whole vendor and /transactions/export
+        IndexModel(
+            [("vendor_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="vendor_created_at",
+        ),
+        # Resumed /users/pay-credit/batch; only batch rows carry batch_id
+        IndexModel(
+            [("batch_id", ASCENDING)],
+            name="batch_id",
+            partialFilterExpression={"batch_id": {"$exists": True}},
+        ),
+    ],
+    "vendor_daily_stats": [
+        # LedgerStatsService.reconcile
+        IndexModel([("vendor_id", ASCENDING), ("day", ASCENDING)], name="vendor_day"),
+    ],
+    "id_worker_leases": [
+        # Leases of processes that died without releasing them
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        # Stored pay-credit responses are replayable for IDEMPOTENCY_TTL_SECONDS
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=settings.IDEMPOTENCY_TTL_SECONDS
+        ),
+    ],
+    "otp_codes": [
+        # MongoOTPStore; documents are removed once expires_at passes
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# (collection, example filter) for every query that must be index-backed
+QUERY_SHAPES = [
+    ("customer_vendor_relations", {"customer_phone": "9999999999", "vendor_id": "V001"}),
+    ("customer_vendor_relations", {"customer_id": "CUST_0", "vendor_id": "V001"}),
+    ("customer_vendor_relations", {
+        "customer_id": "CUST_0", "vendor_id": "V001", "available_credit": {"$gte": 1.0}
+    }),
+    ("users", {"email": "someone@example.com"}),
+    ("transactions", {"vendor_id": "V001", "customer_id": "CUST_0"}),
+    ("transactions", {"vendor_id": "V001"}),
+    ("transactions", {"batch_id": ObjectId("000000000000000000000000")}),
+    ("vendors", {"updated_at": {"$gt": datetime(2025, 1, 1)}}),
+]
+
+
+async def ensure_indexes(database) -> None:
+    """Create every registered index that does not exist yet"""
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await database[collection].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. existing duplicates blocking a unique index; keep booting
+                logger.error(
+                    "Could not create index %s on %s: %s",
+                    model.document["name"], collection, e
+                )
+
+
+def _plan_stages(plan) -> list:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_plans(database) -> list:
+    """
+    Explain every registered query shape.
+    Returns (collection, filter) pairs whose winning plan is a COLLSCAN.
+    """
+    offenders = []
+    for collection, query in QUERY_SHAPES:
+        explain = await database[collection].find(query).explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            offenders.append((collection, query))
+    return offenders
+
+
+async def _main(check: bool) -> int:
+    from app.core.database import db
+
+    await ensure_indexes(db)
+    if not check:
+        return 0
+
+    offenders = await check_query_plans(db)
+    for collection, query in offenders:
+        print(f"COLLSCAN: {collection} {query}")
+    print(f"{len(QUERY_SHAPES) - len(offenders)}/{len(QUERY_SHAPES)} query shapes index-backed")
+    return 1 if offenders else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--check" in sys.argv)))
@@ -0,0 +1,336 @@
+# app/core/metrics.py
+"""
+Minimal Prometheus-format metrics.
+
+- MetricsMiddleware times every HTTP request and tracks requests in flight.
+- instrument_routes() wraps each route's ASGI app to track in-flight
+  requests per route template.
+- MongoCommandMetrics is a pymongo CommandListener timing every command
+  per collection; MongoPoolMetrics tracks pool occupancy and checkout waits.
+  While command_trace is set (see app.core.profiling), commands are also
+  appended to that list; Motor runs the driver in a copy of the caller's
+  context, so they are attributed to the request that issued them.
+
+render() produces the text exposition format served at /metrics.
+Recording a sample is a bisect plus a couple of additions under a lock, so
+the middleware is cheap enough to leave on in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from pymongo import monitoring
+from app.core.cache import cache_stats
+from app.core.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+# ============ HTTP ============
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+ROUTE_IN_FLIGHT = Gauge("http_route_requests_in_flight", "HTTP requests being served per route", ("route",))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; avoids the per-request overhead of BaseHTTPMiddleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                (scope["method"], route.path if route else "unmatched", status)
+            )
+
+
+def _track_route(route_app, path: str):
+    labels = (path,)
+
+    async def app(scope, receive, send):
+        ROUTE_IN_FLIGHT.inc(labels)
+        try:
+            await route_app(scope, receive, send)
+        finally:
+            ROUTE_IN_FLIGHT.dec(labels)
+
+    return app
+
+
+def instrument_routes(app) -> None:
+    """Wrap every registered route; call after all routers are included"""
+    for route in app.routes:
+        if hasattr(route, "app") and hasattr(route, "path"):
+            route.app = _track_route(route.app, route.path)
+
+
+# ============ MONGO ============
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    ("collection", "command")
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands",
+    ("collection", "command")
+)
+
+
+# Commands of the request being profiled, if any
+command_trace: ContextVar[Optional[list]] = ContextVar("command_trace", default=None)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Runs on the driver's threads; only touches thread-safe metrics"""
+
+    def __init__(self):
+        self._collections = {}  # (connection_id, request_id) -> collection
+        self._traced = {}       # (connection_id, request_id) -> command_trace entry
+
+    @staticmethod
+    def _collection(event) -> str:
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        # getMore carries the cursor id; the collection is a separate field
+        return event.command.get("collection", "-")
+
+    def started(self, event):
+        key = (event.connection_id, event.request_id)
+        collection = self._collections[key] = self._collection(event)
+        trace = command_trace.get()
+        if trace is not None and len(trace) < settings.PROFILE_MAX_COMMANDS:
+            entry = {"command": event.command_name, "collection": collection,
+                     "started_at": time.perf_counter(), "duration_ms": None, "ok": None}
+            trace.append(entry)
+            self._traced[key] = entry
+
+    def _finish_trace(self, key, event, ok: bool) -> None:
+        entry = self._traced.pop(key, None)
+        if entry is not None:
+            entry["duration_ms"] = event.duration_micros / 1000
+            entry["ok"] = ok
+
+    def succeeded(self, event):
+        key = (event.connection_id, event.request_id)
+        collection = self._collections.pop(key, "-")
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, (collection, event.command_name))
+        if self._traced:
+            self._finish_trace(key, event, True)
+
+    def failed(self, event):
+        key = (event.connection_id, event.request_id)
+        collection = self._collections.pop(key, "-")
+        labels = (collection, event.command_name)
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, labels)
+        MONGO_COMMAND_FAILURES.inc(labels)
+        if self._traced:
+            self._finish_trace(key, event, False)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    ("address",)
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed or timed out",
+    ("address", "reason")
+)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool occupancy and wait queue, per server address"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {"open": 0, "checked_out": 0, "waiting": 0}
+        return pool
+
+    def _update(self, address, **deltas) -> None:
+        with self._lock:
+            pool = self._pool(address)
+            for field, delta in deltas.items():
+                pool[field] += delta
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1)
+        MONGO_POOL_CHECKOUT_FAILURES.inc((f"{event.address[0]}:{event.address[1]}", event.reason))
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, checked_out=1)
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(duration, (f"{event.address[0]}:{event.address[1]}",))
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {address: dict(pool) for address, pool in self._pools.items()}
+
+
+mongo_pool_metrics = MongoPoolMetrics()
+
+
+# ============ EXPOSITION ============
+
+def _render_caches() -> list:
+    lines = []
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        name = f"cache_{field}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache, stats in cache_stats().items():
+            lines.append(f'{name}{{cache="{cache}"}} {stats[field]}')
+    return lines
+
+
+def _render_pools() -> list:
+    lines = ["# TYPE mongo_pool_connections gauge"]
+    for address, pool in mongo_pool_metrics.stats().items():
+        for state, value in pool.items():
+            lines.append(f'mongo_pool_connections{{address="{address}",state="{state}"}} {value}')
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    lines.extend(_render_pools())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+# app/core/profiling.py
+"""
+Opt-in profiling of single requests.
+
+A request is profiled when it carries a valid X-Profile header, or when it
+falls in the PROFILE_SAMPLE_RATE random sample. The header value is
+"<expires>.<signature>", where signature is the hex HMAC-SHA256 of
+<expires> (unix seconds) under PROFILE_SECRET. Mint one with:
+
+    python -m app.core.profiling [ttl_seconds]
+
+For a profiled request this records:
+
+- CPU samples: a background thread samples the event loop thread's stack
+  every PROFILE_INTERVAL_MS. A sample counts only when this request's
+  middleware frame is on the stack, so other requests interleaved on the
+  same loop are excluded. Time spent awaiting I/O is not sampled.
+- Mongo commands issued by the request, with durations (see
+  MongoCommandMetrics and command_trace). Writes handed to the group-commit
+  task run outside the request and are not included.
+
+The last PROFILE_BUFFER_SIZE profiles are kept in memory. The response
+carries X-Profile-Id, and /health/profiles/{id}/folded returns the samples
+as folded stacks, which flamegraph.pl and speedscope read directly.
+
+When neither PROFILE_SECRET nor PROFILE_SAMPLE_RATE is set the middleware
+is not installed at all; the only remaining cost is one ContextVar lookup
+per Mongo command.
+"""
+import hashlib
+import hmac
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import Counter as Tally, deque
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import Counter, command_trace
+
+PROFILE_HEADER = b"x-profile"
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+PROFILES_TAKEN = Counter("profiles_taken_total", "Requests profiled", ("trigger",))
+
+
+def enabled() -> bool:
+    return bool(settings.PROFILE_SECRET) or settings.PROFILE_SAMPLE_RATE > 0
+
+
+def _signature(expires: str) -> str:
+    return hmac.new(settings.PROFILE_SECRET.encode(), expires.encode(), hashlib.sha256).hexdigest()
+
+
+def make_token(ttl_seconds: int) -> str:
+    expires = str(int(time.time()) + ttl_seconds)
+    return f"{expires}.{_signature(expires)}"
+
+
+def verify_token(value: Optional[str]) -> bool:
+    if not settings.PROFILE_SECRET or not value:
+        return False
+    expires, _, signature = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(_signature(expires), signature)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Profile:
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str, trigger: str, anchor, thread_id: int):
+        self.id = next(Profile._ids)
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.anchor = anchor        # the middleware frame awaiting this request
+        self.thread_id = thread_id  # the event loop thread
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.samples = 0
+        self.stacks = Tally()
+        self.commands = []
+
+    def record(self, frames: list) -> None:
+        """frames: innermost first, ending just inside the anchor"""
+        self.samples += 1
+        self.stacks[";".join(_frame_name(frame) for frame in reversed(frames))] += 1
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+        self.anchor = None
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "cpu_samples": self.samples,
+            "cpu_ms_estimate": round(self.samples * settings.PROFILE_INTERVAL_MS, 3),
+            "mongo_commands": len(self.commands),
+            "mongo_ms": round(sum(c["duration_ms"] or 0 for c in self.commands), 3),
+        }
+
+    def details(self) -> dict:
+        commands = [
+            {**command, "started_at": round((command["started_at"] - self.start) * 1000, 3)}
+            for command in self.commands
+        ]
+        return {**self.summary(), "commands": commands, "folded": self.folded()}
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """One thread for all requests being profiled; exits when there are none"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active)
+            frames = sys._current_frames()
+            for profile in active:
+                frame = frames.get(profile.thread_id)
+                stack = []
+                while frame is not None and frame is not profile.anchor:
+                    stack.append(frame)
+                    frame = frame.f_back
+                # Only when the anchor is on the stack is this request running
+                if frame is not None and stack:
+                    profile.record(stack)
+            del frames, frame, stack
+            time.sleep(self.interval)
+
+
+profiles = deque(maxlen=settings.PROFILE_BUFFER_SIZE)
+sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+
+
+def get_profile(profile_id: int) -> Optional[Profile]:
+    for profile in profiles:
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; installed only when profiling is enabled()"""
+
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+
+    def _trigger(self, scope) -> Optional[str]:
+        if scope["path"].startswith(EXEMPT_PREFIXES):
+            return None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return "header" if verify_token(value.decode("latin-1")) else None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+        await self._profile(scope, receive, send, trigger)
+
+    async def _profile(self, scope, receive, send, trigger: str) -> None:
+        profile = Profile(
+            scope["method"], scope["path"], trigger, sys._getframe(), threading.get_ident()
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())],
+                }
+            await send(message)
+
+        token = command_trace.set(profile.commands)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.remove(profile)
+            command_trace.reset(token)
+            profile.finish()
+            profiles.append(profile)
+            PROFILES_TAKEN.inc((trigger,))
+
+
+if __name__ == "__main__":
+    if not settings.PROFILE_SECRET:
+        sys.exit("PROFILE_SECRET is not set")
+    ttl = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    print(f"X-Profile: {make_token(ttl)}")
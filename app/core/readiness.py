@@ -0,0 +1,48 @@
+# app/core/readiness.py
+"""
+Startup readiness, reported by /health/ready.
+
+The lifespan marks each warm-up step as it completes. With STARTUP_MODE=lazy
+the steps run in the background after the server starts accepting
+connections, so /health/ping answers at once while /health/ready keeps
+returning 503 until the load balancer can send real traffic.
+"""
+import time
+from typing import Optional
+
+CHECKS = ("mongo_pool", "indexes", "id_worker", "vendor_cache")
+
+
+class Readiness:
+    def __init__(self, checks: tuple):
+        self.checks = checks
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = time.monotonic()
+        self._done = {name: None for name in self.checks}  # seconds after start
+        self.error: Optional[str] = None
+
+    def mark(self, check: str) -> None:
+        self._done[check] = round(time.monotonic() - self.started_at, 3)
+        self.error = None
+
+    def fail(self, error: str) -> None:
+        self.error = error
+
+    @property
+    def ready(self) -> bool:
+        return all(seconds is not None for seconds in self._done.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "checks": {
+                name: {"ready": seconds is not None, "after_seconds": seconds}
+                for name, seconds in self._done.items()
+            },
+            "error": self.error,
+        }
+
+
+readiness = Readiness(CHECKS)
@@ -0,0 +1,36 @@
+# app/core/responses.py
+"""
+Response classes for the hot JSON paths.
+
+FastJSONResponse is the app-wide default: dict payloads are encoded with
+orjson when it is installed, falling back to the standard encoder.
+
+ModelResponse takes an already-built Pydantic model and serializes it in
+one pass in pydantic-core. Returning a Response from a handler makes
+FastAPI skip its response_model re-validation and jsonable_encoder walk,
+so each payload is validated exactly once, when the model is constructed.
+The response_model on the route is still used for the OpenAPI schema.
+"""
+from typing import Any
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return to_json(content)
+        return super().render(content)
@@ -1,17 +1,77 @@
 # app/core/security.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+# passlib/bcrypt and python-jose are imported on first use, so importing
+# the app (and every cold start) does not pay for them.
+_pwd_ctx = None
+
+
+def get_pwd_ctx():
+    global _pwd_ctx
+    if _pwd_ctx is None:
+        from passlib.context import CryptContext
+        _pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_ctx
+
+
+# bcrypt is CPU bound and releases the GIL, so it runs on its own small pool
+# instead of blocking the event loop.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_password_jobs = 0  # running + queued, only touched from the event loop
+
+# Verified payloads keyed by the raw token; entries never outlive "exp"
+token_cache = TTLCache("token", settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+async def _run_password_job(fn, *args):
+    global _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT:
+        raise PasswordHasherBusy()
+
+    _password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_jobs -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_password_job(get_pwd_ctx().hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _run_password_job(get_pwd_ctx().verify, plain, hashed)
+
+
 def create_access_token(data: dict):
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 def verify_token(token: str):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return dict(cached)
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if "exp" in payload:
+        token_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return dict(payload)
@@ -1,16 +1,93 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core.admission import AdmissionMiddleware
+from app.core.config import settings
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.core.ids import start_worker_lease, stop_worker_lease
+from app.core.indexes import ensure_indexes
+from app.core.responses import FastJSONResponse
+from app.core.metrics import MetricsMiddleware, instrument_routes, render as render_metrics
+from app.core import profiling
+from app.core.readiness import readiness
+from app.core.security import PasswordHasherBusy
+from app.services.dashboard_stream import dashboard_hub
+from app.services.otp_service import otp_store
+from app.services.transaction_writer import transaction_writer
+from app.services.vendor_service import VendorService
 from app.routes.health_routes import router as health_router
 from app.routes.user_routes import router as user_router
 from app.routes.vendor_routes import router as vendor_router
 from app.routes.transaction_routes import router as transaction_router
 
+logger = logging.getLogger(__name__)
+
+async def warm_up():
+    """Connection pool, indexes, ID worker lease and vendor cache, in order"""
+    if not await connect_to_mongo():
+        raise ConnectionError("MongoDB did not answer any warm-up ping")
+    readiness.mark("mongo_pool")
+    # Idempotent: existing indexes are left untouched
+    await ensure_indexes(db)
+    readiness.mark("indexes")
+    await start_worker_lease()
+    readiness.mark("id_worker")
+    await VendorService.seed_default_vendors()
+    await VendorService.warm_cache()
+    readiness.mark("vendor_cache")
+
+async def warm_up_in_background():
+    """STARTUP_MODE=lazy: keep trying; every step is safe to repeat"""
+    delay = 1
+    while True:
+        try:
+            await warm_up()
+            logger.info("Warm-up finished; ready for traffic")
+            return
+        except Exception as e:
+            readiness.fail(str(e))
+            logger.warning("Warm-up failed, retrying in %ss: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.reset()
+    warm_task = None
+    if settings.STARTUP_MODE == "lazy":
+        warm_task = asyncio.create_task(warm_up_in_background())
+    else:
+        await warm_up()
+    await otp_store.start()
+    await transaction_writer.start()
+    VendorService.start_watcher()
+    dashboard_hub.start()
+    yield
+    if warm_task is not None:
+        warm_task.cancel()
+    dashboard_hub.stop()
+    VendorService.stop_watcher()
+    # Flush queued transaction inserts while the client is still open
+    await transaction_writer.stop()
+    await otp_store.stop()
+    await stop_worker_lease()
+    close_mongo_connection()
+
 app = FastAPI(
     title="Paynaka Backend API",
     version="1.0.0",
-    description="Backend for Paynaka - Where Trust Becomes Credit"
+    description="Backend for Paynaka - Where Trust Becomes Credit",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Rejects over-limit and shed requests before any route work; inside CORS
+# so preflights are never limited and rejections still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -18,14 +95,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Consistency-Token"],
 )
 
+# Only installed when a secret or sample rate is configured
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Outermost, so the timings include every other middleware
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 # Register routes
 app.include_router(health_router, prefix="/health", tags=["Health"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(vendor_router, prefix="/vendors", tags=["Vendors"])
 app.include_router(transaction_router, prefix="/transactions", tags=["Transactions"])
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {
@@ -34,3 +131,6 @@ def root():
         "status": "operational",
         "docs": "/docs"
     }
+
+# Per-route in-flight gauges; must run after every route is registered
+instrument_routes(app)
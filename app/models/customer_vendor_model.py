@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional
+from app.core.config import settings
 
 class CustomerVendorRelation:
     """Model for customer-vendor credit relationship"""
@@ -13,9 +14,9 @@ class CustomerVendorRelation:
             "customer_name": data["customer_name"],
             "vendor_id": data["vendor_id"],
             "vendor_name": data.get("vendor_name", "Vendor Store"),
-            "credit_limit": data.get("credit_limit", 500.0),
+            "credit_limit": data.get("credit_limit", settings.DEFAULT_CREDIT_LIMIT),
             "used_credit": 0.0,
-            "available_credit": data.get("credit_limit", 500.0),
+            "available_credit": data.get("credit_limit", settings.DEFAULT_CREDIT_LIMIT),
             "transaction_count": 0,
             "status": "active",
             "auto_approved": True,
@@ -0,0 +1,19 @@
+# app/models/vendor_model.py
+from datetime import datetime
+from app.core.config import settings
+
+# Only active vendors can be scanned or registered with
+VENDOR_STATUSES = ("active", "inactive", "suspended")
+
+def make_vendor_doc(data: dict) -> dict:
+    # vendor_id doubles as _id so change events carry it in documentKey
+    return {
+        "_id": data["vendor_id"],
+        "vendor_id": data["vendor_id"],
+        "vendor_name": data["vendor_name"],
+        "category": data.get("category", "General"),
+        "default_credit_limit": data.get("default_credit_limit", settings.DEFAULT_CREDIT_LIMIT),
+        "status": data.get("status", "active"),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
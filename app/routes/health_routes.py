@@ -1,7 +1,67 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core import profiling
+from app.core.cache import cache_stats
+from app.core.database import pool_stats
+from app.core.readiness import readiness
 
 router = APIRouter()
 
 @router.get("/ping")
 async def ping():
     return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """
+    Readiness for the load balancer
+    503 until the connection pool, indexes, ID lease and vendor cache are warm
+    """
+    status = readiness.status()
+    status["pool"] = pool_stats()
+    status["cached_vendors"] = cache_stats().get("vendor", {}).get("size", 0)
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@router.get("/caches")
+async def caches():
+    """Hit/miss counters for the in-process caches"""
+    return cache_stats()
+
+@router.get("/pool")
+async def pool():
+    """MongoDB connection pool occupancy and wait queue per server"""
+    return pool_stats()
+
+# ============ PROFILES ============
+
+def require_profile_token(x_profile: Optional[str]) -> None:
+    """Profiles show request internals; the signed X-Profile header is required"""
+    if not profiling.enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling.verify_token(x_profile):
+        raise HTTPException(status_code=403, detail="Valid X-Profile header required")
+
+def find_profile(profile_id: int) -> profiling.Profile:
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/profiles")
+async def list_profiles(x_profile: Optional[str] = Header(None)):
+    """Recently profiled requests, newest first"""
+    require_profile_token(x_profile)
+    return [profile.summary() for profile in reversed(profiling.profiles)]
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: int, x_profile: Optional[str] = Header(None)):
+    """One profile: timings, Mongo commands and folded CPU stacks"""
+    require_profile_token(x_profile)
+    return find_profile(profile_id).details()
+
+@router.get("/profiles/{profile_id}/folded")
+async def get_profile_folded(profile_id: int, x_profile: Optional[str] = Header(None)):
+    """CPU samples as folded stacks, for flamegraph.pl or speedscope"""
+    require_profile_token(x_profile)
+    return PlainTextResponse(find_profile(profile_id).folded())
@@ -1,7 +1,92 @@
-from fastapi import APIRouter
+import json
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.core.config import settings
+from app.core.responses import ModelResponse
+from app.routes.vendor_routes import require_vendor_user
+from app.schemas.transaction_schema import TransactionHistoryResponse, TransactionItem
+from app.services.transaction_service import TransactionService
 
 router = APIRouter()
 
 @router.get("/ping")
 async def transaction_ping():
     return {"message": "Transaction route working"}
+
+def serialize_transaction(doc: dict) -> dict:
+    return {
+        "transaction_id": str(doc["_id"]),
+        "customer_id": doc["customer_id"],
+        "vendor_id": doc["vendor_id"],
+        "amount": doc["amount"],
+        "transaction_type": doc["transaction_type"],
+        "description": doc.get("description"),
+        "status": doc["status"],
+        "created_at": doc["created_at"].isoformat(),
+    }
+
+# ============ HISTORY ============
+
+@router.get("/history", response_model=TransactionHistoryResponse)
+async def get_transaction_history(
+    vendor_id: str,
+    customer_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Transaction history, newest first
+    Pass next_cursor back as cursor to get the following page
+    Needs a Bearer token of the vendor's staff or an admin
+    """
+    await require_vendor_user(vendor_id, authorization)
+
+    try:
+        result = await TransactionService.get_history(
+            vendor_id=vendor_id,
+            customer_id=customer_id,
+            limit=limit,
+            cursor=cursor
+        )
+
+        if result.get("error") == "invalid_cursor":
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid cursor"
+            )
+
+        return ModelResponse(TransactionHistoryResponse(
+            items=[TransactionItem(**serialize_transaction(doc)) for doc in result["items"]],
+            next_cursor=result["next_cursor"]
+        ))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching history: {str(e)}"
+        )
+
+# ============ EXPORT ============
+
+@router.get("/export/{vendor_id}")
+async def export_vendor_ledger(vendor_id: str, authorization: Optional[str] = Header(None)):
+    """
+    Full vendor ledger as NDJSON, oldest first
+    Streamed from the database cursor; never held in memory
+    Needs a Bearer token of the vendor's staff or an admin
+    """
+    await require_vendor_user(vendor_id, authorization)
+
+    async def ndjson():
+        async for doc in TransactionService.iter_vendor_ledger(vendor_id):
+            yield json.dumps(serialize_transaction(doc), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{vendor_id}_ledger.ndjson"'}
+    )
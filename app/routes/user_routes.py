@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Response, WebSocket, status
+from typing import Optional
 from app.schemas.user_schema import (
     CustomerCheckRequest,
     CustomerCheckResponse,
@@ -8,31 +9,41 @@ from app.schemas.user_schema import (
     CustomerDashboardResponse,
     PayOnCreditRequest,
     PayOnCreditResponse,
+    PayOnCreditBatchRequest,
+    PayOnCreditBatchResponse,
+    PayOnCreditItemResult,
     OTPSendRequest,
     OTPSendResponse,
     OTPVerifyRequest,
     OTPVerifyResponse,
+    AccountRegisterRequest,
+    AccountRegisterResponse,
+    LoginRequest,
+    LoginResponse,
+    RoleGrantRequest,
+    AccountRolesResponse,
     VendorInfoResponse
 )
-from app.core.database import db
+from app.core.config import settings
+from app.core.database import causal_session, db, encode_consistency_token, read_db
+from app.core.ids import new_customer_id
+from app.core.responses import FastJSONResponse, ModelResponse
+from app.services.dashboard_service import VERSION_FIELDS, DashboardService
+from app.services.dashboard_stream import CLOSE_POLICY_VIOLATION, dashboard_hub
+from app.services.idempotency_service import IdempotencyService, fingerprint
+from app.services.ledger_stats_service import LedgerStatsService
+from app.services.otp_service import otp_store
+from app.services.transaction_service import TransactionService
+from app.services.user_service import UserService
+from app.services.vendor_service import VendorService
+from app.routes.vendor_routes import require_admin_user
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from datetime import datetime
 import random
 
 router = APIRouter()
 
-# In-memory OTP storage (use Redis in production)
-otp_storage = {}
-
-# Fixed vendor for testing (V001)
-VENDOR_V001 = {
-    "vendor_id": "V001",
-    "vendor_name": "Raj General Store",
-    "category": "Grocery",
-    "default_credit_limit": 500.0,
-    "status": "active"
-}
-
 # ============ QR SCAN ENDPOINT ============
 
 @router.get("/scan/{vendor_id}")
@@ -41,14 +52,16 @@ async def scan_vendor_qr(vendor_id: str):
     Customer scans QR code
     Returns vendor info
     """
-    # For now, only V001 is supported
-    if vendor_id != "V001":
+    # Served from the vendor cache; no DB round trip for known vendors
+    vendor = await VendorService.get_vendor(vendor_id)
+    
+    if not vendor:
         raise HTTPException(
             status_code=404,
             detail="Vendor not found"
         )
     
-    return VendorInfoResponse(**VENDOR_V001)
+    return ModelResponse(VendorInfoResponse(**vendor))
 
 # ============ CUSTOMER CHECK ============
 
@@ -59,25 +72,26 @@ async def check_customer(request: CustomerCheckRequest):
     """
     try:
         # Check in customer_vendor_relations collection
-        relation = await db.customer_vendor_relations.find_one({
+        # A lagging secondary is fine here: register's unique index catches repeats
+        relation = await read_db("check").customer_vendor_relations.find_one({
             "customer_phone": request.phone_number,
             "vendor_id": request.vendor_id
         })
         
         if relation:
-            return CustomerCheckResponse(
+            return ModelResponse(CustomerCheckResponse(
                 exists=True,
                 message="Customer exists",
                 customer_id=str(relation["customer_id"]),
                 vendor_id=request.vendor_id
-            )
+            ))
         else:
-            return CustomerCheckResponse(
+            return ModelResponse(CustomerCheckResponse(
                 exists=False,
                 message="New customer",
                 customer_id=None,
                 vendor_id=request.vendor_id
-            )
+            ))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -96,20 +110,17 @@ async def send_otp(request: OTPSendRequest):
         otp = str(random.randint(100000, 999999))
         
         # Store OTP with expiration
-        otp_storage[request.phone_number] = {
-            "otp": otp,
-            "created_at": datetime.utcnow()
-        }
+        await otp_store.save(request.phone_number, otp, settings.OTP_TTL_SECONDS)
         
         # TODO: Send via SMS provider (Twilio, MSG91, etc.)
         # For testing, print to console
         print(f"📱 OTP for {request.phone_number}: {otp}")
         
-        return OTPSendResponse(
+        return ModelResponse(OTPSendResponse(
             success=True,
             message="OTP sent successfully",
-            expires_in=300
-        )
+            expires_in=settings.OTP_TTL_SECONDS
+        ))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -122,28 +133,28 @@ async def verify_otp(request: OTPVerifyRequest):
     Verify OTP entered by customer
     """
     try:
-        stored_otp_data = otp_storage.get(request.phone_number)
+        stored_otp = await otp_store.get(request.phone_number)
         
-        if not stored_otp_data:
-            return OTPVerifyResponse(
+        if not stored_otp:
+            return ModelResponse(OTPVerifyResponse(
                 success=False,
                 message="OTP expired or not found",
                 verified=False
-            )
+            ))
         
-        if stored_otp_data["otp"] != request.otp:
-            return OTPVerifyResponse(
+        if stored_otp != request.otp:
+            return ModelResponse(OTPVerifyResponse(
                 success=False,
                 message="Invalid OTP",
                 verified=False
-            )
+            ))
         
         # OTP is valid
-        return OTPVerifyResponse(
+        return ModelResponse(OTPVerifyResponse(
             success=True,
             message="OTP verified successfully",
             verified=True
-        )
+        ))
         
     except Exception as e:
         raise HTTPException(
@@ -157,21 +168,24 @@ async def verify_otp(request: OTPVerifyRequest):
 async def register_customer(request: CustomerRegisterRequest):
     """
     Register new customer with vendor
-    Auto-approve ₹500 credit for V001
+    Auto-approve the vendor's default credit limit
     """
     try:
-        # Verify OTP first
-        stored_otp_data = otp_storage.get(request.phone_number)
+        vendor = await VendorService.get_vendor(request.vendor_id)
+        
+        if not vendor:
+            raise HTTPException(
+                status_code=404,
+                detail="Vendor not found"
+            )
         
-        if not stored_otp_data or stored_otp_data["otp"] != request.otp:
+        # Verify OTP first; a matching OTP is removed in the same step
+        if not await otp_store.consume(request.phone_number, request.otp):
             raise HTTPException(
                 status_code=400,
                 detail="Invalid or expired OTP"
             )
         
-        # Remove OTP after successful verification
-        del otp_storage[request.phone_number]
-        
         # Check if customer already exists
         existing = await db.customer_vendor_relations.find_one({
             "customer_phone": request.phone_number,
@@ -184,8 +198,10 @@ async def register_customer(request: CustomerRegisterRequest):
                 detail="Customer already registered with this vendor"
             )
         
-        # Generate unique customer ID
-        customer_id = f"CUST_{int(datetime.utcnow().timestamp())}"
+        credit_limit = vendor["default_credit_limit"]
+        
+        # Unique across workers, no DB round trip
+        customer_id = new_customer_id()
         
         # Create customer-vendor relation
         relation_doc = {
@@ -193,10 +209,10 @@ async def register_customer(request: CustomerRegisterRequest):
             "customer_phone": request.phone_number,
             "customer_name": request.name,
             "vendor_id": request.vendor_id,
-            "vendor_name": VENDOR_V001["vendor_name"],
-            "credit_limit": 500.0,  # Auto-approve ₹500
+            "vendor_name": vendor["vendor_name"],
+            "credit_limit": credit_limit,  # Auto-approved
             "used_credit": 0.0,
-            "available_credit": 500.0,
+            "available_credit": credit_limit,
             "transaction_count": 0,
             "status": "active",
             "auto_approved": True,
@@ -204,15 +220,23 @@ async def register_customer(request: CustomerRegisterRequest):
             "updated_at": datetime.utcnow(),
         }
         
-        await db.customer_vendor_relations.insert_one(relation_doc)
+        try:
+            await db.customer_vendor_relations.insert_one(relation_doc)
+        except DuplicateKeyError:
+            # A concurrent registration for the same phone got in first
+            raise HTTPException(
+                status_code=400,
+                detail="Customer already registered with this vendor"
+            )
+        await LedgerStatsService.record_new_customers(request.vendor_id)
         
-        return CustomerRegisterResponse(
+        return ModelResponse(CustomerRegisterResponse(
             success=True,
-            message="Customer registered successfully with ₹500 credit",
+            message=f"Customer registered successfully with ₹{credit_limit:g} credit",
             customer_id=customer_id,
-            credit_limit=500.0,
-            available_credit=500.0
-        )
+            credit_limit=credit_limit,
+            available_credit=credit_limit
+        ))
         
     except HTTPException:
         raise
@@ -224,17 +248,107 @@ async def register_customer(request: CustomerRegisterRequest):
 
 # ============ CUSTOMER DASHBOARD ============
 
+def build_dashboard_response(relation: dict) -> CustomerDashboardResponse:
+    return CustomerDashboardResponse(
+        customer_id=relation["customer_id"],
+        customer_name=relation["customer_name"],
+        vendor_id=relation["vendor_id"],
+        vendor_name=relation["vendor_name"],
+        credit_limit=relation["credit_limit"],
+        used_credit=relation["used_credit"],
+        available_credit=relation["available_credit"],
+        transaction_count=relation["transaction_count"]
+    )
+
+async def read_dashboard_relation(customer_id: str, vendor_id: str,
+                                  consistency_token: Optional[str]) -> Optional[dict]:
+    """
+    Read routed by READ_PREFERENCE_DASHBOARD. With the token from a
+    pay-credit response, waits until the member read from has that write;
+    a token the server rejects falls back to the primary.
+    """
+    query = {"customer_id": customer_id, "vendor_id": vendor_id}
+    relations = read_db("dashboard").customer_vendor_relations
+    if not consistency_token:
+        return await relations.find_one(query)
+    try:
+        async with causal_session(consistency_token) as session:
+            return await relations.find_one(query, session=session)
+    except (PyMongoError, TypeError, ValueError):
+        return await db.customer_vendor_relations.find_one(query)
+
 @router.post("/dashboard", response_model=CustomerDashboardResponse)
-async def get_customer_dashboard(request: CustomerDashboardRequest):
+async def get_customer_dashboard(
+    request: CustomerDashboardRequest,
+    x_consistency_token: Optional[str] = Header(None)
+):
     """
     Get customer dashboard with credit info
     """
     try:
         # Get customer-vendor relation
-        relation = await db.customer_vendor_relations.find_one({
-            "customer_id": request.customer_id,
-            "vendor_id": request.vendor_id
-        })
+        relation = await read_dashboard_relation(
+            request.customer_id,
+            request.vendor_id,
+            x_consistency_token
+        )
+        
+        if not relation:
+            raise HTTPException(
+                status_code=404,
+                detail="Customer relationship not found"
+            )
+        
+        return ModelResponse(build_dashboard_response(relation))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching dashboard: {str(e)}"
+        )
+
+@router.get("/dashboard", response_model=CustomerDashboardResponse)
+async def get_customer_dashboard_cacheable(
+    customer_id: str,
+    vendor_id: str,
+    if_none_match: Optional[str] = Header(None),
+    x_consistency_token: Optional[str] = Header(None)
+):
+    """
+    Cacheable dashboard for polling clients
+    Returns 304 when the client's ETag is still current
+    """
+    cache_headers = {"Cache-Control": "private, no-cache"}
+    
+    # Known version: answer without touching the database. Skipped when the
+    # client must see its own write, which another worker may have made.
+    etag = DashboardService.cached_etag(customer_id, vendor_id)
+    if etag and not x_consistency_token and DashboardService.etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+    
+    try:
+        # A 304 says nothing newer exists, which a lagging secondary can't
+        # tell; the version is read from the primary, two fields only
+        version = None
+        if if_none_match:
+            version = await db.customer_vendor_relations.find_one(
+                {"customer_id": customer_id, "vendor_id": vendor_id}, VERSION_FIELDS
+            )
+            if version:
+                etag = DashboardService.remember(version)
+                if DashboardService.etag_matches(etag, if_none_match):
+                    return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+        
+        relation = await read_dashboard_relation(customer_id, vendor_id, x_consistency_token)
+        
+        if version and (not relation or relation["transaction_count"] < version["transaction_count"]
+                        or relation["updated_at"] < version["updated_at"]):
+            # The routed read is behind what the client has to move past
+            relation = await db.customer_vendor_relations.find_one(
+                {"customer_id": customer_id, "vendor_id": vendor_id}
+            )
         
         if not relation:
             raise HTTPException(
@@ -242,15 +356,12 @@ async def get_customer_dashboard(request: CustomerDashboardRequest):
                 detail="Customer relationship not found"
             )
         
-        return CustomerDashboardResponse(
-            customer_id=relation["customer_id"],
-            customer_name=relation["customer_name"],
-            vendor_id=relation["vendor_id"],
-            vendor_name=relation["vendor_name"],
-            credit_limit=relation["credit_limit"],
-            used_credit=relation["used_credit"],
-            available_credit=relation["available_credit"],
-            transaction_count=relation["transaction_count"]
+        # Only versions read from the primary are remembered for the fast path
+        etag = DashboardService.make_etag(relation)
+        
+        return ModelResponse(
+            build_dashboard_response(relation),
+            headers={"ETag": etag, **cache_headers}
         )
         
     except HTTPException:
@@ -261,70 +372,113 @@ async def get_customer_dashboard(request: CustomerDashboardRequest):
             detail=f"Error fetching dashboard: {str(e)}"
         )
 
+async def may_follow_dashboard(user: Optional[dict], customer_id: Optional[str],
+                               vendor_id: Optional[str]) -> bool:
+    """Vendor staff may follow their vendor; a customer only themselves"""
+    if not user:
+        return False
+    if vendor_id and UserService.manages_vendor(user, vendor_id):
+        return True
+    return bool(customer_id) and await UserService.is_customer(user, customer_id)
+
+@router.websocket("/dashboard/ws")
+async def dashboard_updates(
+    websocket: WebSocket,
+    customer_id: Optional[str] = None,
+    vendor_id: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Live dashboard instead of polling
+    Sends a snapshot of the followed relations, then every balance change
+    and new transaction. Follow a customer (optionally at one vendor) or,
+    with vendor_id only, every customer of a vendor.
+    Needs a Bearer token: the customer's own, or vendor staff for the vendor.
+    """
+    user = await UserService.get_user_by_authorization(authorization)
+    if not await may_follow_dashboard(user, customer_id, vendor_id):
+        # Before accept(), so the handshake is refused
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    await dashboard_hub.serve(websocket, customer_id, vendor_id)
+
 # ============ PAY ON CREDIT ============
 
 @router.post("/pay-credit", response_model=PayOnCreditResponse)
-async def pay_on_credit(request: PayOnCreditRequest):
+async def pay_on_credit(
+    request: PayOnCreditRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
     """
     Customer pays on credit
+    Retries with the same Idempotency-Key return the original response
+    X-Consistency-Token lets the next dashboard read see this payment
     """
     try:
-        # Get customer-vendor relation
-        relation = await db.customer_vendor_relations.find_one({
-            "customer_id": request.customer_id,
-            "vendor_id": request.vendor_id
-        })
+        async def perform(payment_id: Optional[ObjectId] = None, resumed: bool = False) -> dict:
+            # Guarded debit + transaction record in one logical operation
+            async with causal_session() as session:
+                result = await TransactionService.pay_on_credit(
+                    customer_id=request.customer_id,
+                    vendor_id=request.vendor_id,
+                    amount=request.amount,
+                    description=request.description,
+                    session=session,
+                    payment_id=payment_id,
+                    resumed=resumed
+                )
+                consistency_token = encode_consistency_token(session)
+            if "error" in result:
+                return result
+            response = PayOnCreditResponse(
+                success=True,
+                message="Payment successful",
+                transaction_id=result["transaction_id"],
+                new_balance=result["relation"]["available_credit"],
+                amount_paid=request.amount
+            ).model_dump()
+            # Stored with the response, so replays get the header too
+            return {**response, "consistency_token": consistency_token}
         
-        if not relation:
+        if idempotency_key:
+            result = await IdempotencyService.execute(
+                "pay-credit",
+                idempotency_key,
+                fingerprint(request.model_dump_json()),
+                perform
+            )
+        else:
+            result = await perform()
+        
+        if result.get("error") == "not_found":
             raise HTTPException(
                 status_code=404,
                 detail="Customer relationship not found"
             )
         
-        # Check available credit
-        if request.amount > relation["available_credit"]:
+        if result.get("error") == "insufficient_credit":
             raise HTTPException(
                 status_code=400,
-                detail=f"Insufficient credit. Available: ₹{relation['available_credit']}"
+                detail=f"Insufficient credit. Available: ₹{result['available_credit']}"
             )
         
-        # Create transaction
-        transaction_doc = {
-            "customer_id": request.customer_id,
-            "vendor_id": request.vendor_id,
-            "amount": request.amount,
-            "transaction_type": "credit_purchase",
-            "description": request.description or "Purchase on credit",
-            "status": "completed",
-            "created_at": datetime.utcnow(),
-        }
+        if result.get("error") == "in_progress":
+            raise HTTPException(
+                status_code=409,
+                detail="A payment with this Idempotency-Key is still being processed"
+            )
         
-        result = await db.transactions.insert_one(transaction_doc)
-        transaction_id = str(result.inserted_id)
-        
-        # Update customer-vendor relation
-        new_used_credit = relation["used_credit"] + request.amount
-        new_available_credit = relation["available_credit"] - request.amount
-        
-        await db.customer_vendor_relations.update_one(
-            {"_id": relation["_id"]},
-            {
-                "$set": {
-                    "used_credit": new_used_credit,
-                    "available_credit": new_available_credit,
-                    "transaction_count": relation["transaction_count"] + 1,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        if result.get("error") == "key_reused":
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different payment"
+            )
         
-        return PayOnCreditResponse(
-            success=True,
-            message="Payment successful",
-            transaction_id=transaction_id,
-            new_balance=new_available_credit,
-            amount_paid=request.amount
-        )
+        # A copy: coalesced requests share the result
+        result = dict(result)
+        consistency_token = result.pop("consistency_token", None)
+        headers = {"X-Consistency-Token": consistency_token} if consistency_token else None
+        return FastJSONResponse(result, headers=headers)
         
     except HTTPException:
         raise
@@ -334,6 +488,148 @@ async def pay_on_credit(request: PayOnCreditRequest):
             detail=f"Error processing payment: {str(e)}"
         )
 
+BATCH_ERROR_MESSAGES = {
+    "not_found": "Customer relationship not found",
+    "conflict": "Credit changed during batch, please retry",
+    "write_failed": "Could not record transaction",
+}
+
+@router.post("/pay-credit/batch", response_model=PayOnCreditBatchResponse)
+async def pay_on_credit_batch(
+    request: PayOnCreditBatchRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Upload a batch of offline POS purchases
+    Each item succeeds or fails on its own
+    Retries with the same Idempotency-Key return the original response
+    """
+    try:
+        items = [item.model_dump() for item in request.items]
+        
+        async def perform(batch_id: Optional[ObjectId] = None, resumed: bool = False) -> dict:
+            outcomes = await TransactionService.pay_on_credit_batch(items, batch_id=batch_id, resumed=resumed)
+            
+            results = []
+            for index, (item, outcome) in enumerate(zip(items, outcomes)):
+                error = outcome.get("error")
+                if error == "insufficient_credit":
+                    message = f"Insufficient credit. Available: ₹{outcome['available_credit']}"
+                else:
+                    message = BATCH_ERROR_MESSAGES.get(error, "Payment successful")
+                results.append(PayOnCreditItemResult(
+                    index=index,
+                    success=error is None,
+                    message=message,
+                    transaction_id=outcome.get("transaction_id"),
+                    new_balance=outcome.get("new_balance") if error is None else None,
+                    amount_paid=item["amount"] if error is None else 0.0
+                ))
+            
+            accepted = sum(1 for result in results if result.success)
+            return PayOnCreditBatchResponse(
+                success=accepted == len(results),
+                message=f"{accepted} of {len(results)} payments successful",
+                accepted=accepted,
+                rejected=len(results) - accepted,
+                results=results
+            ).model_dump()
+        
+        if idempotency_key:
+            result = await IdempotencyService.execute(
+                "pay-credit-batch",
+                idempotency_key,
+                fingerprint(request.model_dump_json()),
+                perform
+            )
+        else:
+            result = await perform()
+        
+        if result.get("error") == "in_progress":
+            raise HTTPException(
+                status_code=409,
+                detail="A batch with this Idempotency-Key is still being processed"
+            )
+        
+        if result.get("error") == "key_reused":
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different batch"
+            )
+        
+        return FastJSONResponse(result)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch payment: {str(e)}"
+        )
+
+# ============ ACCOUNTS ============
+
+@router.post("/accounts", response_model=AccountRegisterResponse)
+async def register_account(request: AccountRegisterRequest):
+    """
+    Create a staff or admin account
+    It has no access until an admin grants it a role
+    """
+    result = await UserService.register_user(request.model_dump())
+
+    if "error" in result:
+        raise HTTPException(
+            status_code=400,
+            detail=result["error"]
+        )
+
+    return ModelResponse(AccountRegisterResponse(**result))
+
+@router.post("/login", response_model=LoginResponse)
+async def login(request: LoginRequest):
+    """
+    Exchange email and password for a Bearer token
+    """
+    result = await UserService.login_user(request.email, request.password)
+
+    if "error" in result:
+        raise HTTPException(
+            status_code=401,
+            detail=result["error"],
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    return ModelResponse(LoginResponse(**result))
+
+@router.post("/accounts/roles", response_model=AccountRolesResponse)
+async def grant_role(request: RoleGrantRequest, authorization: Optional[str] = Header(None)):
+    """
+    Grant a role: admin, vendor:<vendor_id> or customer:<customer_id>
+    Admin only
+    """
+    await require_admin_user(authorization)
+    return await change_role(request, granted=True)
+
+@router.post("/accounts/roles/revoke", response_model=AccountRolesResponse)
+async def revoke_role(request: RoleGrantRequest, authorization: Optional[str] = Header(None)):
+    """
+    Revoke a role
+    Admin only
+    """
+    await require_admin_user(authorization)
+    return await change_role(request, granted=False)
+
+async def change_role(request: RoleGrantRequest, granted: bool):
+    result = await UserService.set_role(request.email, request.role, granted)
+
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Account not found"
+        )
+
+    return ModelResponse(AccountRolesResponse(**result))
+
 # Keep old ping for testing
 @router.get("/ping")
 async def user_ping():
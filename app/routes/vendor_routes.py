@@ -1,10 +1,179 @@
-from fastapi import APIRouter
-
-router = APIRouter(
-    prefix="/vendors",
-    tags=["Vendors"]
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from app.core.ids import id_generator
+from app.core.responses import ModelResponse
+from app.schemas.user_schema import VendorInfoResponse
+from app.schemas.vendor_schema import (
+    CustomerImportResponse,
+    VendorCreateRequest,
+    VendorUpdateRequest,
+    VendorSummaryResponse
 )
+from app.services.ledger_stats_service import LedgerStatsService
+from app.services.user_service import UserService
+from app.services.vendor_service import VendorService
+
+# Mounted under /vendors in main.py
+router = APIRouter()
 
 @router.get("/ping")
 async def ping_vendor():
     return {"message": "Vendor routes working!"}
+
+# ============ ACCESS ============
+
+async def require_user(authorization: Optional[str]) -> dict:
+    """The user behind a Bearer token"""
+    user = await UserService.get_user_by_authorization(authorization)
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user
+
+async def require_vendor_user(vendor_id: str, authorization: Optional[str]) -> dict:
+    """The user behind a Bearer token, if they may manage this vendor"""
+    user = await require_user(authorization)
+    if not UserService.manages_vendor(user, vendor_id):
+        raise HTTPException(
+            status_code=403,
+            detail="Not allowed to manage this vendor"
+        )
+    return user
+
+async def require_admin_user(authorization: Optional[str]) -> dict:
+    """The user behind a Bearer token, if they are an admin"""
+    user = await require_user(authorization)
+    if not UserService.is_admin(user):
+        raise HTTPException(
+            status_code=403,
+            detail="Admin only"
+        )
+    return user
+
+# ============ VENDOR CATALOG ============
+
+@router.post("/", response_model=VendorInfoResponse)
+async def create_vendor(request: VendorCreateRequest, authorization: Optional[str] = Header(None)):
+    """
+    Add a vendor to the catalog
+    Admin only
+    """
+    await require_admin_user(authorization)
+
+    result = await VendorService.create_vendor(request.model_dump())
+
+    if "error" in result:
+        raise HTTPException(
+            status_code=400,
+            detail=result["error"]
+        )
+
+    return ModelResponse(VendorInfoResponse(**result))
+
+@router.get("/{vendor_id}", response_model=VendorInfoResponse)
+async def get_vendor(vendor_id: str):
+    """
+    Get vendor details
+    """
+    vendor = await VendorService.get_vendor(vendor_id)
+
+    if not vendor:
+        raise HTTPException(
+            status_code=404,
+            detail="Vendor not found"
+        )
+
+    return ModelResponse(VendorInfoResponse(**vendor))
+
+@router.patch("/{vendor_id}", response_model=VendorInfoResponse)
+async def update_vendor(
+    vendor_id: str,
+    request: VendorUpdateRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Update vendor details
+    Needs a Bearer token of the vendor's staff or an admin
+    """
+    await require_vendor_user(vendor_id, authorization)
+
+    vendor = await VendorService.update_vendor(vendor_id, request.model_dump())
+
+    if not vendor:
+        raise HTTPException(
+            status_code=404,
+            detail="Vendor not found"
+        )
+
+    return ModelResponse(VendorInfoResponse(**vendor))
+
+@router.get("/{vendor_id}/summary", response_model=VendorSummaryResponse)
+async def get_vendor_summary(
+    vendor_id: str,
+    days: int = Query(7, ge=1, le=90),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Outstanding credit, sales and customer counts
+    Read from pre-aggregated stats, independent of history size
+    Needs a Bearer token of the vendor's staff or an admin
+    """
+    await require_vendor_user(vendor_id, authorization)
+
+    vendor = await VendorService.get_vendor(vendor_id, include_inactive=True)
+
+    if not vendor:
+        raise HTTPException(
+            status_code=404,
+            detail="Vendor not found"
+        )
+
+    return ModelResponse(VendorSummaryResponse(**await LedgerStatsService.get_summary(vendor_id, days)))
+
+# ============ CUSTOMER IMPORT ============
+
+@router.post("/{vendor_id}/customers/import", response_model=CustomerImportResponse)
+async def import_customers(
+    vendor_id: str,
+    request: Request,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Import customers from the vendor's credit book
+    Send the CSV as the raw body (Content-Type: text/csv); it is processed
+    while it uploads. Customers already registered with the vendor are
+    left as they are.
+    """
+    await require_vendor_user(vendor_id, authorization)
+
+    vendor = await VendorService.get_vendor(vendor_id, from_primary=True)
+
+    if not vendor:
+        raise HTTPException(
+            status_code=404,
+            detail="Vendor not found"
+        )
+
+    # Every imported customer needs a new id; don't start what can't finish
+    if not id_generator.available:
+        raise HTTPException(
+            status_code=503,
+            detail="Customer ids are temporarily unavailable, please retry",
+            headers={"Retry-After": "5"}
+        )
+
+    # Imported on first use; most instances never run an import
+    from app.services.customer_import_service import CustomerImportService
+
+    result = await CustomerImportService.import_csv(vendor, request.stream())
+
+    if "error" in result:
+        raise HTTPException(
+            status_code=400,
+            detail=result["error"]
+        )
+
+    return ModelResponse(CustomerImportResponse(**result))
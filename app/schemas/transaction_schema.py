@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+# ============ TRANSACTION SCHEMAS ============
+
+class TransactionItem(BaseModel):
+    """One ledger entry"""
+    transaction_id: str
+    customer_id: str
+    vendor_id: str
+    amount: float
+    transaction_type: str
+    description: Optional[str] = None
+    status: str
+    created_at: datetime
+
+class TransactionHistoryResponse(BaseModel):
+    """One page of transaction history, newest first"""
+    items: List[TransactionItem]
+    next_cursor: Optional[str] = None
@@ -1,12 +1,15 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
+# Optional +, no leading zero, 10-15 digits
+PHONE_PATTERN = r'^\+?[1-9]\d{9,14}$'
+
 # ============ CUSTOMER SCHEMAS ============
 
 class CustomerCheckRequest(BaseModel):
     """Check if customer exists for a vendor"""
-    phone_number: str = Field(..., pattern=r'^\+?[1-9]\d{9,14}$')
+    phone_number: str = Field(..., pattern=PHONE_PATTERN)
     vendor_id: str = Field(..., min_length=1)
 
 class CustomerCheckResponse(BaseModel):
@@ -18,7 +21,7 @@ class CustomerCheckResponse(BaseModel):
 
 class CustomerRegisterRequest(BaseModel):
     """Register new customer with vendor"""
-    phone_number: str = Field(..., pattern=r'^\+?[1-9]\d{9,14}$')
+    phone_number: str = Field(..., pattern=PHONE_PATTERN)
     name: str = Field(..., min_length=2, max_length=100)
     vendor_id: str = Field(..., min_length=1)
     otp: str = Field(..., min_length=4, max_length=6)
@@ -62,11 +65,32 @@ class PayOnCreditResponse(BaseModel):
     new_balance: float
     amount_paid: float
 
+class PayOnCreditBatchRequest(BaseModel):
+    """Batch of offline POS purchases"""
+    items: List[PayOnCreditRequest] = Field(..., min_length=1, max_length=500)
+
+class PayOnCreditItemResult(BaseModel):
+    """Outcome of one item in a batch"""
+    index: int
+    success: bool
+    message: str
+    transaction_id: Optional[str] = None
+    new_balance: Optional[float] = None
+    amount_paid: float
+
+class PayOnCreditBatchResponse(BaseModel):
+    """Response after a batch payment"""
+    success: bool
+    message: str
+    accepted: int
+    rejected: int
+    results: List[PayOnCreditItemResult]
+
 # ============ OTP SCHEMAS ============
 
 class OTPSendRequest(BaseModel):
     """Send OTP to phone"""
-    phone_number: str = Field(..., pattern=r'^\+?[1-9]\d{9,14}$')
+    phone_number: str = Field(..., pattern=PHONE_PATTERN)
 
 class OTPSendResponse(BaseModel):
     """OTP send response"""
@@ -76,7 +100,7 @@ class OTPSendResponse(BaseModel):
 
 class OTPVerifyRequest(BaseModel):
     """Verify OTP"""
-    phone_number: str = Field(..., pattern=r'^\+?[1-9]\d{9,14}$')
+    phone_number: str = Field(..., pattern=PHONE_PATTERN)
     otp: str = Field(..., min_length=4, max_length=6)
 
 class OTPVerifyResponse(BaseModel):
@@ -85,6 +109,43 @@ class OTPVerifyResponse(BaseModel):
     message: str
     verified: bool
 
+# ============ ACCOUNT SCHEMAS ============
+
+# admin, vendor:<vendor_id> (vendor staff) or customer:<customer_id>
+ROLE_PATTERN = r'^(admin|vendor:\S+|customer:\S+)$'
+
+class AccountRegisterRequest(BaseModel):
+    """Create a staff or admin account; it starts without roles"""
+    name: str = Field(..., min_length=2, max_length=100)
+    email: str = Field(..., min_length=3, max_length=254)
+    password: str = Field(..., min_length=8, max_length=72)  # bcrypt reads 72 bytes at most
+    phone: Optional[str] = Field(None, pattern=PHONE_PATTERN)
+
+class AccountRegisterResponse(BaseModel):
+    """Account registration response"""
+    id: str
+    message: str
+
+class LoginRequest(BaseModel):
+    """Exchange email and password for a Bearer token"""
+    email: str
+    password: str
+
+class LoginResponse(BaseModel):
+    """Bearer token for the Authorization header"""
+    access_token: str
+    token_type: str
+
+class RoleGrantRequest(BaseModel):
+    """Grant or revoke one role"""
+    email: str
+    role: str = Field(..., pattern=ROLE_PATTERN)
+
+class AccountRolesResponse(BaseModel):
+    """An account's roles after a change"""
+    email: str
+    roles: List[str]
+
 # ============ VENDOR SCHEMAS ============
 
 class VendorInfoResponse(BaseModel):
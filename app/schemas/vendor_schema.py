@@ -0,0 +1,68 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+from app.core.config import settings
+from app.models.vendor_model import VENDOR_STATUSES
+from app.schemas.user_schema import PHONE_PATTERN
+
+# ============ VENDOR SCHEMAS ============
+
+class VendorCreateRequest(BaseModel):
+    """Add a vendor to the catalog"""
+    vendor_id: str = Field(..., min_length=1)
+    vendor_name: str = Field(..., min_length=2, max_length=100)
+    category: str = "General"
+    default_credit_limit: float = Field(settings.DEFAULT_CREDIT_LIMIT, ge=0)
+
+class VendorUpdateRequest(BaseModel):
+    """Update vendor details"""
+    vendor_name: Optional[str] = Field(None, min_length=2, max_length=100)
+    category: Optional[str] = None
+    default_credit_limit: Optional[float] = Field(None, ge=0)
+    status: Optional[str] = Field(None, pattern=f"^({'|'.join(VENDOR_STATUSES)})$")
+
+class VendorDailyStats(BaseModel):
+    """Credit sales for one UTC day"""
+    day: str
+    credit_sales: float
+    transaction_count: int
+
+class VendorSummaryResponse(BaseModel):
+    """Vendor ledger totals"""
+    vendor_id: str
+    outstanding_credit: float
+    total_credit_sales: float
+    transaction_count: int
+    customer_count: int
+    active_customer_count: int
+    daily: List[VendorDailyStats]
+
+# ============ CUSTOMER IMPORT SCHEMAS ============
+
+class CustomerImportRow(BaseModel):
+    """One customer from a vendor's credit book"""
+    phone_number: str = Field(..., pattern=PHONE_PATTERN)
+    name: str = Field(..., min_length=2, max_length=100)
+    credit_limit: Optional[float] = Field(None, ge=0)
+    used_credit: float = Field(0.0, ge=0)
+
+    @model_validator(mode="after")
+    def balance_within_limit(self):
+        if self.credit_limit is not None and self.used_credit > self.credit_limit:
+            raise ValueError("used_credit exceeds credit_limit")
+        return self
+
+class CustomerImportError(BaseModel):
+    """A row that was not imported; row is its line in the file, the header being line 1"""
+    row: int
+    error: str
+
+class CustomerImportResponse(BaseModel):
+    """Outcome of a customer import"""
+    vendor_id: str
+    rows: int
+    imported: int
+    existing: int
+    failed: int
+    errors: List[CustomerImportError]
+    errors_truncated: bool
+    aborted: Optional[str] = None
@@ -0,0 +1,334 @@
+# app/services/archive_service.py
+"""
+Hot/cold tiering of the transactions collection.
+
+Whole calendar months older than ARCHIVE_AFTER_DAYS are moved out of
+transactions into one collection per month, transactions_archive_YYYYMM.
+The archives are created with zstd block compression and the same indexes
+as transactions. The hot collection, and the indexes every payment has to
+update, then stays about ARCHIVE_AFTER_DAYS deep instead of growing forever.
+
+The move goes vendor by vendor, oldest first, ARCHIVE_BATCH_SIZE
+transactions at a time, pausing ARCHIVE_BATCH_PAUSE_MS between batches.
+Each batch is copied to its archive first and only then deleted from
+transactions, keeping its _id. An interrupted run can simply be started
+again: copies it already made are skipped as duplicate keys.
+
+For each (vendor, customer, archived month), a summary row stays in
+transactions. It has transaction_type "archive_summary", the month's
+purchase total in amount, its purchase count in transaction_count and
+its number of archived rows in archived_count. The summaries are rebuilt
+from the archives after a vendor is done.
+
+transaction_archive_state has one document per vendor: `months` lists
+every archive holding the vendor's rows, `pending` the months still to
+summarize. Both are recorded before a batch moves, so a crash cannot lose
+them. Readers use them to query only the archives that can match: the
+vendor's months, or for one customer the months of their summary rows
+plus any pending ones.
+
+History and export read across both tiers and never return summary rows
+(see TransactionService). The credit scoring job reads the summaries, and
+the ledger reconcile scans the archives.
+
+    python -m app.services.archive_service [--apply] [--days N]
+"""
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import db
+from app.core.indexes import INDEXES
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "transactions_archive_"
+SUMMARY_TYPE = "archive_summary"
+ARCHIVE_STORAGE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+DUPLICATE_KEY = 11000
+
+# Existing archive collection names, newest month first
+archive_names = TTLCache("archive_collections", 1, 60)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_name(moment: datetime) -> str:
+    return f"{ARCHIVE_PREFIX}{moment:%Y%m}"
+
+
+class TransactionArchiveService:
+    @staticmethod
+    async def archive_collections() -> list:
+        names = archive_names.get("all")
+        if names is None:
+            names = sorted(
+                await db.list_collection_names(filter={"name": {"$regex": f"^{ARCHIVE_PREFIX}"}}),
+                reverse=True
+            )
+            archive_names.set("all", names)
+        return names
+
+    @staticmethod
+    async def transaction_collections() -> list:
+        """transactions followed by every archive, newest first"""
+        return ["transactions"] + await TransactionArchiveService.archive_collections()
+
+    @staticmethod
+    async def archives_for(vendor_id: str, customer_id: Optional[str] = None,
+                           before: Optional[datetime] = None) -> list:
+        """
+        Archive collections that can hold the vendor's (or one customer's)
+        transactions from before `before`, newest first
+        """
+        state = await db.transaction_archive_state.find_one(
+            {"_id": vendor_id}, {"months": 1, "pending": 1}
+        )
+        if state is None:
+            return []  # never archived
+        if "months" not in state:
+            # Archived before months were recorded; run() fills them in
+            return await TransactionArchiveService.archive_collections()
+        if not customer_id:
+            return sorted(state["months"], reverse=True)
+
+        names = set(state.get("pending", []))
+        query = {"vendor_id": vendor_id, "customer_id": customer_id, "transaction_type": SUMMARY_TYPE}
+        if before:
+            query["created_at"] = {"$lte": before}
+        async for summary in db.transactions.find(query, {"archive_collection": 1}):
+            names.add(summary["archive_collection"])
+        return sorted(names, reverse=True)
+
+    @staticmethod
+    async def find_archived(query: dict, sort: list, limit: int,
+                            before: Optional[datetime] = None) -> list:
+        """
+        Up to limit archived transactions matching query, newest first.
+        query must name a vendor_id; months after `before` are not queried.
+        """
+        docs = []
+        newest = archive_name(before) if before else None
+        names = await TransactionArchiveService.archives_for(
+            query["vendor_id"], query.get("customer_id"), before
+        )
+        for name in names:
+            if newest and name > newest:
+                continue
+            docs.extend(await db[name].find(query).sort(sort).limit(limit - len(docs)).to_list(None))
+            if len(docs) >= limit:
+                break
+        return docs
+
+    # ============ ARCHIVAL ============
+
+    @staticmethod
+    async def _ensure_archive(name: str) -> None:
+        try:
+            await db.create_collection(name, storageEngine=ARCHIVE_STORAGE)
+        except CollectionInvalid:
+            pass  # already there
+        except OperationFailure:
+            # Storage engines without zstd (e.g. in-memory): uncompressed
+            try:
+                await db.create_collection(name)
+            except CollectionInvalid:
+                pass
+        await db[name].create_indexes(INDEXES["transactions"])
+        archive_names.clear()
+
+    @staticmethod
+    async def _move_batch(docs: list, ensured: set) -> None:
+        """Copy docs to their monthly archives, then delete them from transactions"""
+        by_month = {}
+        for doc in docs:
+            by_month.setdefault(archive_name(doc["created_at"]), []).append(doc)
+
+        for name, month_docs in by_month.items():
+            if name not in ensured:
+                await TransactionArchiveService._ensure_archive(name)
+                ensured.add(name)
+            try:
+                await db[name].insert_many(month_docs, ordered=False)
+            except BulkWriteError as e:
+                # Duplicates were copied by an earlier, interrupted run
+                if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                    raise
+
+        await db.transactions.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+
+    @staticmethod
+    async def _summarize(vendor_id: str, names: list, now: datetime) -> int:
+        """Rebuild the vendor's summary rows for the given archive months"""
+        operations = []
+        for name in names:
+            month = name[len(ARCHIVE_PREFIX):]
+            # Every customer with archived rows gets one, purchases or not,
+            # so archives_for can find their months
+            purchase = {"$eq": ["$transaction_type", "credit_purchase"]}
+            pipeline = [
+                {"$match": {"vendor_id": vendor_id}},
+                {"$group": {
+                    "_id": "$customer_id",
+                    "amount": {"$sum": {"$cond": [purchase, "$amount", 0]}},
+                    "count": {"$sum": {"$cond": [purchase, 1, 0]}},
+                    "archived": {"$sum": 1},
+                }},
+            ]
+            async for row in db[name].aggregate(pipeline):
+                operations.append(ReplaceOne(
+                    {"_id": f"{SUMMARY_TYPE}:{vendor_id}:{row['_id']}:{month}"},
+                    {
+                        "customer_id": row["_id"],
+                        "vendor_id": vendor_id,
+                        "amount": row["amount"],
+                        "transaction_count": row["count"],
+                        "archived_count": row["archived"],
+                        "transaction_type": SUMMARY_TYPE,
+                        "archive_collection": name,
+                        "status": "archived",
+                        "created_at": datetime.strptime(month, "%Y%m"),
+                        "archived_at": now,
+                    },
+                    upsert=True
+                ))
+        if operations:
+            await db.transactions.bulk_write(operations, ordered=False)
+        await db.transaction_archive_state.update_one(
+            {"_id": vendor_id}, {"$pullAll": {"pending": list(names)}}
+        )
+        return len(operations)
+
+    @staticmethod
+    async def _archive_vendor(vendor_id: str, query: dict, batch_size: int,
+                              ensured: set, now: datetime) -> tuple:
+        """Returns (transactions moved, summary rows written)"""
+        moved = 0
+        pending = set()
+        pause = settings.ARCHIVE_BATCH_PAUSE_MS / 1000
+        while True:
+            docs = await db.transactions.find(query).sort(
+                [("created_at", 1), ("_id", 1)]
+            ).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+
+            months = {archive_name(doc["created_at"]) for doc in docs} - pending
+            if months:
+                # Noted before the move so a crash cannot leave them
+                # unsummarized, or unread by archives_for
+                await db.transaction_archive_state.update_one(
+                    {"_id": vendor_id},
+                    {"$addToSet": {
+                        "pending": {"$each": sorted(months)},
+                        "months": {"$each": sorted(months)},
+                    }},
+                    upsert=True
+                )
+                pending |= months
+
+            await TransactionArchiveService._move_batch(docs, ensured)
+            moved += len(docs)
+            if pause:
+                await asyncio.sleep(pause)
+
+        summaries = 0
+        if pending:
+            summaries = await TransactionArchiveService._summarize(vendor_id, sorted(pending), now)
+        return moved, summaries
+
+    @staticmethod
+    async def _record_months() -> None:
+        """Fill in `months` for vendors archived before it was recorded"""
+        missing = await db.transaction_archive_state.distinct("_id", {"months": {"$exists": False}})
+        if not missing:
+            return
+        months = {vendor_id: [] for vendor_id in missing}
+        for name in await TransactionArchiveService.archive_collections():
+            for vendor_id in await db[name].distinct("vendor_id", {"vendor_id": {"$in": missing}}):
+                months[vendor_id].append(name)
+        await db.transaction_archive_state.bulk_write([
+            UpdateOne({"_id": vendor_id, "months": {"$exists": False}}, {"$set": {"months": names}})
+            for vendor_id, names in months.items()
+        ], ordered=False)
+
+    @staticmethod
+    async def run(apply: bool = False, days: Optional[int] = None,
+                  batch_size: Optional[int] = None) -> dict:
+        """
+        Archive every whole month older than `days` (ARCHIVE_AFTER_DAYS).
+        Never fewer than CREDIT_SCORE_LOOKBACK_DAYS: credit scoring counts
+        recent purchases in the hot tier only. With apply=False only counts
+        what would move.
+        """
+        days = days or settings.ARCHIVE_AFTER_DAYS
+        if days < settings.CREDIT_SCORE_LOOKBACK_DAYS:
+            logger.warning(
+                "Archiving after %s days instead of %s: credit scoring reads the last %s days from transactions",
+                settings.CREDIT_SCORE_LOOKBACK_DAYS, days, settings.CREDIT_SCORE_LOOKBACK_DAYS
+            )
+            days = settings.CREDIT_SCORE_LOOKBACK_DAYS
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        now = datetime.utcnow()
+        cutoff = month_start(now - timedelta(days=days))
+        start = time.perf_counter()
+        stats = {"cutoff": cutoff, "days": days, "applied": apply, "vendors": 0, "moved": 0, "summaries": 0}
+        ensured = set()
+
+        if apply:
+            await TransactionArchiveService._record_months()
+            # Months an interrupted run moved but did not summarize
+            async for state in db.transaction_archive_state.find({"pending.0": {"$exists": True}}):
+                stats["summaries"] += await TransactionArchiveService._summarize(
+                    state["_id"], state["pending"], now
+                )
+
+        for vendor_id in await db.transactions.distinct("vendor_id"):
+            query = {
+                "vendor_id": vendor_id,
+                "created_at": {"$lt": cutoff},
+                "transaction_type": {"$ne": SUMMARY_TYPE},
+            }
+            if not apply:
+                count = await db.transactions.count_documents(query)
+                stats["moved"] += count
+                stats["vendors"] += 1 if count else 0
+                continue
+            moved, summaries = await TransactionArchiveService._archive_vendor(
+                vendor_id, query, batch_size, ensured, now
+            )
+            stats["moved"] += moved
+            stats["summaries"] += summaries
+            stats["vendors"] += 1 if moved else 0
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return stats
+
+
+async def _main(apply: bool, days: Optional[int]) -> int:
+    if days is not None and days < settings.CREDIT_SCORE_LOOKBACK_DAYS:
+        print(f"--days must be at least CREDIT_SCORE_LOOKBACK_DAYS ({settings.CREDIT_SCORE_LOOKBACK_DAYS}); "
+              f"credit scoring reads those days from transactions")
+        return 2
+    stats = await TransactionArchiveService.run(apply=apply, days=days)
+    print(
+        f"{stats['moved']} transactions before {stats['cutoff']:%Y-%m-%d} from {stats['vendors']} vendors "
+        f"{'archived' if apply else 'would be archived'}; "
+        f"{stats['summaries']} summary rows written in {stats['seconds']}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    days = None
+    if "--days" in sys.argv:
+        days = int(sys.argv[sys.argv.index("--days") + 1])
+    sys.exit(asyncio.run(_main("--apply" in sys.argv, days)))
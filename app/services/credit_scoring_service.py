@@ -0,0 +1,220 @@
+# app/services/credit_scoring_service.py
+"""
+Batch credit-limit scoring.
+
+Recomputes every active relation's credit_limit from how the customer
+actually uses it:
+
+- frequency:   purchases in the last CREDIT_SCORE_LOOKBACK_DAYS
+- repayment:   share of lifetime purchases no longer outstanding
+               (lifetime purchases - used_credit)
+- utilisation: used_credit / credit_limit; running at the limit without
+               repaying lowers the score
+- tenure:      age of the relation
+
+Relations are streamed in _id order, chunk_size at a time. Each chunk's
+purchase totals come from one aggregation over transactions. The chunk is
+held as columnar NumPy arrays and scored in one vectorized pass, and the
+changed limits are written back with one unordered bulk_write. Memory use
+stays flat however many relations there are.
+
+The write is a pipeline update that sets available_credit from the
+relation's used_credit at write time, so payments made while the job runs
+are not lost. A limit is never lowered below used_credit, so available
+credit cannot go negative. A relation's limit moves at most CREDIT_SCORE_MAX_STEP (as a
+fraction) per run. Relations without purchases, or younger than
+MIN_TENURE_DAYS, keep their limit: there is nothing to score yet.
+
+    python -m app.services.credit_scoring_service [--apply] [--chunk N]
+
+Needs numpy (in requirements.txt); the API itself does not import it.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import db
+from app.services.archive_service import SUMMARY_TYPE
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only this job needs it
+    np = None
+
+SCORING_CHUNK_SIZE = 10000
+LIMIT_ROUNDING = 50.0
+
+# Weights of the score components; they sum to 1
+WEIGHTS = {"frequency": 0.35, "repayment": 0.45, "tenure": 0.20}
+FULL_FREQUENCY_PURCHASES = 30  # purchases per lookback window for full marks
+FULL_TENURE_DAYS = 180
+UTILISATION_PENALTY_FROM = 0.9
+MIN_TENURE_DAYS = 30
+
+
+class CreditScoringService:
+    @staticmethod
+    def score(recent_count, lifetime_total, used_credit, credit_limit, tenure_days):
+        """
+        Vectorized score in [0, 1] for parallel arrays of relation features.
+        """
+        frequency = np.minimum(recent_count / FULL_FREQUENCY_PURCHASES, 1.0)
+        repaid = np.clip(lifetime_total - used_credit, 0.0, None)
+        repayment = np.divide(
+            repaid, lifetime_total, out=np.zeros_like(lifetime_total), where=lifetime_total > 0
+        )
+        tenure = np.minimum(tenure_days / FULL_TENURE_DAYS, 1.0)
+
+        utilisation = np.divide(
+            used_credit, credit_limit, out=np.ones_like(used_credit), where=credit_limit > 0
+        )
+        # Maxed out and not paying back: scale the score down towards zero
+        penalty = np.clip(
+            (utilisation - UTILISATION_PENALTY_FROM) / (1 - UTILISATION_PENALTY_FROM), 0.0, 1.0
+        ) * (1.0 - repayment)
+
+        score = (
+            WEIGHTS["frequency"] * frequency
+            + WEIGHTS["repayment"] * repayment
+            + WEIGHTS["tenure"] * tenure
+        )
+        return score * (1.0 - penalty)
+
+    @staticmethod
+    def new_limits(score, credit_limit, used_credit):
+        """
+        Map scores onto [MIN, MAX], limit the step per run, round. A limit
+        is never lowered below what the customer has already used.
+        """
+        low, high = settings.CREDIT_LIMIT_MIN, settings.CREDIT_LIMIT_MAX
+        target = low + score * (high - low)
+        step = settings.CREDIT_SCORE_MAX_STEP
+        target = np.clip(target, credit_limit * (1 - step), credit_limit * (1 + step))
+        target = np.round(target / LIMIT_ROUNDING) * LIMIT_ROUNDING
+        target = np.clip(target, low, high)
+        return np.maximum(target, np.minimum(used_credit, credit_limit))
+
+    @staticmethod
+    async def _purchase_totals(chunk: list, since: datetime) -> dict:
+        """
+        (customer_id, vendor_id) -> (recent_count, lifetime_total).
+        Archived months count through their summary rows; archival keeps
+        at least the lookback window in the hot collection.
+        """
+        pipeline = [
+            {"$match": {
+                "vendor_id": {"$in": list({r["vendor_id"] for r in chunk})},
+                "customer_id": {"$in": list({r["customer_id"] for r in chunk})},
+                "transaction_type": {"$in": ["credit_purchase", SUMMARY_TYPE]},
+            }},
+            {"$group": {
+                "_id": {"c": "$customer_id", "v": "$vendor_id"},
+                "lifetime_total": {"$sum": "$amount"},
+                "recent_count": {"$sum": {"$cond": [
+                    {"$and": [
+                        {"$eq": ["$transaction_type", "credit_purchase"]},
+                        {"$gte": ["$created_at", since]},
+                    ]}, 1, 0
+                ]}},
+            }},
+        ]
+        totals = {}
+        async for row in db.transactions.aggregate(pipeline, allowDiskUse=True):
+            totals[(row["_id"]["c"], row["_id"]["v"])] = (row["recent_count"], row["lifetime_total"])
+        return totals
+
+    @staticmethod
+    async def _score_chunk(chunk: list, now: datetime, apply: bool) -> int:
+        since = now - timedelta(days=settings.CREDIT_SCORE_LOOKBACK_DAYS)
+        totals = await CreditScoringService._purchase_totals(chunk, since)
+
+        size = len(chunk)
+        recent_count = np.zeros(size)
+        lifetime_total = np.zeros(size)
+        used_credit = np.fromiter((r.get("used_credit", 0.0) for r in chunk), float, size)
+        credit_limit = np.fromiter((r.get("credit_limit", 0.0) for r in chunk), float, size)
+        tenure_days = np.fromiter(
+            ((now - r.get("created_at", now)).total_seconds() / 86400 for r in chunk), float, size
+        )
+        for i, relation in enumerate(chunk):
+            found = totals.get((relation["customer_id"], relation["vendor_id"]))
+            if found:
+                recent_count[i], lifetime_total[i] = found
+
+        score = CreditScoringService.score(
+            recent_count, lifetime_total, used_credit, credit_limit, tenure_days
+        )
+        limits = CreditScoringService.new_limits(score, credit_limit, used_credit)
+        scored = (lifetime_total > 0) & (tenure_days >= MIN_TENURE_DAYS)
+        limits = np.where(scored, limits, credit_limit)
+
+        changed = np.flatnonzero(limits != credit_limit)
+        if apply and len(changed):
+            await db.customer_vendor_relations.bulk_write([
+                # used_credit may have grown since the read; never go below it
+                UpdateOne({"_id": chunk[i]["_id"]}, [{"$set": {
+                    "credit_limit": {"$max": [float(limits[i]), "$used_credit"]},
+                    "available_credit": {"$max": [{"$subtract": [float(limits[i]), "$used_credit"]}, 0.0]},
+                    "credit_scored_at": now,
+                    "updated_at": now,
+                }}])
+                for i in changed
+            ], ordered=False)
+        return len(changed)
+
+    @staticmethod
+    async def run(apply: bool = False, chunk_size: int = SCORING_CHUNK_SIZE) -> dict:
+        """
+        Score every active relation. Returns row and change counts and
+        throughput; with apply=False nothing is written.
+        """
+        if np is None:
+            raise RuntimeError("Credit scoring needs numpy: pip install numpy")
+
+        now = datetime.utcnow()
+        start = time.perf_counter()
+        rows = changed = 0
+        projection = {"customer_id": 1, "vendor_id": 1, "used_credit": 1,
+                      "credit_limit": 1, "created_at": 1}
+
+        chunk = []
+        cursor = db.customer_vendor_relations.find(
+            {"status": "active"}, projection, batch_size=chunk_size
+        ).sort("_id", 1)
+        async for relation in cursor:
+            chunk.append(relation)
+            if len(chunk) >= chunk_size:
+                changed += await CreditScoringService._score_chunk(chunk, now, apply)
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            changed += await CreditScoringService._score_chunk(chunk, now, apply)
+            rows += len(chunk)
+
+        elapsed = time.perf_counter() - start
+        return {
+            "rows": rows,
+            "changed": changed,
+            "applied": apply,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+async def _main(apply: bool, chunk_size: int) -> int:
+    stats = await CreditScoringService.run(apply=apply, chunk_size=chunk_size)
+    print(
+        f"scored {stats['rows']} relations in {stats['seconds']}s "
+        f"({stats['rows_per_second']} rows/s), "
+        f"{stats['changed']} limits {'changed' if apply else 'would change'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    chunk = SCORING_CHUNK_SIZE
+    if "--chunk" in sys.argv:
+        chunk = int(sys.argv[sys.argv.index("--chunk") + 1])
+    sys.exit(asyncio.run(_main("--apply" in sys.argv, chunk)))
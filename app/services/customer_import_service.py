@@ -0,0 +1,251 @@
+# app/services/customer_import_service.py
+"""
+Bulk customer import from a vendor's existing credit book.
+
+The CSV arrives as the raw request body and is parsed while it streams in.
+The first line is a header; recognised columns are phone_number and name
+(required), plus credit_limit and used_credit (the opening balance).
+Common aliases such as "phone" or "customer_name" are accepted.
+
+Valid rows are upserted into customer_vendor_relations keyed on
+(customer_phone, vendor_id), IMPORT_BATCH_SIZE at a time, each batch one
+unordered bulk_write. Every field is written with $setOnInsert, so a customer
+who already has a relation with the vendor is left untouched and counted
+as existing. Uploading the same file twice is therefore harmless, which
+also covers retrying an import that was cut off.
+
+Memory is bounded by one batch plus one record, whatever the file size.
+Only the first IMPORT_MAX_ERRORS row errors are listed, but all are counted.
+"""
+import codecs
+import csv
+from datetime import datetime
+from typing import AsyncIterator
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.database import db
+from app.core.ids import IdsUnavailable, new_customer_id
+from app.schemas.vendor_schema import CustomerImportRow
+from app.services.ledger_stats_service import LedgerStatsService
+
+COLUMN_ALIASES = {
+    "phone_number": "phone_number",
+    "phone": "phone_number",
+    "mobile": "phone_number",
+    "customer_phone": "phone_number",
+    "name": "name",
+    "customer_name": "name",
+    "credit_limit": "credit_limit",
+    "limit": "credit_limit",
+    "used_credit": "used_credit",
+    "balance": "used_credit",
+    "opening_balance": "used_credit",
+}
+REQUIRED_COLUMNS = ("phone_number", "name")
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+async def csv_records(chunks: AsyncIterator[bytes], max_record_chars: int) -> AsyncIterator[tuple]:
+    """
+    (line number, parsed CSV record) pairs from a stream of byte chunks.
+    Lines are handed to the csv module only once every quote is closed, so
+    quoted fields may contain newlines and chunk boundaries fall anywhere.
+    The line number is where the record starts in the file, from 1.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""   # text after the last newline
+    record = []    # lines of a record whose quotes are still open
+    quotes = 0
+    size = 0
+    parsed_lines = 0  # lines already handed to the csv module
+
+    def parse(lines: list):
+        nonlocal parsed_lines
+        reader = csv.reader(lines)
+        start = 0
+        for parsed in reader:
+            yield parsed_lines + start + 1, parsed
+            start = reader.line_num
+        parsed_lines += len(lines)
+
+    def complete(lines: list) -> list:
+        nonlocal record, quotes, size
+        ready = []
+        for line in lines:
+            record.append(line)
+            quotes += line.count('"')
+            size += len(line)
+            if quotes % 2 == 0:
+                ready.extend(record)
+                record, quotes, size = [], 0, 0
+            elif size > max_record_chars:
+                raise ImportFormatError(f"record longer than {max_record_chars} characters")
+        return ready
+
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            if len(pending) > max_record_chars:
+                raise ImportFormatError(f"record longer than {max_record_chars} characters")
+            for parsed in parse(complete([line + "\n" for line in lines])):
+                yield parsed
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportFormatError("file is not UTF-8 text")
+
+    tail = complete([pending] if pending else []) + record
+    for parsed in parse(tail):
+        yield parsed
+
+
+class CustomerImportService:
+    @staticmethod
+    def _columns(header: list) -> dict:
+        """Field name -> column index; unknown columns are ignored"""
+        columns = {}
+        for index, title in enumerate(header):
+            field = COLUMN_ALIASES.get(title.strip().lower().replace(" ", "_"))
+            if field and field not in columns:
+                columns[field] = index
+        return columns
+
+    @staticmethod
+    def _validate(values: list, columns: dict, default_limit: float) -> CustomerImportRow:
+        raw = {}
+        for field, index in columns.items():
+            value = values[index].strip() if index < len(values) else ""
+            if value:
+                raw[field] = value
+        row = CustomerImportRow.model_validate(raw)
+        if row.credit_limit is None:
+            if row.used_credit > default_limit:
+                raise ValueError("used_credit exceeds the vendor's default credit limit")
+            row.credit_limit = default_limit
+        return row
+
+    @staticmethod
+    def _upsert(row: CustomerImportRow, vendor: dict, now: datetime) -> UpdateOne:
+        return UpdateOne(
+            {"customer_phone": row.phone_number, "vendor_id": vendor["vendor_id"]},
+            {"$setOnInsert": {
+                "customer_id": new_customer_id(),
+                "customer_name": row.name,
+                "vendor_name": vendor["vendor_name"],
+                "credit_limit": row.credit_limit,
+                "used_credit": row.used_credit,
+                "available_credit": row.credit_limit - row.used_credit,
+                "transaction_count": 0,
+                "status": "active",
+                "auto_approved": False,
+                "imported": True,
+                "created_at": now,
+                "updated_at": now,
+            }},
+            upsert=True
+        )
+
+    @staticmethod
+    async def _write(vendor_id: str, batch: list, report: dict) -> None:
+        """batch: (line number, CustomerImportRow, UpdateOne) tuples"""
+        try:
+            result = await db.customer_vendor_relations.bulk_write(
+                [operation for _, _, operation in batch], ordered=False
+            )
+            inserted, matched = list(result.upserted_ids), result.matched_count
+        except BulkWriteError as e:
+            inserted = [item["index"] for item in e.details.get("upserted", [])]
+            matched = e.details.get("nMatched", 0)
+            for error in e.details.get("writeErrors", []):
+                CustomerImportService._error(report, batch[error["index"]][0], error.get("errmsg", "write failed"))
+
+        report["imported"] += len(inserted)
+        report["existing"] += matched
+        await LedgerStatsService.record_new_customers(
+            vendor_id, len(inserted), sum(batch[index][1].used_credit for index in inserted)
+        )
+
+    @staticmethod
+    def _error(report: dict, row: int, message: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < settings.IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    @staticmethod
+    async def import_csv(vendor: dict, chunks: AsyncIterator[bytes]) -> dict:
+        """
+        Import customers for vendor from CSV chunks.
+        Returns {"error": ...} when the header is unusable (nothing written).
+        A problem later in the file stops the import; rows before it stay
+        imported and "aborted" says why. Errors give the row's line number
+        in the file, the header being line 1.
+        """
+        report = {
+            "vendor_id": vendor["vendor_id"],
+            "rows": 0,
+            "imported": 0,
+            "existing": 0,
+            "failed": 0,
+            "errors": [],
+            "errors_truncated": False,
+            "aborted": None,
+        }
+        now = datetime.utcnow()
+        records = csv_records(chunks, settings.IMPORT_MAX_RECORD_CHARS)
+        batch = []
+        seen = set()  # phones in the current batch
+        line = 0
+
+        try:
+            first = await anext(records, None)
+            if first is None:
+                return {"error": "Empty file"}
+            line, header = first
+            columns = CustomerImportService._columns(header)
+            missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+            if missing:
+                return {"error": f"Missing column(s): {', '.join(missing)}"}
+
+            async for line, values in records:
+                if not any(value.strip() for value in values):
+                    continue
+                report["rows"] += 1
+                try:
+                    row = CustomerImportService._validate(
+                        values, columns, vendor["default_credit_limit"]
+                    )
+                except ValidationError as e:
+                    error = e.errors()[0]
+                    field = ".".join(str(part) for part in error["loc"]) or "row"
+                    CustomerImportService._error(report, line, f"{field}: {error['msg']}")
+                    continue
+                except ValueError as e:
+                    CustomerImportService._error(report, line, str(e))
+                    continue
+
+                # Two upserts for one phone in the same unordered batch would race
+                if row.phone_number in seen:
+                    CustomerImportService._error(report, line, "duplicate phone_number in file")
+                    continue
+                seen.add(row.phone_number)
+                batch.append((line, row, CustomerImportService._upsert(row, vendor, now)))
+
+                if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                    await CustomerImportService._write(vendor["vendor_id"], batch, report)
+                    batch, seen = [], set()
+        except ImportFormatError as e:
+            report["aborted"] = f"{e} (after line {line})"
+        except IdsUnavailable as e:
+            # The worker id lease was lost mid-import; rows so far are kept
+            report["aborted"] = f"{e} (after line {line})"
+
+        if batch:
+            await CustomerImportService._write(vendor["vendor_id"], batch, report)
+        return report
@@ -0,0 +1,52 @@
+# app/services/dashboard_service.py
+from datetime import timezone
+from typing import Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Latest known (transaction_count, ETag) per (customer_id, vendor_id).
+# Writers in this process refresh it; the short TTL bounds how long a
+# change made by another worker can go unnoticed.
+dashboard_versions = TTLCache(
+    "dashboard_version",
+    settings.DASHBOARD_VERSION_CACHE_SIZE,
+    settings.DASHBOARD_VERSION_TTL_SECONDS
+)
+
+# Enough of a relation for make_etag and remember
+VERSION_FIELDS = {"_id": 0, "customer_id": 1, "vendor_id": 1, "transaction_count": 1, "updated_at": 1}
+
+
+class DashboardService:
+    @staticmethod
+    def make_etag(relation: dict) -> str:
+        updated_at = relation["updated_at"].replace(tzinfo=timezone.utc)
+        version = int(updated_at.timestamp() * 1000)
+        return f'W/"{relation["transaction_count"]}-{version}"'
+
+    @staticmethod
+    def remember(relation: dict) -> str:
+        """Record the current version of a relation and return its ETag"""
+        key = (relation["customer_id"], relation["vendor_id"])
+        etag = DashboardService.make_etag(relation)
+        cached = dashboard_versions.get(key)
+        # Concurrent writers can finish out of order; never go back a version
+        if not cached or cached[0] <= relation["transaction_count"]:
+            dashboard_versions.set(key, (relation["transaction_count"], etag))
+        return etag
+
+    @staticmethod
+    def forget(customer_id: str, vendor_id: str) -> None:
+        dashboard_versions.delete((customer_id, vendor_id))
+
+    @staticmethod
+    def cached_etag(customer_id: str, vendor_id: str) -> Optional[str]:
+        cached = dashboard_versions.get((customer_id, vendor_id))
+        return cached[1] if cached else None
+
+    @staticmethod
+    def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
@@ -0,0 +1,317 @@
+# app/services/dashboard_stream.py
+"""
+Dashboard push over WebSocket.
+
+Each process runs one change stream on the database, filtered to
+customer_vendor_relations writes and transaction inserts, and fans the
+changes out to its subscribers. A subscriber follows either one customer
+(optionally one vendor of that customer) or every relation of one vendor.
+Subscribers are indexed by customer_id and vendor_id, so a change costs
+two dict lookups however many sockets are open.
+
+The stream does not ask for updateLookup. Relation updates carry only the
+changed fields, so the hub maps relation _ids to their (customer_id,
+vendor_id). The mapping is filled from the snapshot each subscriber gets on
+connect and from relation inserts. A change then costs the database
+nothing beyond the stream itself. Each event is encoded once and the same
+text is queued for every socket it goes to.
+
+Every socket has a queue of DASHBOARD_WS_QUEUE_SIZE messages. A client that
+falls that far behind is dropped: its socket is closed with 1013 (try again
+later). The client reconnects and gets a fresh snapshot. Nothing is
+buffered without bound, and one slow phone cannot hold up the rest.
+
+Standalone servers have no change streams. There, TransactionService
+publishes its own payments to the hub instead, which only covers this
+process.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional
+from pymongo.errors import PyMongoError
+from starlette.websockets import WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.core.database import db
+from app.core.metrics import Counter, Gauge
+from app.services.archive_service import SUMMARY_TYPE
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_WS_SUBSCRIBERS = Gauge("dashboard_ws_subscribers", "Open dashboard WebSocket subscriptions")
+DASHBOARD_WS_MESSAGES = Counter("dashboard_ws_messages_total", "Dashboard events queued for subscribers")
+DASHBOARD_WS_DROPPED = Counter(
+    "dashboard_ws_dropped_total", "Dashboard subscribers dropped", ("reason",)
+)
+
+DASHBOARD_FIELDS = (
+    "customer_id", "customer_name", "vendor_id", "vendor_name",
+    "credit_limit", "used_credit", "available_credit", "transaction_count",
+)
+
+STREAM_PIPELINE = [
+    {"$match": {"$or": [
+        {"ns.coll": "transactions", "operationType": "insert",
+         "fullDocument.transaction_type": {"$ne": SUMMARY_TYPE}},
+        {"ns.coll": "customer_vendor_relations", "operationType": {"$in": ["insert", "update", "replace"]}},
+    ]}},
+]
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_POLICY_VIOLATION = 1008
+
+
+def encode(event: dict) -> str:
+    if orjson is None:
+        return json.dumps(event, default=str)
+    return orjson.dumps(event, default=str).decode()
+
+
+def relation_event(relation: dict) -> dict:
+    return {"type": "dashboard", **{field: relation.get(field) for field in DASHBOARD_FIELDS}}
+
+
+def transaction_event(transaction: dict) -> dict:
+    return {
+        "type": "transaction",
+        "transaction_id": str(transaction["_id"]),
+        "customer_id": transaction["customer_id"],
+        "vendor_id": transaction["vendor_id"],
+        "amount": transaction["amount"],
+        "transaction_type": transaction["transaction_type"],
+        "description": transaction.get("description"),
+        "created_at": transaction["created_at"].isoformat(),
+    }
+
+
+class Subscriber:
+    def __init__(self, customer_id: Optional[str], vendor_id: Optional[str], queue_size: int):
+        self.customer_id = customer_id
+        self.vendor_id = vendor_id
+        self.queue = asyncio.Queue(queue_size)
+        self.relation_ids = set()
+        self.dropped = False
+
+    def offer(self, message: str) -> None:
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: discard the backlog and tell the sender to close
+            self.dropped = True
+            DASHBOARD_WS_DROPPED.inc(("slow_consumer",))
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class DashboardHub:
+    def __init__(self, max_subscribers: int, queue_size: int):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._by_customer = {}  # customer_id -> {Subscriber}
+        self._by_vendor = {}    # vendor_id -> {Subscriber following the whole vendor}
+        self._relations = {}    # relation _id -> (customer_id, vendor_id)
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        # True when the change stream is unavailable and writers publish directly
+        self.local_publish = False
+
+    # ============ SUBSCRIPTIONS ============
+
+    def subscribe(self, customer_id: Optional[str], vendor_id: Optional[str]) -> Optional[Subscriber]:
+        """Register a subscriber; None when this process is at its limit"""
+        if self._count >= self.max_subscribers:
+            DASHBOARD_WS_DROPPED.inc(("full",))
+            return None
+        subscriber = Subscriber(customer_id, vendor_id, self.queue_size)
+        if customer_id:
+            self._by_customer.setdefault(customer_id, set()).add(subscriber)
+        else:
+            self._by_vendor.setdefault(vendor_id, set()).add(subscriber)
+        self._count += 1
+        DASHBOARD_WS_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        index, key = (
+            (self._by_customer, subscriber.customer_id) if subscriber.customer_id
+            else (self._by_vendor, subscriber.vendor_id)
+        )
+        followers = index.get(key)
+        if not followers or subscriber not in followers:
+            return
+        followers.discard(subscriber)
+        if not followers:
+            del index[key]
+        self._count -= 1
+        DASHBOARD_WS_SUBSCRIBERS.dec()
+        for relation_id in subscriber.relation_ids:
+            keys = self._relations.get(relation_id)
+            if keys and not self.followed(*keys):
+                del self._relations[relation_id]
+
+    async def snapshot(self, subscriber: Subscriber) -> list:
+        """
+        Current relations the subscriber follows, as dashboard events.
+        Called after subscribe(), so no change made after the read is missed.
+        """
+        query = {}
+        if subscriber.customer_id:
+            query["customer_id"] = subscriber.customer_id
+        if subscriber.vendor_id:
+            query["vendor_id"] = subscriber.vendor_id
+        projection = {field: 1 for field in DASHBOARD_FIELDS}
+        events = []
+        async for relation in db.customer_vendor_relations.find(query, projection):
+            self._track(relation, [subscriber])
+            events.append(relation_event(relation))
+        return events
+
+    def followed(self, customer_id: str, vendor_id: str) -> bool:
+        """Whether any subscriber here would receive this relation's changes"""
+        return customer_id in self._by_customer or vendor_id in self._by_vendor
+
+    def _targets(self, customer_id: str, vendor_id: str) -> list:
+        targets = [
+            subscriber for subscriber in self._by_customer.get(customer_id, ())
+            if subscriber.vendor_id in (None, vendor_id)
+        ]
+        targets.extend(self._by_vendor.get(vendor_id, ()))
+        return targets
+
+    def _track(self, relation: dict, subscribers: list) -> None:
+        self._relations[relation["_id"]] = (relation["customer_id"], relation["vendor_id"])
+        for subscriber in subscribers:
+            subscriber.relation_ids.add(relation["_id"])
+
+    # ============ PUBLISHING ============
+
+    def _deliver(self, targets: list, event: dict) -> None:
+        message = encode(event)
+        for subscriber in targets:
+            subscriber.offer(message)
+        DASHBOARD_WS_MESSAGES.inc(amount=len(targets))
+
+    def publish_relation(self, relation: dict) -> None:
+        targets = self._targets(relation["customer_id"], relation["vendor_id"])
+        if targets:
+            self._track(relation, targets)
+            self._deliver(targets, relation_event(relation))
+
+    def publish_transaction(self, transaction: dict) -> None:
+        targets = self._targets(transaction["customer_id"], transaction["vendor_id"])
+        if targets:
+            self._deliver(targets, transaction_event(transaction))
+
+    def _publish_relation_update(self, relation_id, updated_fields: dict) -> None:
+        keys = self._relations.get(relation_id)
+        if keys is None:
+            return
+        changed = {field: updated_fields[field] for field in DASHBOARD_FIELDS if field in updated_fields}
+        targets = self._targets(*keys)
+        if changed and targets:
+            customer_id, vendor_id = keys
+            self._deliver(targets, {
+                "type": "dashboard", "customer_id": customer_id, "vendor_id": vendor_id, **changed
+            })
+
+    def handle_change(self, change: dict) -> None:
+        if change["ns"]["coll"] == "transactions":
+            self.publish_transaction(change["fullDocument"])
+        elif change["operationType"] == "update":
+            self._publish_relation_update(
+                change["documentKey"]["_id"], change["updateDescription"]["updatedFields"]
+            )
+        else:
+            self.publish_relation(change["fullDocument"])
+
+    # ============ CHANGE STREAM ============
+
+    async def _watch_change_stream(self) -> None:
+        async with db.watch(STREAM_PIPELINE, resume_after=self._resume_token) as stream:
+            async for change in stream:
+                self._resume_token = stream.resume_token
+                self.handle_change(change)
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self._watch_change_stream()
+            except PyMongoError as e:
+                if "replica set" in str(e) or getattr(e, "code", None) == 40573:
+                    logger.info("Change streams unavailable, dashboard push covers local writes only")
+                    self.local_publish = True
+                    return
+                # e.g. the resume token fell off the oplog; start from now
+                if getattr(e, "code", None) == 286:
+                    self._resume_token = None
+                logger.warning("Dashboard change stream interrupted: %s", e)
+                await asyncio.sleep(1)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ============ SOCKETS ============
+
+    @staticmethod
+    async def _send(websocket: WebSocket, subscriber: Subscriber) -> None:
+        while True:
+            message = await subscriber.queue.get()
+            if message is None:
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="slow consumer")
+                return
+            await websocket.send_text(message)
+
+    @staticmethod
+    async def _receive(websocket: WebSocket) -> None:
+        """Client messages are ignored; this only notices the disconnect"""
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    async def serve(self, websocket: WebSocket, customer_id: Optional[str],
+                    vendor_id: Optional[str]) -> None:
+        """Run one subscription: snapshot first, then changes until either side leaves"""
+        await websocket.accept()
+        if not customer_id and not vendor_id:
+            await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="customer_id or vendor_id required")
+            return
+        subscriber = self.subscribe(customer_id, vendor_id)
+        if subscriber is None:
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="too many subscribers")
+            return
+
+        tasks = []
+        try:
+            relations = await self.snapshot(subscriber)
+            await websocket.send_text(encode({"type": "snapshot", "relations": relations}))
+            tasks = [
+                asyncio.create_task(self._send(websocket, subscriber)),
+                asyncio.create_task(self._receive(websocket)),
+            ]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        except (WebSocketDisconnect, RuntimeError):
+            # The client went away mid-send
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.unsubscribe(subscriber)
+
+
+dashboard_hub = DashboardHub(settings.DASHBOARD_WS_MAX_SUBSCRIBERS, settings.DASHBOARD_WS_QUEUE_SIZE)
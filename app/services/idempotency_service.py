@@ -0,0 +1,174 @@
+# app/services/idempotency_service.py
+"""
+Idempotency-Key support for retry-prone writes.
+
+The first request with a key claims it in the idempotency_keys collection,
+runs the operation and stores the response. Retries with the same key get
+the stored response back without running the operation again. Concurrent
+requests with the same key inside one process share a single in-flight
+execution, so only one of them reaches MongoDB.
+
+Each key gets an operation_id when first claimed. The operation receives
+it and must be idempotent on it: it stamps its writes with the id, and run
+again with resumed=True it finishes or replays what an earlier attempt
+wrote instead of writing twice (see TransactionService.pay_on_credit).
+
+A result with an "error" key means nothing was written, so the key is
+released and the client can retry for real. Anything else that stops the
+run (an exception, a cancellation, a failed completion write, a dead
+process) may have left writes behind. The key then stays in progress:
+after an exception its lease ends at once, otherwise when locked_until
+(IDEMPOTENCY_LOCK_SECONDS) runs out. The next retry takes the key over and
+resumes the operation under the same operation_id. Each claim has its own
+id, so a run that was taken over cannot complete the key. Keys expire
+after IDEMPOTENCY_TTL_SECONDS.
+"""
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import db
+
+# Completed responses, so hot retries skip the database as well
+completed_cache = TTLCache(
+    "idempotency",
+    settings.IDEMPOTENCY_CACHE_SIZE,
+    settings.IDEMPOTENCY_CACHE_TTL_SECONDS
+)
+
+
+# operation(operation_id, resumed) -> result
+Operation = Callable[[ObjectId, bool], Awaitable[dict]]
+
+
+def fingerprint(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyService:
+    _in_flight = {}  # key -> asyncio.Future
+
+    @staticmethod
+    def _replay(doc: dict, request_fingerprint: str) -> dict:
+        if doc["fingerprint"] != request_fingerprint:
+            return {"error": "key_reused"}
+        if doc["status"] != "completed":
+            return {"error": "in_progress"}
+        return doc["response"]
+
+    @staticmethod
+    async def _claim(key: str, request_fingerprint: str, claim_id: ObjectId) -> tuple:
+        """
+        Claim the key for this request. Returns (None, operation_id, resumed)
+        once claimed, otherwise (response to give instead, None, False).
+        """
+        now = datetime.utcnow()
+        locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": key,
+                "status": "in_progress",
+                "fingerprint": request_fingerprint,
+                "operation_id": claim_id,
+                "claim": claim_id,
+                "locked_until": locked_until,
+                "created_at": now,
+            })
+            return None, claim_id, False
+        except DuplicateKeyError:
+            existing = await db.idempotency_keys.find_one({"_id": key})
+        if existing is None:
+            # Released between our insert and read; treat as in progress
+            return {"error": "in_progress"}, None, False
+        if existing["status"] == "completed":
+            completed_cache.set(key, existing)
+            return IdempotencyService._replay(existing, request_fingerprint), None, False
+        if existing["fingerprint"] != request_fingerprint:
+            return {"error": "key_reused"}, None, False
+
+        expires = existing.get("locked_until") or (
+            existing["created_at"] + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        )
+        if expires > now:
+            return {"error": "in_progress"}, None, False
+        # The earlier attempt stopped mid-run: take over, unless another retry just did
+        operation_id = existing.get("operation_id") or claim_id
+        taken = await db.idempotency_keys.update_one(
+            {"_id": key, "status": "in_progress", "claim": existing.get("claim")},
+            {"$set": {"operation_id": operation_id, "claim": claim_id, "locked_until": locked_until}}
+        )
+        if not taken.modified_count:
+            return {"error": "in_progress"}, None, False
+        # Keys claimed before operation ids existed have nothing to resume
+        return None, operation_id, "operation_id" in existing
+
+    @staticmethod
+    async def _execute(key: str, request_fingerprint: str, operation: Operation) -> dict:
+        cached = completed_cache.get(key)
+        if cached is not None:
+            return IdempotencyService._replay(cached, request_fingerprint)
+
+        claim_id = ObjectId()
+        refused, operation_id, resumed = await IdempotencyService._claim(
+            key, request_fingerprint, claim_id
+        )
+        if refused is not None:
+            return refused
+        ours = {"_id": key, "status": "in_progress", "claim": claim_id}
+
+        try:
+            result = await operation(operation_id, resumed)
+        except BaseException:
+            # Writes may have happened: keep the key, but let a retry resume now
+            await db.idempotency_keys.update_one(ours, {"$set": {"locked_until": datetime.utcnow()}})
+            raise
+
+        if "error" in result:
+            await db.idempotency_keys.delete_one(ours)
+            return result
+
+        doc = {"status": "completed", "fingerprint": request_fingerprint, "response": result}
+        stored = await db.idempotency_keys.update_one(
+            ours,
+            {"$set": {"status": "completed", "response": result, "completed_at": datetime.utcnow()}}
+        )
+        # Not ours any more if a retry took over; its run decides the response
+        if stored.matched_count:
+            completed_cache.set(key, doc)
+        return result
+
+    @staticmethod
+    async def execute(scope: str, idempotency_key: str, request_fingerprint: str,
+                      operation: Operation) -> dict:
+        """
+        Run operation at most once per (scope, idempotency_key).
+        operation(operation_id, resumed) must be idempotent on operation_id.
+        Returns the operation's result, the stored result of an earlier
+        run, or {"error": "in_progress" | "key_reused"}.
+        """
+        key = f"{scope}:{idempotency_key}"
+
+        in_flight = IdempotencyService._in_flight.get(key)
+        if in_flight is not None:
+            if in_flight.fingerprint != request_fingerprint:
+                return {"error": "key_reused"}
+            # Same request already running here: share its outcome
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        future.fingerprint = request_fingerprint
+        IdempotencyService._in_flight[key] = future
+        try:
+            result = await IdempotencyService._execute(key, request_fingerprint, operation)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here; waiters still see it
+            raise
+        finally:
+            IdempotencyService._in_flight.pop(key, None)
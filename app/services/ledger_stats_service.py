@@ -0,0 +1,254 @@
+# app/services/ledger_stats_service.py
+"""
+Pre-aggregated vendor ledger figures.
+
+vendor_totals (one document per vendor, _id = vendor_id) and
+vendor_daily_stats (one per vendor per UTC day) are maintained with $inc
+upserts by the payment and registration paths, so a vendor summary is a
+couple of point reads no matter how long the history is.
+
+The counters are best effort: a failed increment is logged, not raised.
+reconcile() recomputes everything from transactions and
+customer_vendor_relations and reports (optionally fixes) any drift:
+
+    python -m app.services.ledger_stats_service [--apply]
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+from app.core.database import db
+from app.services.archive_service import TransactionArchiveService
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 500
+TOTAL_FIELDS = ("outstanding_credit", "total_credit_sales", "transaction_count",
+                "customer_count", "active_customer_count")
+
+
+def day_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+
+class LedgerStatsService:
+    @staticmethod
+    async def record_purchases(vendor_id: str, purchases: list) -> None:
+        """Count (amount, created_at) purchases that were just written"""
+        if not purchases:
+            return
+        now = datetime.utcnow()
+        total = sum(amount for amount, _ in purchases)
+
+        by_day = {}
+        for amount, created_at in purchases:
+            day = day_key(created_at)
+            day_total, count = by_day.get(day, (0.0, 0))
+            by_day[day] = (day_total + amount, count + 1)
+
+        try:
+            await asyncio.gather(
+                db.vendor_totals.update_one(
+                    {"_id": vendor_id},
+                    {
+                        "$inc": {
+                            "outstanding_credit": total,
+                            "total_credit_sales": total,
+                            "transaction_count": len(purchases),
+                        },
+                        "$set": {"updated_at": now},
+                    },
+                    upsert=True
+                ),
+                db.vendor_daily_stats.bulk_write([
+                    UpdateOne(
+                        {"_id": f"{vendor_id}:{day}"},
+                        {
+                            "$inc": {"credit_sales": day_total, "transaction_count": count},
+                            "$setOnInsert": {"vendor_id": vendor_id, "day": day},
+                        },
+                        upsert=True
+                    )
+                    for day, (day_total, count) in by_day.items()
+                ], ordered=False),
+            )
+        except PyMongoError as e:
+            logger.warning("Could not update ledger stats for %s: %s", vendor_id, e)
+
+    @staticmethod
+    async def record_new_customers(vendor_id: str, count: int = 1,
+                                   outstanding: float = 0.0) -> None:
+        """outstanding: opening balances the new customers arrive with"""
+        if not count:
+            return
+        increments = {"customer_count": count, "active_customer_count": count}
+        if outstanding:
+            increments["outstanding_credit"] = outstanding
+        try:
+            await db.vendor_totals.update_one(
+                {"_id": vendor_id},
+                {
+                    "$inc": increments,
+                    "$set": {"updated_at": datetime.utcnow()},
+                },
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.warning("Could not update customer count for %s: %s", vendor_id, e)
+
+    @staticmethod
+    async def get_summary(vendor_id: str, days: int = 7) -> dict:
+        """Totals plus the last `days` days of sales: O(days) point reads"""
+        totals = await db.vendor_totals.find_one({"_id": vendor_id}) or {}
+
+        today = datetime.utcnow()
+        day_keys = [day_key(today - timedelta(days=offset)) for offset in range(days)]
+        stats = {}
+        cursor = db.vendor_daily_stats.find(
+            {"_id": {"$in": [f"{vendor_id}:{day}" for day in day_keys]}}
+        )
+        async for doc in cursor:
+            stats[doc["day"]] = doc
+
+        summary = {field: totals.get(field, 0) for field in TOTAL_FIELDS}
+        summary["vendor_id"] = vendor_id
+        summary["daily"] = [
+            {
+                "day": day,
+                "credit_sales": stats.get(day, {}).get("credit_sales", 0.0),
+                "transaction_count": stats.get(day, {}).get("transaction_count", 0),
+            }
+            for day in day_keys
+        ]
+        return summary
+
+    # ============ REBUILD / RECONCILE ============
+
+    @staticmethod
+    async def _actual_for_vendors(vendor_ids: list, relation_totals: dict) -> tuple:
+        """Recompute totals and daily stats for one batch of vendors"""
+        totals = {
+            vendor_id: {
+                "outstanding_credit": relation_totals[vendor_id]["outstanding_credit"],
+                "customer_count": relation_totals[vendor_id]["customer_count"],
+                "active_customer_count": relation_totals[vendor_id]["active_customer_count"],
+                "total_credit_sales": 0.0,
+                "transaction_count": 0,
+            }
+            for vendor_id in vendor_ids
+        }
+        daily = {}
+
+        pipeline = [
+            {"$match": {"vendor_id": {"$in": vendor_ids}, "transaction_type": "credit_purchase"}},
+            {"$group": {
+                "_id": {
+                    "vendor_id": "$vendor_id",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                },
+                "credit_sales": {"$sum": "$amount"},
+                "transaction_count": {"$sum": 1},
+            }},
+        ]
+        # Archived months are read from their archives, not the summary
+        # rows, to keep daily figures exact
+        for collection in await TransactionArchiveService.transaction_collections():
+            async for row in db[collection].aggregate(pipeline, allowDiskUse=True):
+                vendor_id, day = row["_id"]["vendor_id"], row["_id"]["day"]
+                totals[vendor_id]["total_credit_sales"] += row["credit_sales"]
+                totals[vendor_id]["transaction_count"] += row["transaction_count"]
+                # While a month is being archived its days span both tiers
+                stats = daily.setdefault(f"{vendor_id}:{day}", {
+                    "vendor_id": vendor_id, "day": day, "credit_sales": 0.0, "transaction_count": 0,
+                })
+                stats["credit_sales"] += row["credit_sales"]
+                stats["transaction_count"] += row["transaction_count"]
+        return totals, daily
+
+    @staticmethod
+    def _differs(stored, actual) -> bool:
+        if isinstance(actual, float) or isinstance(stored, float):
+            return abs((stored or 0) - actual) > 0.005
+        return (stored or 0) != actual
+
+    @staticmethod
+    async def _reconcile_batch(vendor_ids: list, relation_totals: dict, apply: bool) -> list:
+        totals, daily = await LedgerStatsService._actual_for_vendors(vendor_ids, relation_totals)
+        drift = []
+
+        stored_totals = {}
+        async for doc in db.vendor_totals.find({"_id": {"$in": vendor_ids}}):
+            stored_totals[doc["_id"]] = doc
+        for vendor_id, actual in totals.items():
+            stored = stored_totals.get(vendor_id, {})
+            for field, value in actual.items():
+                if LedgerStatsService._differs(stored.get(field), value):
+                    drift.append((vendor_id, field, stored.get(field), value))
+
+        stored_daily = {}
+        async for doc in db.vendor_daily_stats.find({"vendor_id": {"$in": vendor_ids}}):
+            stored_daily[doc["_id"]] = doc
+        for key in set(daily) | set(stored_daily):
+            actual = daily.get(key, {})
+            stored = stored_daily.get(key, {})
+            for field in ("credit_sales", "transaction_count"):
+                if LedgerStatsService._differs(stored.get(field), actual.get(field, 0)):
+                    drift.append((key, field, stored.get(field), actual.get(field, 0)))
+
+        if apply and drift:
+            now = datetime.utcnow()
+            await db.vendor_totals.bulk_write([
+                ReplaceOne({"_id": vendor_id}, {**actual, "updated_at": now}, upsert=True)
+                for vendor_id, actual in totals.items()
+            ], ordered=False)
+            operations = [ReplaceOne({"_id": key}, doc, upsert=True) for key, doc in daily.items()]
+            if operations:
+                await db.vendor_daily_stats.bulk_write(operations, ordered=False)
+            stale = [key for key in stored_daily if key not in daily]
+            if stale:
+                await db.vendor_daily_stats.delete_many({"_id": {"$in": stale}})
+
+        return drift
+
+    @staticmethod
+    async def reconcile(apply: bool = False, batch_size: int = RECONCILE_BATCH_SIZE) -> list:
+        """
+        Recompute every vendor's aggregates from raw data, batch_size vendors
+        at a time, and return (key, field, stored, actual) for every mismatch.
+        With apply=True the stored aggregates are overwritten.
+        """
+        pipeline = [
+            {"$group": {
+                "_id": "$vendor_id",
+                "outstanding_credit": {"$sum": "$used_credit"},
+                "customer_count": {"$sum": 1},
+                "active_customer_count": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}
+                },
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        drift = []
+        batch = {}
+        async for row in db.customer_vendor_relations.aggregate(pipeline, allowDiskUse=True):
+            batch[row["_id"]] = row
+            if len(batch) >= batch_size:
+                drift.extend(await LedgerStatsService._reconcile_batch(list(batch), batch, apply))
+                batch = {}
+        if batch:
+            drift.extend(await LedgerStatsService._reconcile_batch(list(batch), batch, apply))
+        return drift
+
+
+async def _main(apply: bool) -> int:
+    drift = await LedgerStatsService.reconcile(apply=apply)
+    for key, field, stored, actual in drift:
+        print(f"DRIFT {key} {field}: stored={stored} actual={actual}")
+    print(f"{len(drift)} drifted values{' fixed' if apply and drift else ''}")
+    return 1 if drift and not apply else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--apply" in sys.argv)))
@@ -0,0 +1,168 @@
+# app/services/otp_service.py
+"""
+OTP storage.
+
+OTPStore is the interface used by the OTP and registration routes. Two
+backends exist:
+
+- MemoryOTPStore keeps codes in a dict with a min-heap of expiry times, so
+  expired codes are evicted in O(log n) and memory is capped. Codes are
+  only visible to the worker that issued them.
+- MongoOTPStore keeps codes in the otp_codes collection keyed by phone
+  number, with a TTL index, so every worker sees the same codes.
+
+settings.OTP_STORE selects the backend ("memory" or "mongo").
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from app.core.config import settings
+from app.core.database import db
+
+
+class OTPStore:
+    """Interface for OTP backends"""
+
+    async def save(self, phone_number: str, otp: str, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def get(self, phone_number: str) -> Optional[str]:
+        """Return the live OTP for a phone number, if any"""
+        raise NotImplementedError
+
+    async def consume(self, phone_number: str, otp: str) -> bool:
+        """Atomically check and delete an OTP. True if it matched."""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryOTPStore(OTPStore):
+    """In-process backend with heap-based expiry and a size cap"""
+
+    def __init__(self, max_entries: int, sweep_interval: float = 5.0):
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._entries = {}  # phone -> (otp, expires_at)
+        self._expiry_heap = []  # (expires_at, phone), may hold stale entries
+        self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, phone = heapq.heappop(heap)
+            entry = self._entries.get(phone)
+            # Skip heap entries left behind by a re-sent OTP
+            if entry and entry[1] == expires_at:
+                del self._entries[phone]
+
+    def _evict_oldest(self) -> None:
+        heap = self._expiry_heap
+        while heap:
+            expires_at, phone = heapq.heappop(heap)
+            entry = self._entries.get(phone)
+            if entry and entry[1] == expires_at:
+                del self._entries[phone]
+                return
+
+    def _compact(self) -> None:
+        """Drop stale heap entries once they outnumber live ones"""
+        if len(self._expiry_heap) > 2 * len(self._entries) + 1024:
+            self._expiry_heap = [
+                (expires_at, phone) for phone, (_, expires_at) in self._entries.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+
+    async def save(self, phone_number: str, otp: str, ttl: int) -> None:
+        now = time.monotonic()
+        self._evict_expired(now)
+        if phone_number not in self._entries and len(self._entries) >= self.max_entries:
+            self._evict_oldest()
+
+        expires_at = now + ttl
+        self._entries[phone_number] = (otp, expires_at)
+        heapq.heappush(self._expiry_heap, (expires_at, phone_number))
+        self._compact()
+
+    async def get(self, phone_number: str) -> Optional[str]:
+        entry = self._entries.get(phone_number)
+        if not entry:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[phone_number]
+            return None
+        return entry[0]
+
+    async def consume(self, phone_number: str, otp: str) -> bool:
+        if await self.get(phone_number) != otp:
+            return False
+        del self._entries[phone_number]
+        return True
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self._evict_expired(time.monotonic())
+            self._compact()
+
+    async def start(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+
+class MongoOTPStore(OTPStore):
+    """
+    Shared backend on the otp_codes collection.
+    The TTL monitor only runs about once a minute, so reads also filter on
+    expires_at to enforce the exact expiry.
+    """
+
+    async def save(self, phone_number: str, otp: str, ttl: int) -> None:
+        now = datetime.utcnow()
+        await db.otp_codes.replace_one(
+            {"_id": phone_number},
+            {
+                "otp": otp,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl),
+            },
+            upsert=True
+        )
+
+    async def get(self, phone_number: str) -> Optional[str]:
+        doc = await db.otp_codes.find_one({
+            "_id": phone_number,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        return doc["otp"] if doc else None
+
+    async def consume(self, phone_number: str, otp: str) -> bool:
+        doc = await db.otp_codes.find_one_and_delete({
+            "_id": phone_number,
+            "otp": otp,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        return doc is not None
+
+
+def build_otp_store() -> OTPStore:
+    if settings.OTP_STORE == "mongo":
+        return MongoOTPStore()
+    return MemoryOTPStore(max_entries=settings.OTP_MEMORY_MAX_ENTRIES)
+
+
+otp_store = build_otp_store()
@@ -0,0 +1,532 @@
+# app/services/transaction_service.py
+import base64
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, WriteError
+from app.core.config import settings
+from app.core.database import db
+from app.models.customer_vendor_model import Transaction
+from app.services.archive_service import SUMMARY_TYPE, TransactionArchiveService
+from app.services.dashboard_service import DashboardService
+from app.services.dashboard_stream import DASHBOARD_FIELDS, dashboard_hub
+from app.services.ledger_stats_service import LedgerStatsService
+from app.services.transaction_writer import transaction_writer
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Newest first; (created_at, _id) is unique so it can serve as a cursor
+HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+# Payment ids kept on a relation, so a resumed payment can tell whether its
+# debit already happened; far more than can land within one lease
+RECENT_PAYMENT_IDS = 50
+# Batch stamps kept on a relation, for the same reason
+RECENT_BATCHES = 20
+DUPLICATE_KEY = 11000
+
+
+class TransactionService:
+    @staticmethod
+    async def debit_credit(customer_id: str, vendor_id: str, amount: float,
+                           session=None, payment_id: Optional[ObjectId] = None) -> Optional[dict]:
+        """
+        Guarded debit of a customer-vendor relation.
+        Only matches when available_credit covers the amount, so concurrent
+        payments can never push the relation below zero. With a payment_id,
+        the id is recorded in the same write and a second debit for it
+        does not match.
+        Returns the updated relation, or None when the guard did not match.
+        """
+        query = {
+            "customer_id": customer_id,
+            "vendor_id": vendor_id,
+            "available_credit": {"$gte": amount},
+        }
+        update = {
+            "$inc": {
+                "used_credit": amount,
+                "available_credit": -amount,
+                "transaction_count": 1,
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        }
+        if payment_id is not None:
+            query["recent_payment_ids"] = {"$ne": payment_id}
+            update["$push"] = {"recent_payment_ids": {"$each": [payment_id], "$slice": -RECENT_PAYMENT_IDS}}
+        return await db.customer_vendor_relations.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER, session=session,
+        )
+
+    @staticmethod
+    async def _transaction_written(transaction_id: ObjectId) -> Optional[bool]:
+        """
+        After an insert failed without a verdict: whether the row exists,
+        or None when that cannot be checked either. Then nothing is
+        refunded, so a recorded purchase is never refunded; the error is
+        logged for reconciliation.
+        """
+        try:
+            return await db.transactions.find_one({"_id": transaction_id}, {"_id": 1}) is not None
+        except PyMongoError as e:
+            logger.error("Transaction %s: insert and check both failed, not refunding: %s",
+                         transaction_id, e)
+            return None
+
+    @staticmethod
+    async def refund_credit(relation_id: ObjectId, amount: float,
+                            payment_id: Optional[ObjectId] = None) -> None:
+        """
+        Undo a debit whose transaction record could not be written. Its
+        payment_id is dropped too, so a retry debits again.
+        """
+        update = {
+            "$inc": {
+                "used_credit": -amount,
+                "available_credit": amount,
+                "transaction_count": -1,
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        }
+        if payment_id is not None:
+            update["$pull"] = {"recent_payment_ids": payment_id}
+        await db.customer_vendor_relations.update_one({"_id": relation_id}, update)
+
+    @staticmethod
+    async def pay_on_credit(customer_id: str, vendor_id: str, amount: float,
+                            description: Optional[str] = None, session=None,
+                            payment_id: Optional[ObjectId] = None, resumed: bool = False) -> dict:
+        """
+        Debit the relation and record the transaction as one logical operation.
+        The happy path costs two writes and no reads; the relation is only
+        re-read when the guarded debit fails, to tell a missing relation apart
+        from insufficient credit.
+        The debit runs in session when one is given, so a causally
+        consistent read of the relation can follow it.
+
+        A payment_id (the Idempotency-Key's operation id) makes the payment
+        idempotent: it is stamped on the relation with the debit and is the
+        transaction's _id. resumed=True means an earlier attempt with this
+        id may have written either; what it wrote is kept, not repeated. An
+        error result means nothing was written.
+        """
+        if resumed:
+            done = await db.transactions.find_one({"_id": payment_id}, {"_id": 1})
+            if done:
+                relation = await db.customer_vendor_relations.find_one(
+                    {"customer_id": customer_id, "vendor_id": vendor_id}
+                )
+                return {"transaction_id": str(payment_id), "relation": relation}
+
+        relation = await TransactionService.debit_credit(
+            customer_id, vendor_id, amount, session, payment_id
+        )
+
+        if not relation:
+            existing = await db.customer_vendor_relations.find_one(
+                {"customer_id": customer_id, "vendor_id": vendor_id},
+                None if payment_id else {"available_credit": 1},
+            )
+            if not existing:
+                return {"error": "not_found"}
+            if payment_id is None or payment_id not in existing.get("recent_payment_ids", []):
+                return {
+                    "error": "insufficient_credit",
+                    "available_credit": existing["available_credit"],
+                }
+            # Debited by an earlier attempt that stopped before the record
+            relation = existing
+
+        transaction_doc = Transaction.make_transaction_doc({
+            "customer_id": customer_id,
+            "vendor_id": vendor_id,
+            "amount": amount,
+            "description": description or "Purchase on credit",
+        })
+        transaction_doc["_id"] = payment_id or ObjectId()
+
+        try:
+            # Batched with concurrent payments when group commit is on
+            await transaction_writer.insert(transaction_doc)
+        except WriteError as e:
+            if payment_id is None or e.code != DUPLICATE_KEY:
+                # Rejected, so not written: keep the ledger and the relation in step
+                await TransactionService.refund_credit(relation["_id"], amount, payment_id)
+                DashboardService.forget(customer_id, vendor_id)
+                raise
+            # An earlier attempt recorded it already
+            return {"transaction_id": str(payment_id), "relation": relation}
+        except Exception:
+            # e.g. a dropped connection: the record may have been written.
+            # With a payment_id the debit stays and a retry resumes it.
+            written = None if payment_id else await TransactionService._transaction_written(transaction_doc["_id"])
+            if not written:
+                DashboardService.forget(customer_id, vendor_id)
+                if written is False:
+                    await TransactionService.refund_credit(relation["_id"], amount)
+                raise
+            # It was written after all: the payment went through
+
+        DashboardService.remember(relation)
+        if dashboard_hub.local_publish:
+            # No change stream to pick this up
+            dashboard_hub.publish_relation(relation)
+            dashboard_hub.publish_transaction(transaction_doc)
+        await LedgerStatsService.record_purchases(
+            vendor_id, [(amount, transaction_doc["created_at"])]
+        )
+
+        return {
+            "transaction_id": str(transaction_doc["_id"]),
+            "relation": relation,
+        }
+
+    @staticmethod
+    async def pay_on_credit_batch(items: list, batch_id: Optional[ObjectId] = None,
+                                  resumed: bool = False) -> list:
+        """
+        Apply a batch of payments with one read, one bulk_write and one
+        insert_many, regardless of how many relations are involved.
+
+        Items are checked in order against each relation's available credit;
+        an item that would overdraw its relation is rejected and later items
+        for the same relation are still considered. Returns one result dict
+        per item, in input order.
+
+        Each debit stamps its relation with the batch id and the item indexes
+        it covers, in the same write. With resumed=True (an Idempotency-Key
+        taking over an interrupted batch), stamped relations are not debited
+        again and only their missing transaction rows are written.
+        """
+        results = [None] * len(items)
+        batch_id = batch_id or ObjectId()
+        keys = {(item["customer_id"], item["vendor_id"]) for item in items}
+
+        relations = {}
+        debited = {}  # key -> group an earlier attempt already debited
+        if resumed:
+            relations, debited = await TransactionService._stamped_groups(batch_id, keys)
+
+        fresh = keys - set(debited)
+        if fresh:
+            cursor = db.customer_vendor_relations.find(
+                {"$or": [{"customer_id": c, "vendor_id": v} for c, v in fresh]},
+                {"customer_id": 1, "vendor_id": 1, "available_credit": 1}
+            )
+            async for relation in cursor:
+                relations[(relation["customer_id"], relation["vendor_id"])] = relation
+
+        # One pass: accept items while the running total fits the credit
+        groups = {}  # key -> {"total", "indexes"}
+        for index, item in enumerate(items):
+            key = (item["customer_id"], item["vendor_id"])
+            if key in debited:
+                continue
+            relation = relations.get(key)
+            if not relation:
+                results[index] = {"error": "not_found"}
+                continue
+            group = groups.setdefault(key, {"total": 0.0, "indexes": []})
+            remaining = relation["available_credit"] - group["total"]
+            if item["amount"] > remaining:
+                results[index] = {"error": "insufficient_credit", "available_credit": remaining}
+                continue
+            group["total"] += item["amount"]
+            group["indexes"].append(index)
+            results[index] = {"new_balance": remaining - item["amount"]}
+
+        groups = {key: group for key, group in groups.items() if group["indexes"]}
+        if groups:
+            applied = await TransactionService._debit_groups(batch_id, relations, groups)
+            for key in list(groups):
+                if relations[key]["_id"] not in applied:
+                    for index in groups.pop(key)["indexes"]:
+                        results[index] = {"error": "conflict"}
+
+        for key, group in debited.items():
+            for index in group["indexes"]:
+                results[index] = {"new_balance": relations[key]["available_credit"]}
+            for index in group["refunded"]:
+                results[index] = {"error": "write_failed"}
+            groups[key] = group
+        if not groups:
+            return results
+
+        # Rows an earlier attempt wrote are kept, the rest are written now
+        existing = {}
+        if debited:
+            cursor = db.transactions.find({"batch_id": batch_id}, {"batch_index": 1})
+            async for doc in cursor:
+                existing[doc["batch_index"]] = doc["_id"]
+
+        # Transaction records for every debited item
+        transaction_docs = []
+        for (customer_id, vendor_id), group in groups.items():
+            for index in group["indexes"]:
+                if index in existing:
+                    results[index]["transaction_id"] = str(existing[index])
+                    continue
+                doc = Transaction.make_transaction_doc({
+                    "customer_id": customer_id,
+                    "vendor_id": vendor_id,
+                    "amount": items[index]["amount"],
+                    "description": items[index].get("description") or "Purchase on credit",
+                })
+                doc["_id"] = ObjectId()
+                doc["batch_id"] = batch_id
+                doc["batch_index"] = index
+                transaction_docs.append((index, doc))
+
+        failed = set()
+        if transaction_docs:
+            try:
+                await db.transactions.insert_many([doc for _, doc in transaction_docs], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            except Exception:
+                # Unknown state: only rows known to be missing are refunded
+                failed = await TransactionService._missing_rows([doc for _, doc in transaction_docs])
+                if failed is None:
+                    # Every debit stays stamped, so a retry with the same
+                    # Idempotency-Key writes whatever is missing
+                    logger.error("batch %s: transaction rows unverified, debits left in place", batch_id)
+                    for key in groups:
+                        DashboardService.forget(*key)
+                    raise
+
+        refunds = {}
+        written = []
+        purchases = {}  # vendor_id -> [(amount, created_at)]
+        for position, (index, doc) in enumerate(transaction_docs):
+            if position in failed:
+                key = (doc["customer_id"], doc["vendor_id"])
+                amount, count, indexes = refunds.get(key, (0.0, 0, []))
+                refunds[key] = (amount + doc["amount"], count + 1, indexes + [index])
+                results[index] = {"error": "write_failed"}
+            else:
+                results[index]["transaction_id"] = str(doc["_id"])
+                written.append(doc)
+                purchases.setdefault(doc["vendor_id"], []).append((doc["amount"], doc["created_at"]))
+        if refunds:
+            await TransactionService._refund_many(
+                [(relations[key]["_id"], amount, count, indexes) for key, (amount, count, indexes) in refunds.items()],
+                batch_id
+            )
+
+        for key in groups:
+            DashboardService.forget(*key)
+        if dashboard_hub.local_publish:
+            # No change stream to pick these up; balances first, as in pay_on_credit
+            await TransactionService._publish_relations(
+                [relations[key]["_id"] for key in groups if dashboard_hub.followed(*key)]
+            )
+            for doc in written:
+                dashboard_hub.publish_transaction(doc)
+        for vendor_id, vendor_purchases in purchases.items():
+            await LedgerStatsService.record_purchases(vendor_id, vendor_purchases)
+
+        return results
+
+    @staticmethod
+    async def _stamped_groups(batch_id: ObjectId, keys: set) -> tuple:
+        """Relations this batch already debited, and the item indexes each covers"""
+        relations, groups = {}, {}
+        cursor = db.customer_vendor_relations.find(
+            {"$or": [{"customer_id": c, "vendor_id": v} for c, v in keys], "recent_batches.id": batch_id},
+            {"customer_id": 1, "vendor_id": 1, "available_credit": 1, "recent_batches": 1}
+        )
+        async for relation in cursor:
+            key = (relation["customer_id"], relation["vendor_id"])
+            indexes, refunded = [], []
+            for stamp in relation["recent_batches"]:
+                if stamp["id"] == batch_id:
+                    indexes += stamp["indexes"]
+                    refunded += stamp["refunded"]
+            relations[key] = relation
+            groups[key] = {
+                "indexes": [index for index in indexes if index not in refunded],
+                "refunded": refunded,
+            }
+        return relations, groups
+
+    @staticmethod
+    async def _debit_groups(batch_id: ObjectId, relations: dict, groups: dict) -> set:
+        """
+        Guarded debits, one per relation; returns the _ids that were debited.
+        The stamp, not the bulk_write result, is what counts, so a failed or
+        interrupted bulk_write is resolved by reading it back.
+        """
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {
+                    "_id": relations[key]["_id"],
+                    "available_credit": {"$gte": group["total"]},
+                    "recent_batches.id": {"$ne": batch_id},
+                },
+                {
+                    "$inc": {
+                        "used_credit": group["total"],
+                        "available_credit": -group["total"],
+                        "transaction_count": len(group["indexes"]),
+                    },
+                    "$set": {"updated_at": now},
+                    "$push": {"recent_batches": {
+                        "$each": [{"id": batch_id, "indexes": group["indexes"], "refunded": []}],
+                        "$slice": -RECENT_BATCHES,
+                    }},
+                }
+            )
+            for key, group in groups.items()
+        ]
+        relation_ids = [relations[key]["_id"] for key in groups]
+        try:
+            outcome = await db.customer_vendor_relations.bulk_write(operations, ordered=False)
+            if outcome.matched_count == len(operations):
+                return set(relation_ids)
+        except PyMongoError as e:
+            logger.warning("batch %s: debit bulk_write failed, reading stamps back: %s", batch_id, e)
+
+        applied = set()
+        cursor = db.customer_vendor_relations.find(
+            {"_id": {"$in": relation_ids}, "recent_batches.id": batch_id},
+            {"_id": 1}
+        )
+        async for relation in cursor:
+            applied.add(relation["_id"])
+        return applied
+
+    @staticmethod
+    async def _missing_rows(docs: list) -> Optional[set]:
+        """Positions in docs whose row is not in the collection, or None if that can't be checked"""
+        try:
+            found = {
+                doc["_id"]
+                async for doc in db.transactions.find({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"_id": 1})
+            }
+        except PyMongoError as e:
+            logger.error("could not check for transaction rows: %s", e)
+            return None
+        return {position for position, doc in enumerate(docs) if doc["_id"] not in found}
+
+    @staticmethod
+    async def _publish_relations(relation_ids: list) -> None:
+        """Push the current balances of these relations to local dashboard sockets"""
+        if not relation_ids:
+            return
+        projection = {field: 1 for field in DASHBOARD_FIELDS}
+        async for relation in db.customer_vendor_relations.find({"_id": {"$in": relation_ids}}, projection):
+            dashboard_hub.publish_relation(relation)
+
+    @staticmethod
+    async def _refund_many(refunds: list, batch_id: ObjectId) -> None:
+        """
+        Undo batch debits given as (relation _id, amount, transaction count,
+        item indexes) tuples. The indexes are stamped as refunded in the same
+        write, so a resumed batch reports them as failed.
+        """
+        now = datetime.utcnow()
+        await db.customer_vendor_relations.bulk_write([
+            UpdateOne(
+                {"_id": relation_id},
+                {
+                    "$inc": {
+                        "used_credit": -amount,
+                        "available_credit": amount,
+                        "transaction_count": -count,
+                    },
+                    "$set": {"updated_at": now},
+                    "$push": {"recent_batches": {
+                        "$each": [{"id": batch_id, "indexes": [], "refunded": indexes}],
+                        "$slice": -RECENT_BATCHES,
+                    }},
+                }
+            )
+            for relation_id, amount, count, indexes in refunds
+        ], ordered=False)
+
+    # ============ HISTORY ============
+
+    @staticmethod
+    def encode_cursor(doc: dict) -> str:
+        millis = (doc["created_at"] - EPOCH) // timedelta(milliseconds=1)
+        raw = f"{millis}:{doc['_id']}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[tuple]:
+        try:
+            millis, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+            return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(oid)
+        except Exception:
+            return None
+
+    @staticmethod
+    async def get_history(vendor_id: str, customer_id: Optional[str] = None,
+                          limit: int = 50, cursor: Optional[str] = None) -> dict:
+        """
+        One page of history, newest first.
+        Keyset pagination: each page seeks straight to the cursor position
+        in the (vendor_id, customer_id, created_at, _id) index, so page 1000
+        costs the same as page 1. Pages that run past the hot collection
+        continue into the monthly archives.
+        """
+        query = {"vendor_id": vendor_id, "transaction_type": {"$ne": SUMMARY_TYPE}}
+        if customer_id:
+            query["customer_id"] = customer_id
+
+        before = None
+        if cursor:
+            position = TransactionService.decode_cursor(cursor)
+            if not position:
+                return {"error": "invalid_cursor"}
+            before, oid = position
+            query["$or"] = [
+                {"created_at": {"$lt": before}},
+                {"created_at": before, "_id": {"$lt": oid}},
+            ]
+
+        docs = await db.transactions.find(query).sort(HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+
+        if len(docs) <= limit:
+            # Everything archived is older than the hot tier
+            archived = await TransactionArchiveService.find_archived(
+                query, HISTORY_SORT, limit + 1 - len(docs), docs[-1]["created_at"] if docs else before
+            )
+            # A batch being archived right now can be in both tiers
+            seen = {doc["_id"] for doc in docs}
+            docs.extend(doc for doc in archived if doc["_id"] not in seen)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = TransactionService.encode_cursor(docs[-1])
+        return {"items": docs, "next_cursor": next_cursor}
+
+    @staticmethod
+    async def iter_vendor_ledger(vendor_id: str) -> AsyncIterator[dict]:
+        """
+        Every transaction of a vendor, oldest first, fetched in bounded
+        batches: the archives month by month, then the hot collection
+        """
+        # Not a snapshot: rows the archiver moves meanwhile can be missed or
+        # repeated, so run archival outside export hours
+        archives = await TransactionArchiveService.archives_for(vendor_id)
+        for name in reversed(archives):
+            cursor = db[name].find({"vendor_id": vendor_id}).sort(
+                [("created_at", 1), ("_id", 1)]
+            ).batch_size(settings.EXPORT_BATCH_SIZE)
+            async for doc in cursor:
+                yield doc
+
+        cursor = db.transactions.find(
+            {"vendor_id": vendor_id, "transaction_type": {"$ne": SUMMARY_TYPE}}
+        ).sort(
+            [("created_at", 1), ("_id", 1)]
+        ).batch_size(settings.EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            yield doc
@@ -0,0 +1,163 @@
+# app/services/transaction_writer.py
+"""
+Group commit for transaction inserts.
+
+With TRANSACTION_GROUP_COMMIT enabled, pay_on_credit hands its transaction
+document to GroupCommitWriter instead of calling insert_one. Documents from
+concurrent requests are collected and written with one unordered
+insert_many as soon as GROUP_COMMIT_MAX_BATCH documents are waiting or
+GROUP_COMMIT_WINDOW_MS has passed since the first one, whichever comes
+first. While a batch is being written the next one fills up, so batches
+grow with load and one journaled round trip is shared by many payments.
+
+Every caller awaits its own document's outcome: a per-document write error
+is raised to that caller only. When insert_many fails as a whole (e.g. the
+connection dropped), some documents may have been written anyway, so they
+are looked up by _id and only the missing ones fail. At most
+GROUP_COMMIT_MAX_QUEUE documents can be waiting; further callers block
+until there is room. stop() writes out whatever is still queued, and
+callers still waiting for room then write their own documents.
+
+When disabled, or before start() / after stop(), insert() is a plain
+insert_one.
+"""
+import asyncio
+import logging
+from typing import Optional
+from pymongo.errors import BulkWriteError, WriteError
+from app.core.config import settings
+from app.core.database import db
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT_BATCH_SIZE = Histogram(
+    "group_commit_batch_size", "Documents per group-commit insert_many",
+    ("collection",), buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+
+
+class GroupCommitWriter:
+    def __init__(self, collection: str, window_ms: float, max_batch: int, max_queue: int,
+                 enabled: bool = True):
+        self.collection = collection
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.enabled = enabled
+        self._pending = []  # (doc, future)
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def insert(self, doc: dict) -> None:
+        """Insert one document; returns once it is acknowledged"""
+        if self._task is None:
+            await db[self.collection].insert_one(doc)
+            return
+
+        await self._room.acquire()
+        if self._closing:
+            # Got room after stop() began; the batching task may be gone
+            self._room.release()
+            await db[self.collection].insert_one(doc)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        # The write happens even if this caller is cancelled meanwhile
+        await asyncio.shield(future)
+
+    async def _write(self, batch: list) -> None:
+        docs = [doc for doc, _ in batch]
+        GROUP_COMMIT_BATCH_SIZE.observe(len(docs), (self.collection,))
+        failed = {}
+        try:
+            await db[self.collection].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = WriteError(error.get("errmsg"), error.get("code"), error)
+        except Exception as e:
+            failed = await self._unwritten(docs, e)
+
+        for index, (_, future) in enumerate(batch):
+            if not future.done():
+                if index in failed:
+                    future.set_exception(failed[index])
+                else:
+                    future.set_result(None)
+        for _ in batch:
+            self._room.release()
+
+    async def _unwritten(self, docs: list, error: Exception) -> dict:
+        """
+        After insert_many failed without a per-document report: index ->
+        error for each document not in the collection. If that cannot be
+        checked either, every document fails with the original error.
+        """
+        try:
+            written = {
+                found["_id"] async for found in db[self.collection].find(
+                    {"_id": {"$in": [doc["_id"] for doc in docs if "_id" in doc]}}, {"_id": 1}
+                )
+            }
+        except Exception as e:
+            logger.error("Group commit of %d %s failed and could not be checked: %s",
+                         len(docs), self.collection, e)
+            return {index: error for index in range(len(docs))}
+        return {index: error for index, doc in enumerate(docs) if doc.get("_id") not in written}
+
+    def _take_batch(self) -> list:
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        if len(self._pending) < self.max_batch:
+            self._batch_full.clear()
+        if not self._pending:
+            self._has_items.clear()
+        return batch
+
+    async def _run(self) -> None:
+        while self._pending or not self._closing:
+            await self._has_items.wait()
+            if len(self._pending) < self.max_batch and self.window > 0 and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            if self._pending:
+                await self._write(self._take_batch())
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._closing = False
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._room = asyncio.Semaphore(self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write out everything still queued; later inserts go straight to insert_one"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._closing = True
+        self._has_items.set()
+        self._batch_full.set()
+        await task
+        # Anything queued after the task's last look
+        while self._pending:
+            await self._write(self._take_batch())
+
+
+transaction_writer = GroupCommitWriter(
+    "transactions",
+    window_ms=settings.GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+    max_queue=settings.GROUP_COMMIT_MAX_QUEUE,
+    enabled=settings.TRANSACTION_GROUP_COMMIT
+)
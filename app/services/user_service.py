@@ -1,56 +1,121 @@
 # app/services/user_service.py
+"""
+Staff and admin accounts.
+
+Accounts are created through POST /users/accounts and start with the
+plain "user" role. Access comes from roles granted afterwards:
+"admin", "vendor:<vendor_id>" for vendor staff, "customer:<customer_id>".
+Admins grant them through /users/accounts/roles and revoke them through
+/users/accounts/roles/revoke. Other processes see a change once their
+cached profile expires (USER_CACHE_TTL_SECONDS). The first admin is
+granted from the command line:
+
+    python -m app.services.user_service grant someone@example.com admin
+    python -m app.services.user_service revoke someone@example.com vendor:V001
+"""
+import asyncio
+import re
+import sys
+from datetime import datetime
 from typing import Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import db
 from app.models.user_model import make_user_doc
-from passlib.context import CryptContext
+from app.schemas.user_schema import ROLE_PATTERN
+from app.core import security
 from app.core.security import create_access_token, verify_token
 
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-users = db["users"]
+# Profiles (without password) keyed by user id; see UserService.update_user
+user_cache = TTLCache("user_profile", settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
 
 class UserService:
     @staticmethod
     async def hash_password(password: str) -> str:
-        return pwd_ctx.hash(password)
+        return await security.hash_password(password)
 
     @staticmethod
-    def verify_password(plain: str, hashed: str) -> bool:
-        return pwd_ctx.verify(plain, hashed)
+    async def verify_password(plain: str, hashed: str) -> bool:
+        return await security.verify_password(plain, hashed)
 
     @staticmethod
     async def register_user(data: dict) -> dict:
         # check duplicate email
-        existing = await users.find_one({"email": data["email"]})
+        existing = await db.users.find_one({"email": data["email"]})
         if existing:
             return {"error": "Email already registered"}
 
         data["password"] = await UserService.hash_password(data["password"])
         user_doc = make_user_doc(data)
-        result = await users.insert_one(user_doc)
+        try:
+            result = await db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            return {"error": "Email already registered"}
         user_id = str(result.inserted_id)
         return {"id": user_id, "message": "User registered successfully"}
 
     @staticmethod
     async def login_user(email: str, password: str) -> dict:
-        user = await users.find_one({"email": email})
-        if not user or not UserService.verify_password(password, user["password"]):
+        user = await db.users.find_one({"email": email})
+        if not user or not await UserService.verify_password(password, user["password"]):
             return {"error": "Invalid credentials"}
         token = create_access_token({"user_id": str(user["_id"]), "email": user["email"]})
         return {"access_token": token, "token_type": "bearer"}
 
     @staticmethod
     async def get_user_by_id(user_id: str) -> Optional[dict]:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
         try:
             obj_id = ObjectId(user_id)
         except Exception:
             return None
-        user = await users.find_one({"_id": obj_id}, {"password": 0})
+        user = await db.users.find_one({"_id": obj_id}, {"password": 0})
         if not user:
             return None
         user["id"] = str(user["_id"])
         user.pop("_id", None)
-        return user
+        user_cache.set(user_id, user)
+        return dict(user)
+
+    @staticmethod
+    async def update_user(user_id: str, data: dict) -> Optional[dict]:
+        try:
+            obj_id = ObjectId(user_id)
+        except Exception:
+            return None
+        # Never let a profile update touch credentials or identity
+        updates = {k: v for k, v in data.items() if k not in ("_id", "password", "email")}
+        updates["updated_at"] = datetime.utcnow()
+        result = await db.users.update_one({"_id": obj_id}, {"$set": updates})
+        UserService.invalidate_user(user_id)
+        if not result.matched_count:
+            return None
+        return await UserService.get_user_by_id(user_id)
+
+    @staticmethod
+    async def set_role(email: str, role: str, granted: bool) -> Optional[dict]:
+        """Grant or revoke a role; returns {"email", "roles"}, or None for an unknown email"""
+        update = {"$addToSet": {"roles": role}} if granted else {"$pull": {"roles": role}}
+        update["$set"] = {"updated_at": datetime.utcnow()}
+        user = await db.users.find_one_and_update(
+            {"email": email}, update,
+            projection={"email": 1, "roles": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not user:
+            return None
+        UserService.invalidate_user(str(user["_id"]))
+        return {"email": user["email"], "roles": user.get("roles", [])}
+
+    @staticmethod
+    def invalidate_user(user_id: str) -> None:
+        """Drop a cached profile; call after any write to the user document"""
+        user_cache.delete(user_id)
 
     @staticmethod
     async def get_user_by_token(token: str) -> Optional[dict]:
@@ -61,3 +126,53 @@ class UserService:
         if not user_id:
             return None
         return await UserService.get_user_by_id(user_id)
+
+    @staticmethod
+    async def get_user_by_authorization(authorization: Optional[str]) -> Optional[dict]:
+        """The user behind an "Authorization: Bearer <token>" header value"""
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return await UserService.get_user_by_token(token)
+
+    @staticmethod
+    def is_admin(user: dict) -> bool:
+        return "admin" in user.get("roles", [])
+
+    @staticmethod
+    def manages_vendor(user: dict, vendor_id: str) -> bool:
+        """Admins manage every vendor; vendor staff carry a vendor:<id> role"""
+        return UserService.is_admin(user) or f"vendor:{vendor_id}" in user.get("roles", [])
+
+    @staticmethod
+    async def is_customer(user: dict, customer_id: str) -> bool:
+        """
+        True when the user is this customer: a customer:<id> role, or a
+        relation of the customer registered to the user's phone
+        """
+        if f"customer:{customer_id}" in user.get("roles", []):
+            return True
+        if not user.get("phone"):
+            return False
+        return await db.customer_vendor_relations.find_one(
+            {"customer_id": customer_id, "customer_phone": user["phone"]}, {"_id": 1}
+        ) is not None
+
+
+async def _main(command: str, email: str, role: str) -> int:
+    if not re.fullmatch(ROLE_PATTERN, role):
+        print(f"Unknown role {role}: expected admin, vendor:<vendor_id> or customer:<customer_id>")
+        return 2
+    result = await UserService.set_role(email, role, granted=command == "grant")
+    if result is None:
+        print(f"No account for {email}")
+        return 1
+    print(f"{result['email']}: {', '.join(result['roles'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("grant", "revoke"):
+        print("usage: python -m app.services.user_service grant|revoke <email> <role>")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(*sys.argv[1:])))
@@ -0,0 +1,169 @@
+# app/services/vendor_service.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import db, read_db
+from app.models.vendor_model import make_vendor_doc
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache in front of the vendors collection.
+# Unknown ids are cached as _NOT_FOUND for a shorter time.
+vendor_cache = TTLCache("vendor", settings.VENDOR_CACHE_SIZE, settings.VENDOR_CACHE_TTL_SECONDS)
+_NOT_FOUND = object()
+
+# Seeded on startup so existing V001 QR codes keep working
+DEFAULT_VENDORS = [
+    {
+        "vendor_id": "V001",
+        "vendor_name": "Raj General Store",
+        "category": "Grocery",
+        "default_credit_limit": settings.DEFAULT_CREDIT_LIMIT,
+        "status": "active"
+    },
+]
+
+VENDOR_FIELDS = {"_id": 0, "created_at": 0, "updated_at": 0}
+
+# Cached ids checked per query when polling for deleted vendors
+POLL_BATCH = 1000
+
+
+class VendorService:
+    _watcher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def get_vendor(vendor_id: str, from_primary: bool = False,
+                         include_inactive: bool = False) -> Optional[dict]:
+        """
+        Cached vendor lookup. Misses read from a secondary unless
+        from_primary is set, as it is right after this process wrote.
+        Inactive and suspended vendors count as not found unless
+        include_inactive is set.
+        """
+        vendor = vendor_cache.get(vendor_id)
+        if vendor is None:
+            source = db if from_primary else read_db("vendor")
+            vendor = await source.vendors.find_one({"_id": vendor_id}, VENDOR_FIELDS)
+            if vendor:
+                vendor_cache.set(vendor_id, vendor)
+            else:
+                vendor = _NOT_FOUND
+                vendor_cache.set(vendor_id, _NOT_FOUND, ttl=settings.VENDOR_NEGATIVE_CACHE_TTL_SECONDS)
+
+        if vendor is _NOT_FOUND:
+            return None
+        if vendor.get("status", "active") != "active" and not include_inactive:
+            return None
+        return vendor
+
+    @staticmethod
+    async def create_vendor(data: dict) -> dict:
+        try:
+            await db.vendors.insert_one(make_vendor_doc(data))
+        except DuplicateKeyError:
+            return {"error": "Vendor already exists"}
+        VendorService.invalidate(data["vendor_id"])
+        return await VendorService.get_vendor(data["vendor_id"], from_primary=True, include_inactive=True)
+
+    @staticmethod
+    async def update_vendor(vendor_id: str, data: dict) -> Optional[dict]:
+        updates = {k: v for k, v in data.items() if v is not None}
+        updates["updated_at"] = datetime.utcnow()
+        result = await db.vendors.update_one({"_id": vendor_id}, {"$set": updates})
+        VendorService.invalidate(vendor_id)
+        if not result.matched_count:
+            return None
+        return await VendorService.get_vendor(vendor_id, from_primary=True, include_inactive=True)
+
+    @staticmethod
+    def invalidate(vendor_id: str) -> None:
+        vendor_cache.delete(vendor_id)
+
+    @staticmethod
+    async def warm_cache() -> int:
+        """Load active vendors into the cache so first scans skip the database"""
+        count = 0
+        cursor = read_db("vendor").vendors.find({"status": "active"}, VENDOR_FIELDS)
+        async for vendor in cursor.limit(settings.VENDOR_CACHE_SIZE):
+            vendor_cache.set(vendor["vendor_id"], vendor)
+            count += 1
+        return count
+
+    @staticmethod
+    async def seed_default_vendors() -> None:
+        for vendor in DEFAULT_VENDORS:
+            await db.vendors.update_one(
+                {"_id": vendor["vendor_id"]},
+                {"$setOnInsert": make_vendor_doc(vendor)},
+                upsert=True
+            )
+
+    # ============ CACHE INVALIDATION ============
+
+    @staticmethod
+    async def _watch_change_stream() -> None:
+        """Invalidate on every vendor insert/update/delete seen by the change stream"""
+        async with db.vendors.watch() as stream:
+            # Anything cached before the stream opened may be stale
+            vendor_cache.clear()
+            async for change in stream:
+                VendorService.invalidate(change["documentKey"]["_id"])
+
+    @staticmethod
+    async def _invalidate_deleted() -> None:
+        """Drop cached vendors whose documents are gone; deletes leave no updated_at to poll"""
+        cached = [vendor_id for vendor_id, vendor in vendor_cache.items() if vendor is not _NOT_FOUND]
+        for start in range(0, len(cached), POLL_BATCH):
+            batch = cached[start:start + POLL_BATCH]
+            cursor = db.vendors.find({"_id": {"$in": batch}}, {"_id": 1})
+            existing = {vendor["_id"] async for vendor in cursor}
+            for vendor_id in batch:
+                if vendor_id not in existing:
+                    VendorService.invalidate(vendor_id)
+
+    @staticmethod
+    async def _poll_updates() -> None:
+        """Fallback for standalone servers, which have no change streams"""
+        last_seen = datetime.utcnow()
+        while True:
+            await asyncio.sleep(settings.VENDOR_POLL_INTERVAL_SECONDS)
+            try:
+                cursor = db.vendors.find(
+                    {"updated_at": {"$gt": last_seen}},
+                    {"_id": 1, "updated_at": 1}
+                )
+                async for vendor in cursor:
+                    VendorService.invalidate(vendor["_id"])
+                    last_seen = max(last_seen, vendor["updated_at"])
+                await VendorService._invalidate_deleted()
+            except PyMongoError as e:
+                logger.warning("Vendor cache poll failed: %s", e)
+
+    @staticmethod
+    async def _watch() -> None:
+        while True:
+            try:
+                await VendorService._watch_change_stream()
+            except PyMongoError as e:
+                if "replica set" in str(e) or getattr(e, "code", None) == 40573:
+                    logger.info("Change streams unavailable, polling vendors for changes")
+                    await VendorService._poll_updates()
+                    return
+                logger.warning("Vendor change stream interrupted: %s", e)
+                await asyncio.sleep(1)
+
+    @staticmethod
+    def start_watcher() -> None:
+        if VendorService._watcher is None:
+            VendorService._watcher = asyncio.create_task(VendorService._watch())
+
+    @staticmethod
+    def stop_watcher() -> None:
+        if VendorService._watcher is not None:
+            VendorService._watcher.cancel()
+            VendorService._watcher = None
@@ -0,0 +1,100 @@
+# benchmarks/bench_archive.py
+"""
+Transaction archival: throughput, hot-tier size and history latency.
+
+Seeds one vendor with ROWS transactions spread evenly over the last
+MONTHS months, then archives everything older than ARCHIVE_AFTER_DAYS.
+Reports archival throughput and the hot collection's document count and
+index size before and after. It also reports history latency for the
+first page, served from the hot tier, and for a page deep in the
+archives, before and after.
+
+    python -m benchmarks.bench_archive [rows] [months]
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.core.indexes import ensure_indexes
+from app.services.archive_service import TransactionArchiveService
+from app.services.transaction_service import TransactionService
+
+VENDOR_ID = "V_BENCH_ARCHIVE"
+CUSTOMERS = 200
+PAGES = 200
+INSERT_BATCH = 5000
+
+
+async def seed(rows: int, months: int) -> None:
+    await db.transactions.delete_many({"vendor_id": VENDOR_ID})
+    for name in await TransactionArchiveService.archive_collections():
+        await db[name].delete_many({"vendor_id": VENDOR_ID})
+    now = datetime.utcnow()
+    step = timedelta(days=30 * months) / rows
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "_id": ObjectId(),
+            "customer_id": f"CUST_BENCH_ARCHIVE_{i % CUSTOMERS}",
+            "vendor_id": VENDOR_ID,
+            "amount": 1.0,
+            "transaction_type": "credit_purchase",
+            "description": "Purchase on credit",
+            "status": "completed",
+            "created_at": now - step * i,
+        })
+        if len(batch) >= INSERT_BATCH:
+            await db.transactions.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.transactions.insert_many(batch, ordered=False)
+
+
+async def hot_tier() -> str:
+    stats = await db.command("collStats", "transactions")
+    return f"{stats['count']} docs, indexes {stats['totalIndexSize'] / 2 ** 20:.1f} MiB"
+
+
+async def history(name: str, skip_pages: int) -> None:
+    """Latency of the page after skip_pages pages of 50"""
+    cursor = None
+    for _ in range(skip_pages):
+        cursor = (await TransactionService.get_history(VENDOR_ID, limit=50, cursor=cursor))["next_cursor"]
+    latencies = []
+    for _ in range(PAGES):
+        with Timer(latencies):
+            await TransactionService.get_history(VENDOR_ID, limit=50, cursor=cursor)
+    print_summary(summarize(name, latencies, sum(latencies)))
+
+
+async def main(rows: int, months: int) -> None:
+    await connect_to_mongo()
+    await ensure_indexes(db)
+    try:
+        await seed(rows, months)
+        deep = rows // 50 - 2
+        print(f"hot tier before: {await hot_tier()}")
+        await history("first page (all hot)", 0)
+        await history("deep page (all hot)", deep)
+
+        elapsed = []
+        with Timer(elapsed):
+            stats = await TransactionArchiveService.run(apply=True)
+        print(f"archived {stats['moved']} rows in {elapsed[0]:.1f}s "
+              f"({stats['moved'] / elapsed[0]:.0f} rows/s), {stats['summaries']} summary rows")
+
+        print(f"hot tier after:  {await hot_tier()}")
+        await history("first page (tiered)", 0)
+        await history("deep page (archive)", deep)
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    months = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    asyncio.run(main(rows, months))
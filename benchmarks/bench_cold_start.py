@@ -0,0 +1,100 @@
+# benchmarks/bench_cold_start.py
+"""
+Cold start: how soon a freshly started instance can take traffic.
+
+For each STARTUP_MODE, starts `uvicorn app.main:app` in a new process
+(the way Elastic Beanstalk scales out) and records:
+
+- import:     seconds to import app.main in a fresh interpreter; the run
+              fails if that import loaded any of DEFERRED_MODULES
+- first ping: seconds from spawn until /health/ping answers 200
+- ready:      seconds from spawn until /health/ready answers 200
+
+Each mode is started `runs` times and the medians are reported.
+
+    python -m benchmarks.bench_cold_start [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+import benchmarks.common  # noqa: F401  (points MONGODB_URL at the bench database)
+
+PORT = 8766
+BASE_URL = f"http://127.0.0.1:{PORT}"
+TIMEOUT_SECONDS = 60
+
+# Loaded on first use (or only by offline jobs), never by importing the app
+DEFERRED_MODULES = [
+    "numpy",
+    "passlib",
+    "jose",
+    "app.services.credit_scoring_service",
+    "app.services.customer_import_service",
+]
+
+IMPORT_PROBE = (
+    "import sys, time; start = time.perf_counter(); import app.main; "
+    "elapsed = time.perf_counter() - start; "
+    f"print(' '.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules)); "
+    "print(elapsed)"
+)
+
+
+def import_seconds() -> tuple:
+    """Seconds to import app.main, and the deferred modules it loaded anyway"""
+    *_, loaded, seconds = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True
+    ).stdout.split("\n")[:-1]
+    return float(seconds), loaded.split()
+
+
+def wait_for(client: httpx.Client, path: str, start: float) -> float:
+    while time.perf_counter() - start < TIMEOUT_SECONDS:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{path} did not answer 200 within {TIMEOUT_SECONDS}s")
+
+
+def cold_start(mode: str) -> tuple:
+    env = {**os.environ, "STARTUP_MODE": mode}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=BASE_URL, timeout=1) as client:
+            first_ping = wait_for(client, "/health/ping", start)
+            ready = wait_for(client, "/health/ready", start)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_ping, ready
+
+
+def main(runs: int) -> int:
+    imports, loaded = zip(*(import_seconds() for _ in range(runs)))
+    print(f"import app.main: median {statistics.median(imports) * 1000:.1f} ms")
+    if loaded[0]:
+        print(f"import app.main loaded deferred modules: {', '.join(loaded[0])}")
+        return 1
+    for mode in ("eager", "lazy"):
+        pings, readies = zip(*(cold_start(mode) for _ in range(runs)))
+        print(
+            f"{mode:>6}: first ping {statistics.median(pings) * 1000:.1f} ms, "
+            f"ready {statistics.median(readies) * 1000:.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
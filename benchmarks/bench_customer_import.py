@@ -0,0 +1,94 @@
+# benchmarks/bench_customer_import.py
+"""
+Customer import throughput and memory.
+
+Generates a vendor credit book of ROWS customers on the fly and feeds it
+to CustomerImportService in 64 KiB chunks, the way an upload arrives.
+This is compared with one find_one plus insert_one per customer, which is
+what /users/register costs each customer. Peak Python memory during the
+import is tracked with tracemalloc and should stay flat as ROWS grows.
+
+    python -m benchmarks.bench_customer_import [rows ...]
+"""
+import asyncio
+import sys
+import tracemalloc
+
+from benchmarks.common import Timer
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.core.ids import new_customer_id, start_worker_lease, stop_worker_lease
+from app.models.customer_vendor_model import CustomerVendorRelation
+from app.services.customer_import_service import CustomerImportService
+
+VENDOR = {"vendor_id": "V_BENCH_IMPORT", "vendor_name": "Import Bench", "default_credit_limit": 500.0}
+CHUNK_BYTES = 64 * 1024
+
+
+def phone(i: int) -> str:
+    return f"9{i:09d}"
+
+
+async def credit_book(rows: int):
+    """CSV bytes in CHUNK_BYTES pieces, never the whole file at once"""
+    buffer = ["phone_number,name,credit_limit,used_credit\n"]
+    size = 0
+    for i in range(rows):
+        line = f"{phone(i)},Customer {i},{1000 + i % 500},{i % 300}\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+async def one_by_one(rows: int) -> None:
+    for i in range(rows):
+        query = {"customer_phone": phone(i), "vendor_id": VENDOR["vendor_id"]}
+        if await db.customer_vendor_relations.find_one(query):
+            continue
+        await db.customer_vendor_relations.insert_one(CustomerVendorRelation.make_relation_doc({
+            "customer_id": new_customer_id(),
+            "customer_phone": phone(i),
+            "customer_name": f"Customer {i}",
+            "vendor_id": VENDOR["vendor_id"],
+        }))
+
+
+async def reset() -> None:
+    await db.customer_vendor_relations.delete_many({"vendor_id": VENDOR["vendor_id"]})
+    await db.vendor_totals.delete_one({"_id": VENDOR["vendor_id"]})
+
+
+async def main(counts: list) -> None:
+    await connect_to_mongo()
+    await start_worker_lease()
+    try:
+        for rows in counts:
+            if rows <= 10000:
+                await reset()
+                elapsed = []
+                with Timer(elapsed):
+                    await one_by_one(rows)
+                print(f"{'one by one':<12} rows={rows:<8} {rows / elapsed[0]:>10.1f} rows/s")
+
+            await reset()
+            elapsed = []
+            tracemalloc.start()
+            with Timer(elapsed):
+                report = await CustomerImportService.import_csv(VENDOR, credit_book(rows))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{'import':<12} rows={rows:<8} {rows / elapsed[0]:>10.1f} rows/s  "
+                f"peak {peak / 2 ** 20:.1f} MiB  imported={report['imported']} failed={report['failed']}"
+            )
+    finally:
+        await reset()
+        await stop_worker_lease()
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]))
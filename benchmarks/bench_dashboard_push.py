@@ -0,0 +1,182 @@
+# benchmarks/bench_dashboard_push.py
+"""
+How many dashboard WebSocket subscribers one worker can sustain.
+
+Starts one uvicorn worker. For each subscriber count, separate processes
+open that many /users/dashboard/ws connections, spread over RELATIONS
+customers of one vendor. This process then makes PAYMENT_RATE payments
+per second for those customers. Each payment's description carries its
+send time, so every subscriber can time how long the push took to reach
+it. The run reports push latency percentiles, deliveries per second and
+how many subscribers were dropped as slow consumers. Subscribers
+authenticate as a staff user of the vendor, created by the seed step.
+
+Needs a replica set, since the push is driven by change streams.
+
+    python -m benchmarks.bench_dashboard_push [subscribers ...]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+from pymongo import ReturnDocument
+from websockets.asyncio.client import connect
+
+from benchmarks.common import print_summary, summarize
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.core.security import create_access_token
+from app.models.customer_vendor_model import CustomerVendorRelation
+
+VENDOR_ID = "V001"
+STAFF_EMAIL = "push-bench@example.com"
+RELATIONS = 100
+PAYMENT_RATE = 50
+SECONDS = 10
+PORT = 8767
+BASE_URL = f"http://127.0.0.1:{PORT}"
+WS_URL = f"ws://127.0.0.1:{PORT}/users/dashboard/ws"
+SUBSCRIBER_PROCESSES = max(1, (os.cpu_count() or 2) // 2)
+
+
+def customer_id(i: int) -> str:
+    return f"CUST_BENCH_WS_{i % RELATIONS}"
+
+
+async def subscribe_many(first: int, count: int, seconds: float, token: str) -> dict:
+    latencies = []
+    dropped = 0
+    connected = 0
+
+    async def one(i: int) -> None:
+        nonlocal dropped, connected
+        try:
+            async with connect(
+                f"{WS_URL}?customer_id={customer_id(i)}&vendor_id={VENDOR_ID}",
+                additional_headers={"Authorization": f"Bearer {token}"},
+                open_timeout=30
+            ) as ws:
+                connected += 1
+                await ws.recv()  # snapshot
+                deadline = time.time() + seconds
+                while time.time() < deadline:
+                    try:
+                        message = json.loads(await asyncio.wait_for(ws.recv(), deadline - time.time()))
+                    except asyncio.TimeoutError:
+                        return
+                    if message["type"] == "transaction":
+                        latencies.append(time.time() - float(message["description"]))
+        except Exception:
+            dropped += 1
+
+    await asyncio.gather(*(one(i) for i in range(first, first + count)))
+    return {"latencies": latencies, "dropped": dropped, "connected": connected}
+
+
+def subscriber_process(first: int, count: int, seconds: float, token: str, results) -> None:
+    results.put(asyncio.run(subscribe_many(first, count, seconds, token)))
+
+
+async def pay(seconds: float) -> int:
+    sent = 0
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            await client.post("/users/pay-credit", json={
+                "customer_id": customer_id(sent),
+                "vendor_id": VENDOR_ID,
+                "amount": 0.01,
+                "description": repr(time.time()),
+            })
+            sent += 1
+            await asyncio.sleep(max(0.0, start + sent / PAYMENT_RATE - time.perf_counter()))
+    return sent
+
+
+def run(subscribers: int, token: str) -> None:
+    per_process = subscribers // SUBSCRIBER_PROCESSES
+    results = multiprocessing.Queue()
+    # Subscribers stay a little longer than the payments run
+    listen = SECONDS + 5
+    processes = [
+        multiprocessing.Process(
+            target=subscriber_process, args=(n * per_process, per_process, listen, token, results)
+        )
+        for n in range(SUBSCRIBER_PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    # Let the connections open before paying
+    time.sleep(min(10, 1 + subscribers / 1000))
+    sent = asyncio.run(pay(SECONDS))
+
+    latencies, dropped, connected = [], 0, 0
+    for _ in processes:
+        result = results.get()
+        latencies.extend(result["latencies"])
+        dropped += result["dropped"]
+        connected += result["connected"]
+    for process in processes:
+        process.join()
+
+    print_summary(summarize(f"{connected} subscribers", latencies, SECONDS))
+    print(f"    payments: {sent}, pushes delivered: {len(latencies)}, dropped/failed: {dropped}")
+
+
+def start_server() -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env={**os.environ, "DASHBOARD_WS_MAX_SUBSCRIBERS": str(10 ** 6)}, stdout=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            if httpx.get(f"{BASE_URL}/health/ready").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def seed() -> str:
+    """Relations to follow; returns a token for a staff user of the vendor"""
+    await connect_to_mongo()
+    ids = [customer_id(i) for i in range(RELATIONS)]
+    await db.customer_vendor_relations.delete_many({"customer_id": {"$in": ids}})
+    await db.customer_vendor_relations.insert_many([
+        CustomerVendorRelation.make_relation_doc({
+            "customer_id": cid,
+            "customer_phone": f"90000{i:05d}",
+            "customer_name": "Push Bench",
+            "vendor_id": VENDOR_ID,
+            "credit_limit": 1_000_000.0,
+        })
+        for i, cid in enumerate(ids)
+    ])
+    staff = await db.users.find_one_and_update(
+        {"email": STAFF_EMAIL},
+        {"$set": {"name": "Push Bench", "roles": [f"vendor:{VENDOR_ID}"]}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    close_mongo_connection()
+    return create_access_token({"user_id": str(staff["_id"]), "email": STAFF_EMAIL})
+
+
+def main(counts: list) -> None:
+    token = asyncio.run(seed())
+    server = start_server()
+    try:
+        for count in counts:
+            run(count, token)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000, 10000])
@@ -0,0 +1,92 @@
+# benchmarks/bench_encode.py
+"""
+Per-response encode cost of the hot endpoints.
+
+Compares, for representative dashboard and pay-credit payloads:
+
+- default: what FastAPI does when a handler returns a model — re-validate
+  against response_model, jsonable_encoder, then json.dumps
+- model:   ModelResponse, a single pydantic-core serialization pass
+
+No database is needed.
+
+    python -m benchmarks.bench_encode [iterations]
+"""
+import asyncio
+import sys
+import time
+
+from fastapi.routing import APIRoute, serialize_response
+from fastapi.responses import JSONResponse
+
+from app.core.responses import ModelResponse
+from app.main import app
+from app.schemas.user_schema import (
+    CustomerDashboardResponse,
+    PayOnCreditBatchResponse,
+    PayOnCreditItemResult,
+    PayOnCreditResponse,
+)
+
+PAYLOADS = {
+    ("/users/dashboard", "POST"): CustomerDashboardResponse(
+        customer_id="CUST_0000000000001", customer_name="Ravi Kumar",
+        vendor_id="V001", vendor_name="Raj General Store",
+        credit_limit=500.0, used_credit=125.5, available_credit=374.5, transaction_count=12
+    ),
+    ("/users/pay-credit", "POST"): PayOnCreditResponse(
+        success=True, message="Payment successful",
+        transaction_id="66f1c0ffee00000000000001", new_balance=374.5, amount_paid=25.0
+    ),
+    ("/users/pay-credit/batch", "POST"): PayOnCreditBatchResponse(
+        success=True, message="200 of 200 payments successful", accepted=200, rejected=0,
+        results=[
+            PayOnCreditItemResult(
+                index=i, success=True, message="Payment successful",
+                transaction_id="66f1c0ffee00000000000001", new_balance=1000.0 - i, amount_paid=1.0
+            )
+            for i in range(200)
+        ]
+    ),
+}
+
+
+def find_route(path: str, method: str) -> APIRoute:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and method in route.methods:
+            return route
+    raise LookupError(path)
+
+
+async def default_path(route: APIRoute, model) -> bytes:
+    content = await serialize_response(field=route.response_field, response_content=model)
+    return JSONResponse(content).body
+
+
+def model_path(model) -> bytes:
+    return ModelResponse(model).body
+
+
+async def main(iterations: int) -> None:
+    for (path, method), model in PAYLOADS.items():
+        route = find_route(path, method)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await default_path(route, model)
+        default_us = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model_path(model)
+        model_us = (time.perf_counter() - start) / iterations * 1e6
+
+        print(
+            f"{method} {path:<26} default={default_us:8.2f}us  model={model_us:8.2f}us  "
+            f"speedup={default_us / model_us:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    asyncio.run(main(iterations))
@@ -0,0 +1,91 @@
+# benchmarks/bench_group_commit.py
+"""
+Throughput versus added latency of group commit at different batch windows.
+
+WRITERS concurrent tasks insert transaction-shaped documents into a
+throwaway collection for SECONDS each run: first with plain insert_one per
+document, then through GroupCommitWriter at each window in WINDOWS_MS.
+Each insert's latency is measured until its own acknowledgement.
+
+Run it against the write concern you deploy with (MONGODB_WRITE_CONCERN),
+since the journaled round trip is what group commit amortizes.
+
+    python -m benchmarks.bench_group_commit [writers] [seconds]
+"""
+import asyncio
+import sys
+import time
+
+from bson import ObjectId
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core.config import settings
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.models.customer_vendor_model import Transaction
+from app.services.transaction_writer import GROUP_COMMIT_BATCH_SIZE, GroupCommitWriter
+
+COLLECTION = "bench_group_commit"
+WINDOWS_MS = (0, 1, 2, 5, 10)
+
+
+def make_doc(i: int) -> dict:
+    doc = Transaction.make_transaction_doc({
+        "customer_id": f"CUST_BENCH_{i % 1000}",
+        "vendor_id": "V_BENCH",
+        "amount": 10.0,
+        "description": "Purchase on credit",
+    })
+    doc["_id"] = ObjectId()
+    return doc
+
+
+async def run(name: str, writer: GroupCommitWriter, writers: int, seconds: float) -> None:
+    await db[COLLECTION].delete_many({})
+    await writer.start()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            with Timer(latencies):
+                await writer.insert(make_doc(n * 1_000_000 + i))
+            i += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(n) for n in range(writers)])
+    await writer.stop()
+    print_summary(summarize(name, latencies, time.perf_counter() - start))
+
+
+def mean_batch() -> float:
+    series = GROUP_COMMIT_BATCH_SIZE._series.get((COLLECTION,))
+    if not series:
+        return 1.0
+    return series[-1] / sum(series[:-1])
+
+
+async def main(writers: int, seconds: float) -> None:
+    await connect_to_mongo()
+    try:
+        for window in WINDOWS_MS:
+            GROUP_COMMIT_BATCH_SIZE._series.clear()
+            writer = GroupCommitWriter(
+                COLLECTION, window_ms=window,
+                max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+                max_queue=settings.GROUP_COMMIT_MAX_QUEUE,
+                enabled=window > 0
+            )
+            name = f"group commit {window}ms" if window else "insert_one"
+            await run(name, writer, writers, seconds)
+            if window:
+                print(f"    mean batch size {mean_batch():.1f}")
+        await db[COLLECTION].drop()
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(writers, seconds))
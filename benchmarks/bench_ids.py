@@ -0,0 +1,93 @@
+# benchmarks/bench_ids.py
+"""
+Stress test for the customer ID generator.
+
+Starts PROCESSES worker processes, each with its own worker id (as a lease
+would hand out), generates IDS_PER_PROCESS ids in each, then checks that
+every id is unique across processes and monotonic within each process.
+No database is needed.
+
+With --lease, ID_WORKER_ID is unset and every process claims its worker id
+from id_worker_leases at the same time, as app processes do at startup.
+This needs the MongoDB at MONGODB_URL; the run also fails if two processes
+were handed the same worker id.
+
+    python -m benchmarks.bench_ids [processes] [ids_per_process] [--lease]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+from app.core import ids
+from app.core.ids import SnowflakeGenerator
+
+
+def run_generator(generator: SnowflakeGenerator, count: int) -> tuple:
+    start = time.perf_counter()
+    generated = [generator.next_id() for _ in range(count)]
+    elapsed = time.perf_counter() - start
+    monotonic = all(a < b for a, b in zip(generated, generated[1:]))
+    return generated, elapsed, monotonic
+
+
+def generate(args) -> tuple:
+    worker_id, count = args
+    return (worker_id, *run_generator(SnowflakeGenerator(worker_id), count))
+
+
+async def generate_leased(count: int) -> tuple:
+    await ids.start_worker_lease()
+    try:
+        worker_id = ids.id_generator.worker_id
+        return (worker_id, *run_generator(ids.id_generator, count))
+    finally:
+        await ids.stop_worker_lease()
+
+
+def generate_with_lease(args) -> tuple:
+    _, count = args
+    return asyncio.run(generate_leased(count))
+
+
+def main(processes: int, per_process: int, lease: bool) -> int:
+    if lease:
+        # Spawned children import the app afresh, without a configured id
+        os.environ.pop("ID_WORKER_ID", None)
+        context = multiprocessing.get_context("spawn")
+        work = generate_with_lease
+    else:
+        context = multiprocessing.get_context()
+        work = generate
+
+    start = time.perf_counter()
+    with context.Pool(processes) as pool:
+        results = pool.map(work, [(worker_id, per_process) for worker_id in range(processes)])
+    wall = time.perf_counter() - start
+
+    seen = set()
+    total = 0
+    for _, generated, _, _ in results:
+        seen.update(generated)
+        total += len(generated)
+
+    per_process_rate = sum(per_process / elapsed for _, _, elapsed, _ in results) / processes
+    all_monotonic = all(monotonic for _, _, _, monotonic in results)
+    duplicates = total - len(seen)
+    worker_ids = sorted(worker_id for worker_id, _, _, _ in results)
+    shared_worker_ids = len(worker_ids) - len(set(worker_ids))
+
+    print(f"generated {total:,} ids in {processes} processes ({wall:.2f}s wall incl. transfer)")
+    print(f"  {per_process_rate:,.0f} ids/s per process")
+    if lease:
+        print(f"  leased worker ids: {worker_ids}")
+    print(f"  duplicates={duplicates} shared_worker_ids={shared_worker_ids} monotonic_per_process={all_monotonic}")
+    return 0 if duplicates == 0 and shared_worker_ids == 0 and all_monotonic else 1
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    processes = int(args[0]) if len(args) > 0 else 8
+    per_process = int(args[1]) if len(args) > 1 else 500000
+    sys.exit(main(processes, per_process, "--lease" in sys.argv))
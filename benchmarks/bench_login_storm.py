@@ -0,0 +1,85 @@
+# benchmarks/bench_login_storm.py
+"""
+Event loop latency during a login storm.
+
+Runs a burst of bcrypt verifications while polling /health/ping, once with
+verification done inline on the event loop (the old behaviour) and once
+through the bounded password executor. Reports p50/p99 of the unrelated
+ping endpoint for both. No database is needed.
+
+    python -m benchmarks.bench_login_storm [logins] [pings]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import print_summary, summarize
+from app.core import security
+from app.core.security import PasswordHasherBusy, get_pwd_ctx
+from app.main import app
+
+
+async def inline_verify(plain: str, hashed: str) -> bool:
+    return get_pwd_ctx().verify(plain, hashed)
+
+
+async def storm(verify, hashed: str, logins: int) -> int:
+    """Logins arrive every couple of milliseconds, like a real burst"""
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        try:
+            await verify("correct horse", hashed)
+        except PasswordHasherBusy:
+            rejected += 1
+
+    tasks = []
+    for _ in range(logins):
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(0.002)
+    await asyncio.gather(*tasks)
+    return rejected
+
+
+async def poll_ping(client: httpx.AsyncClient, pings: int, latencies: list) -> None:
+    """
+    Latency is measured from when each ping was due, so time spent waiting
+    for a blocked event loop is counted.
+    """
+    interval = 0.005
+    start = time.perf_counter()
+    for i in range(pings):
+        due = start + i * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await client.get("/health/ping")
+        latencies.append(time.perf_counter() - due)
+
+
+async def run(name: str, verify, hashed: str, logins: int, pings: int) -> None:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        _, rejected = await asyncio.gather(
+            poll_ping(client, pings, latencies),
+            storm(verify, hashed, logins),
+        )
+        print_summary(summarize(name, latencies, time.perf_counter() - start))
+        print(f"    logins={logins} rejected_with_503={rejected}")
+
+
+async def main(logins: int, pings: int) -> None:
+    hashed = get_pwd_ctx().hash("correct horse")
+    await run("/health/ping inline bcrypt", inline_verify, hashed, logins, pings)
+    await run("/health/ping executor bcrypt", security.verify_password, hashed, logins, pings)
+
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pings = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(logins, pings))
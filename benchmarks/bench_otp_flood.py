@@ -0,0 +1,187 @@
+# benchmarks/bench_otp_flood.py
+"""
+Payment and dashboard latency while the OTP endpoints are flooded.
+
+Starts the API under uvicorn twice: once with admission control disabled
+(no shedding, no rate limits) and once with the configured policies. Each
+time, separate processes flood send-otp / verify-otp at a fixed arrival
+rate from random IPs and phone numbers, so per-key limits alone cannot
+stop it, while this process sends a steady stream of /users/pay-credit and
+/users/dashboard calls and measures their latency.
+
+The server uses OTP_STORE=mongo so OTP requests wait on I/O like they do
+in production.
+
+    python -m benchmarks.bench_otp_flood [flood_rate] [seconds]
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import print_summary, summarize
+from app.core.database import close_mongo_connection, connect_to_mongo, db
+from app.models.customer_vendor_model import CustomerVendorRelation
+
+CUSTOMER_ID = "CUST_BENCH_FLOOD"
+VENDOR_ID = "V001"
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+# One client process manages a few hundred requests/s; split the flood
+FLOOD_PROCESSES = max(1, (os.cpu_count() or 2) // 2)
+
+ADMISSION_OFF = {
+    "SHED_MAX_IN_FLIGHT": str(10 ** 9),
+    "SHED_OTP_MAX_IN_FLIGHT": str(10 ** 9),
+    "RATE_LIMIT_SEND_OTP_PHONE": "",
+    "RATE_LIMIT_SEND_OTP_IP": "",
+    "RATE_LIMIT_VERIFY_OTP_PHONE": "",
+    "RATE_LIMIT_VERIFY_OTP_IP": "",
+    "RATE_LIMIT_PAY_CREDIT_IP": "",
+}
+
+
+def random_ip() -> str:
+    return ".".join(str(random.randint(1, 254)) for _ in range(4))
+
+
+def random_phone() -> str:
+    return f"9{random.randint(100000000, 999999999)}"
+
+
+async def flood(rate: float, seconds: float) -> dict:
+    """Open loop: requests keep arriving at `rate`/s however slowly they are served"""
+    statuses = Counter()
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=30) as client:
+        async def one():
+            headers = {"X-Forwarded-For": random_ip()}
+            try:
+                if random.random() < 0.5:
+                    response = await client.post(
+                        "/users/send-otp", json={"phone_number": random_phone()}, headers=headers
+                    )
+                else:
+                    response = await client.post(
+                        "/users/verify-otp", json={"phone_number": random_phone(), "otp": "123456"},
+                        headers=headers
+                    )
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+
+        tasks = []
+        sent = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            due = int((time.perf_counter() - start) * rate)
+            tasks.extend(asyncio.create_task(one()) for _ in range(due - sent))
+            sent = max(sent, due)
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+    return dict(statuses)
+
+
+def flood_process(rate: float, seconds: float, results) -> None:
+    results.put(asyncio.run(flood(rate, seconds)))
+
+
+async def traffic(seconds: float) -> tuple:
+    """Latency is measured from when each call was due, so server stalls count"""
+    latencies = []
+    statuses = Counter()
+    interval = 0.01
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < seconds:
+            due = start + i * interval
+            i += 1
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if i % 2:
+                response = await client.post(
+                    "/users/pay-credit",
+                    json={"customer_id": CUSTOMER_ID, "vendor_id": VENDOR_ID, "amount": 0.01}
+                )
+            else:
+                response = await client.post(
+                    "/users/dashboard", json={"customer_id": CUSTOMER_ID, "vendor_id": VENDOR_ID}
+                )
+            statuses[response.status_code] += 1
+            latencies.append(time.perf_counter() - due)
+    return latencies, dict(statuses), time.perf_counter() - start
+
+
+def start_server(overrides: dict) -> subprocess.Popen:
+    env = {**os.environ, "OTP_STORE": "mongo", "TRUST_FORWARDED_FOR": "true", **overrides}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"{BASE_URL}/health/ping")
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def run(name: str, overrides: dict, rate: int, seconds: float) -> None:
+    server = start_server(overrides)
+    try:
+        results = multiprocessing.Queue()
+        flooders = [
+            multiprocessing.Process(target=flood_process, args=(rate / FLOOD_PROCESSES, seconds, results))
+            for _ in range(FLOOD_PROCESSES)
+        ]
+        for flooder in flooders:
+            flooder.start()
+        latencies, statuses, elapsed = asyncio.run(traffic(seconds))
+        flood_statuses = Counter()
+        for flooder in flooders:
+            flood_statuses.update(results.get())
+        for flooder in flooders:
+            flooder.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_summary(summarize(name, latencies, elapsed))
+    print(f"    payments/dashboards: {statuses}")
+    print(f"    otp flood:           {dict(flood_statuses)}")
+
+
+async def seed() -> None:
+    await connect_to_mongo()
+    await db.customer_vendor_relations.delete_many({"customer_id": CUSTOMER_ID})
+    await db.customer_vendor_relations.insert_one(CustomerVendorRelation.make_relation_doc({
+        "customer_id": CUSTOMER_ID,
+        "customer_phone": "9000000001",
+        "customer_name": "Flood Bench",
+        "vendor_id": VENDOR_ID,
+        "credit_limit": 1_000_000.0,
+    }))
+    close_mongo_connection()
+
+
+def main(rate: int, seconds: float) -> None:
+    asyncio.run(seed())
+    run("admission off", ADMISSION_OFF, rate, seconds)
+    run("admission on", {}, rate, seconds)
+
+
+if __name__ == "__main__":
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    main(rate, seconds)
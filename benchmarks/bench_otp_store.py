@@ -0,0 +1,83 @@
+# benchmarks/bench_otp_store.py
+"""
+Sustained send/verify throughput and memory of the OTP backends.
+
+Each round saves OTPs for a rotating pool of phone numbers and verifies
+half of them, with a short TTL so expiry is exercised. Every second the
+script prints throughput and the number of live entries (plus traced
+memory for the in-process backend), which should level off instead of
+growing.
+
+    python -m benchmarks.bench_otp_store [memory|mongo] [seconds] [phones]
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core.database import db
+from app.services.otp_service import MemoryOTPStore, MongoOTPStore
+
+TTL_SECONDS = 2
+BATCH = 200
+
+
+async def live_entries(store) -> int:
+    if isinstance(store, MemoryOTPStore):
+        return len(store)
+    return await db.otp_codes.count_documents({})
+
+
+async def main(backend: str, seconds: int, phones: int) -> None:
+    if backend == "mongo":
+        store = MongoOTPStore()
+        await db.otp_codes.delete_many({})
+    else:
+        store = MemoryOTPStore(max_entries=phones)
+        tracemalloc.start()
+    await store.start()
+
+    send_latencies, verify_latencies = [], []
+    start = time.perf_counter()
+    next_report = start + 1
+    sequence = 0
+
+    async def send_and_verify(phone: str):
+        otp = str(random.randint(100000, 999999))
+        with Timer(send_latencies):
+            await store.save(phone, otp, TTL_SECONDS)
+        if random.random() < 0.5:
+            with Timer(verify_latencies):
+                await store.consume(phone, otp)
+
+    while time.perf_counter() - start < seconds:
+        await asyncio.gather(*(
+            send_and_verify(f"+91{9000000000 + (sequence + i) % phones}")
+            for i in range(BATCH)
+        ))
+        sequence += BATCH
+
+        now = time.perf_counter()
+        if now >= next_report:
+            line = f"t={now - start:5.1f}s ops={len(send_latencies) + len(verify_latencies):>9} live={await live_entries(store):>8}"
+            if backend != "mongo":
+                current, peak = tracemalloc.get_traced_memory()
+                line += f" mem={current / 1e6:7.2f}MB peak={peak / 1e6:7.2f}MB"
+            print(line)
+            next_report = now + 1
+
+    elapsed = time.perf_counter() - start
+    await store.stop()
+    print_summary(summarize(f"{backend} save", send_latencies, elapsed))
+    print_summary(summarize(f"{backend} consume", verify_latencies, elapsed))
+    if backend == "mongo":
+        await db.otp_codes.delete_many({})
+
+
+if __name__ == "__main__":
+    backend = sys.argv[1] if len(sys.argv) > 1 else "memory"
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    phones = int(sys.argv[3]) if len(sys.argv) > 3 else 500000
+    asyncio.run(main(backend, seconds, phones))
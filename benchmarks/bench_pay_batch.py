@@ -0,0 +1,97 @@
+# benchmarks/bench_pay_batch.py
+"""
+Throughput of batch pay-on-credit against the single-item path.
+
+Uploads ITEMS purchases spread over RELATIONS customers of one vendor,
+first as individual TransactionService.pay_on_credit calls (with the given
+concurrency, like a POS replaying its queue) and then as batches of
+BATCH_SIZE through pay_on_credit_batch.
+
+    python -m benchmarks.bench_pay_batch [items] [relations] [batch_size]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core.database import db
+from app.models.customer_vendor_model import CustomerVendorRelation
+from app.services.transaction_service import TransactionService
+
+VENDOR_ID = "V_BENCH_BATCH"
+CONCURRENCY = 20
+
+
+async def reset(relations: int) -> None:
+    await db.customer_vendor_relations.delete_many({"vendor_id": VENDOR_ID})
+    await db.transactions.delete_many({"vendor_id": VENDOR_ID})
+    await db.customer_vendor_relations.insert_many([
+        CustomerVendorRelation.make_relation_doc({
+            "customer_id": f"CUST_BATCH_{i}",
+            "customer_phone": f"{8000000000 + i}",
+            "customer_name": f"Customer {i}",
+            "vendor_id": VENDOR_ID,
+            "credit_limit": 1_000_000.0,
+        })
+        for i in range(relations)
+    ])
+
+
+def make_items(count: int, relations: int) -> list:
+    return [
+        {
+            "customer_id": f"CUST_BATCH_{random.randrange(relations)}",
+            "vendor_id": VENDOR_ID,
+            "amount": float(random.randint(5, 200)),
+            "description": "POS upload",
+        }
+        for _ in range(count)
+    ]
+
+
+async def run_single(items: list) -> None:
+    latencies = []
+    gate = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(item):
+        async with gate:
+            with Timer(latencies):
+                await TransactionService.pay_on_credit(
+                    item["customer_id"], item["vendor_id"], item["amount"], item["description"]
+                )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    print_summary(summarize("single-item (per item)", latencies, time.perf_counter() - start))
+
+
+async def run_batch(items: list, batch_size: int) -> None:
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(items), batch_size):
+        with Timer(latencies):
+            await TransactionService.pay_on_credit_batch(items[offset:offset + batch_size])
+    elapsed = time.perf_counter() - start
+    print_summary(summarize(f"batch of {batch_size} (per batch)", latencies, elapsed))
+    print(f"    {len(items) / elapsed:,.1f} items/s")
+
+
+async def main(count: int, relations: int, batch_size: int) -> None:
+    items = make_items(count, relations)
+
+    await reset(relations)
+    await run_single(items)
+
+    await reset(relations)
+    await run_batch(items, batch_size)
+
+    await db.customer_vendor_relations.delete_many({"vendor_id": VENDOR_ID})
+    await db.transactions.delete_many({"vendor_id": VENDOR_ID})
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    relations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    asyncio.run(main(count, relations, batch_size))
@@ -0,0 +1,109 @@
+# benchmarks/bench_pay_credit.py
+"""
+Concurrency benchmark for pay-on-credit.
+
+Fires PAYMENTS parallel payments at a single customer-vendor relation whose
+limit only covers half of them, once with the legacy read/insert/update flow
+and once with the guarded debit in TransactionService. Reports latency and
+checks the ledger for overdrafts afterwards.
+
+    python -m benchmarks.bench_pay_credit [payments] [concurrency]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core.database import db
+from app.models.customer_vendor_model import CustomerVendorRelation, Transaction
+from app.services.transaction_service import TransactionService
+
+AMOUNT = 10.0
+CUSTOMER_ID = "CUST_BENCH"
+VENDOR_ID = "V_BENCH"
+
+
+async def legacy_pay(amount: float) -> bool:
+    """The original three round trip flow, kept here for comparison"""
+    relation = await db.customer_vendor_relations.find_one({
+        "customer_id": CUSTOMER_ID,
+        "vendor_id": VENDOR_ID
+    })
+    if amount > relation["available_credit"]:
+        return False
+    await db.transactions.insert_one(Transaction.make_transaction_doc({
+        "customer_id": CUSTOMER_ID,
+        "vendor_id": VENDOR_ID,
+        "amount": amount,
+    }))
+    await db.customer_vendor_relations.update_one(
+        {"_id": relation["_id"]},
+        {"$set": {
+            "used_credit": relation["used_credit"] + amount,
+            "available_credit": relation["available_credit"] - amount,
+            "transaction_count": relation["transaction_count"] + 1,
+            "updated_at": datetime.utcnow(),
+        }}
+    )
+    return True
+
+
+async def atomic_pay(amount: float) -> bool:
+    result = await TransactionService.pay_on_credit(CUSTOMER_ID, VENDOR_ID, amount)
+    return "error" not in result
+
+
+async def reset(credit_limit: float) -> None:
+    await db.customer_vendor_relations.delete_many({"vendor_id": VENDOR_ID})
+    await db.transactions.delete_many({"vendor_id": VENDOR_ID})
+    await db.customer_vendor_relations.insert_one(CustomerVendorRelation.make_relation_doc({
+        "customer_id": CUSTOMER_ID,
+        "customer_phone": "9999999999",
+        "customer_name": "Bench Customer",
+        "vendor_id": VENDOR_ID,
+        "credit_limit": credit_limit,
+    }))
+
+
+async def run(name: str, pay, payments: int, concurrency: int) -> None:
+    credit_limit = AMOUNT * payments / 2
+    await reset(credit_limit)
+
+    latencies = []
+    accepted = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal accepted
+        async with gate:
+            with Timer(latencies):
+                if await pay(AMOUNT):
+                    accepted += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(payments)))
+    print_summary(summarize(name, latencies, time.perf_counter() - start))
+
+    relation = await db.customer_vendor_relations.find_one({"vendor_id": VENDOR_ID})
+    recorded = await db.transactions.count_documents({"vendor_id": VENDOR_ID})
+    ledger_total = recorded * AMOUNT
+    overdraft = ledger_total > credit_limit or relation["available_credit"] < 0
+    print(
+        f"    accepted={accepted} recorded={recorded} ledger=₹{ledger_total:.2f} "
+        f"limit=₹{credit_limit:.2f} used_credit=₹{relation['used_credit']:.2f} "
+        f"overdraft={'YES' if overdraft else 'no'}"
+    )
+
+
+async def main(payments: int, concurrency: int) -> None:
+    await run("legacy (find/insert/update)", legacy_pay, payments, concurrency)
+    await run("guarded debit", atomic_pay, payments, concurrency)
+    await db.customer_vendor_relations.delete_many({"vendor_id": VENDOR_ID})
+    await db.transactions.delete_many({"vendor_id": VENDOR_ID})
+
+
+if __name__ == "__main__":
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    asyncio.run(main(payments, concurrency))
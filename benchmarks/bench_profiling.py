@@ -0,0 +1,70 @@
+# benchmarks/bench_profiling.py
+"""
+Overhead of per-request profiling.
+
+A small Starlette app with one CPU-bound route, so the database plays no
+part, is driven through httpx's ASGI transport three ways:
+
+- bare: no ProfilingMiddleware, which is the production default
+- idle: middleware installed, requests carry no X-Profile header
+- profiled: every request carries a valid X-Profile header
+
+The folded stacks of the last profiled request are printed at the end.
+
+    python -m benchmarks.bench_profiling [requests]
+"""
+import asyncio
+import sys
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core import profiling
+from app.core.config import settings
+
+settings.PROFILE_SECRET = "bench"
+
+
+def busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+async def work(request):
+    return JSONResponse({"total": busy(200000)})
+
+
+def make_app(with_middleware: bool):
+    app = Starlette(routes=[Route("/work", work)])
+    if with_middleware:
+        app.add_middleware(profiling.ProfilingMiddleware)
+    return app
+
+
+async def drive(name: str, app, requests: int, headers: dict) -> None:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        elapsed = []
+        with Timer(elapsed):
+            for _ in range(requests):
+                with Timer(latencies):
+                    (await client.get("/work", headers=headers)).raise_for_status()
+    print_summary(summarize(name, latencies, elapsed[0]))
+
+
+async def main(requests: int) -> None:
+    token = {"X-Profile": profiling.make_token(600)}
+    await drive("bare", make_app(False), requests, {})
+    await drive("idle middleware", make_app(True), requests, {})
+    await drive("profiled", make_app(True), requests, token)
+
+    profile = profiling.profiles[-1]
+    print(f"\nprofile {profile.id}: {profile.summary()}")
+    print(profile.folded())
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
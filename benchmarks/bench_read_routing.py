@@ -0,0 +1,129 @@
+# benchmarks/bench_read_routing.py
+"""
+Primary load removed by routing read-only endpoints to secondaries.
+
+Drives /users/check and /users/dashboard in-process with every endpoint on
+"primary", then with the configured READ_PREFERENCE_* settings, and counts
+the queries the primary served during each run (serverStatus opcounters).
+Then checks read-your-writes: pay-credit followed at once by a dashboard
+read, with and without the X-Consistency-Token from the payment.
+
+Needs a replica set. A single-host one is enough to check correctness
+(every read then lands on the primary); use a set with secondaries to see
+the load move:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGODB_URL="mongodb://localhost:27017/?replicaSet=rs0" \\
+        python -m benchmarks.bench_read_routing [reads] [concurrency]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import Timer, print_summary, summarize
+from app.core import database
+from app.core.database import db, get_client
+from app.main import app
+from app.models.customer_vendor_model import CustomerVendorRelation
+
+VENDOR_ID = "V001"
+CUSTOMERS = 50
+
+
+async def primary_queries() -> int:
+    status = await get_client().admin.command("serverStatus")
+    return status["opcounters"]["query"]
+
+
+async def seed() -> None:
+    await db.customer_vendor_relations.delete_many({"customer_id": {"$regex": "^CUST_BENCH_READ_"}})
+    await db.customer_vendor_relations.insert_many([
+        CustomerVendorRelation.make_relation_doc({
+            "customer_id": f"CUST_BENCH_READ_{i}",
+            "customer_phone": f"90000{i:05d}",
+            "customer_name": "Read Bench",
+            "vendor_id": VENDOR_ID,
+            "credit_limit": 1_000_000.0,
+        })
+        for i in range(CUSTOMERS)
+    ])
+
+
+def use_preferences(preferences: dict) -> None:
+    database.READ_PREFERENCES.update(preferences)
+    database._readers.clear()
+
+
+async def read_load(client: httpx.AsyncClient, name: str, reads: int, concurrency: int) -> None:
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with gate:
+            with Timer(latencies):
+                if i % 2:
+                    await client.post("/users/check", json={
+                        "phone_number": f"90000{i % CUSTOMERS:05d}", "vendor_id": VENDOR_ID
+                    })
+                else:
+                    await client.post("/users/dashboard", json={
+                        "customer_id": f"CUST_BENCH_READ_{i % CUSTOMERS}", "vendor_id": VENDOR_ID
+                    })
+
+    before = await primary_queries()
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(reads)])
+    elapsed = time.perf_counter() - start
+    on_primary = await primary_queries() - before
+
+    print_summary(summarize(name, latencies, elapsed))
+    print(f"    primary served {on_primary} queries for {reads} reads ({on_primary / reads:.0%})")
+
+
+async def read_your_writes(client: httpx.AsyncClient, use_token: bool, rounds: int) -> None:
+    fresh = 0
+    for i in range(rounds):
+        customer_id = f"CUST_BENCH_READ_{i % CUSTOMERS}"
+        paid = await client.post("/users/pay-credit", json={
+            "customer_id": customer_id, "vendor_id": VENDOR_ID, "amount": 1.0
+        })
+        headers = {}
+        token = paid.headers.get("X-Consistency-Token")
+        if use_token and token:
+            headers["X-Consistency-Token"] = token
+        dashboard = await client.post(
+            "/users/dashboard", json={"customer_id": customer_id, "vendor_id": VENDOR_ID},
+            headers=headers
+        )
+        if dashboard.json()["available_credit"] == paid.json()["new_balance"]:
+            fresh += 1
+    label = "with token" if use_token else "without token"
+    print(f"read-your-writes {label:<14} {fresh}/{rounds} dashboards showed the payment")
+
+
+async def main(reads: int, concurrency: int) -> None:
+    configured = dict(database.READ_PREFERENCES)
+    async with app.router.lifespan_context(app):
+        await seed()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            use_preferences({endpoint: "primary" for endpoint in configured})
+            await read_load(client, "all reads on primary", reads, concurrency)
+
+            use_preferences(configured)
+            await read_load(client, "routed reads", reads, concurrency)
+
+            await read_your_writes(client, use_token=False, rounds=200)
+            await read_your_writes(client, use_token=True, rounds=200)
+
+        await db.customer_vendor_relations.delete_many({"customer_id": {"$regex": "^CUST_BENCH_READ_"}})
+        await db.transactions.delete_many({"customer_id": {"$regex": "^CUST_BENCH_READ_"}})
+
+
+if __name__ == "__main__":
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(reads, concurrency))
@@ -0,0 +1,63 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks talk to a real mongod. They default to a local server and a
+throwaway database so they never touch production data:
+
+    MONGODB_URL=mongodb://localhost:27017 MONGODB_DB=paynaka_bench \\
+        python -m benchmarks.bench_pay_credit
+
+Benchmarks that exercise HTTP routes drive the app in-process through
+httpx's ASGI transport (pip install httpx).
+"""
+import os
+import time
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DB", "paynaka_bench")
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: list, elapsed: float) -> dict:
+    """Latency percentiles (ms) and throughput for one benchmark run"""
+    count = len(latencies)
+    return {
+        "name": name,
+        "count": count,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print(
+        f"{summary['name']:<28} n={summary['count']:<7} "
+        f"p50={summary['p50_ms']:>9.3f}ms p95={summary['p95_ms']:>9.3f}ms "
+        f"p99={summary['p99_ms']:>9.3f}ms  {summary['throughput_rps']:>10.1f} req/s"
+    )
+
+
+class Timer:
+    """Context manager recording wall time into a list"""
+
+    def __init__(self, sink: list):
+        self.sink = sink
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.sink.append(time.perf_counter() - self.start)
+        return False
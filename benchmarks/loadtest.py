@@ -0,0 +1,215 @@
+# benchmarks/loadtest.py
+"""
+End-to-end load test of the customer credit journey.
+
+Every virtual user walks the real flow against the FastAPI app (in-process,
+through httpx's ASGI transport) and a local mongod:
+
+    scan -> check -> send-otp -> register -> pay-credit -> dashboard
+
+Before the run the vendor is padded with --relations existing customers so
+lookups hit realistically sized indexes. The report gives p50/p95/p99 and
+throughput per route. Results can be saved as a baseline and later runs
+compared against it; the run exits non-zero on a regression.
+
+    python -m benchmarks.loadtest --users 2000 --concurrency 100 --relations 1000000
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json --tolerance 0.2
+
+Every virtual user connects from 127.0.0.1, so the per-IP rate limits would
+turn the run into 429s after the 30th send-otp. They are off unless set in
+the environment; bench_otp_flood is the benchmark for them.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+import httpx
+
+# Before the app is imported: settings are read at import time
+for name in ("RATE_LIMIT_SEND_OTP_PHONE", "RATE_LIMIT_SEND_OTP_IP", "RATE_LIMIT_VERIFY_OTP_PHONE",
+             "RATE_LIMIT_VERIFY_OTP_IP", "RATE_LIMIT_PAY_CREDIT_IP"):
+    os.environ.setdefault(name, "")
+
+from benchmarks.common import percentile, print_summary
+from app.core.database import db
+from app.main import app
+from app.models.customer_vendor_model import CustomerVendorRelation
+from app.services.otp_service import otp_store
+
+VENDOR_ID = "V001"
+SEED_PHONE_BASE = 7000000000
+USER_PHONE_BASE = 6000000000
+SEED_BATCH = 10000
+
+ROUTES = ["scan", "check", "send-otp", "register", "pay-credit", "dashboard"]
+
+
+async def seed_relations(count: int) -> None:
+    """Pad the vendor with `count` pre-existing customers (idempotent)"""
+    existing = await db.customer_vendor_relations.count_documents(
+        {"vendor_id": VENDOR_ID, "customer_id": {"$regex": "^LOAD_SEED_"}}
+    )
+    for start in range(existing, count, SEED_BATCH):
+        await db.customer_vendor_relations.insert_many([
+            CustomerVendorRelation.make_relation_doc({
+                "customer_id": f"LOAD_SEED_{i}",
+                "customer_phone": str(SEED_PHONE_BASE + i),
+                "customer_name": f"Seed Customer {i}",
+                "vendor_id": VENDOR_ID,
+            })
+            for i in range(start, min(start + SEED_BATCH, count))
+        ], ordered=False)
+        print(f"  seeded {min(start + SEED_BATCH, count):,}/{count:,} relations", file=sys.stderr)
+
+
+async def cleanup_journeys() -> None:
+    await db.customer_vendor_relations.delete_many(
+        {"vendor_id": VENDOR_ID, "customer_phone": {"$regex": "^6"}}
+    )
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+
+    async def call(self, route: str, request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+async def journey(client: httpx.AsyncClient, recorder: Recorder, user: int) -> None:
+    phone = str(USER_PHONE_BASE + user)
+
+    await recorder.call("scan", client.get(f"/users/scan/{VENDOR_ID}"))
+    await recorder.call("check", client.post(
+        "/users/check", json={"phone_number": phone, "vendor_id": VENDOR_ID}
+    ))
+    await recorder.call("send-otp", client.post("/users/send-otp", json={"phone_number": phone}))
+
+    otp = await otp_store.get(phone)
+    response = await recorder.call("register", client.post("/users/register", json={
+        "phone_number": phone, "name": f"Load User {user}", "vendor_id": VENDOR_ID, "otp": otp
+    }))
+    if response.status_code != 200:
+        return
+    customer_id = response.json()["customer_id"]
+
+    await recorder.call("pay-credit", client.post("/users/pay-credit", json={
+        "customer_id": customer_id, "vendor_id": VENDOR_ID, "amount": 25.0
+    }))
+    await recorder.call("dashboard", client.post(
+        "/users/dashboard", json={"customer_id": customer_id, "vendor_id": VENDOR_ID}
+    ))
+
+
+async def run(users: int, concurrency: int, relations: int) -> dict:
+    async with app.router.lifespan_context(app):
+        await seed_relations(relations)
+        await cleanup_journeys()
+
+        recorder = Recorder()
+        gate = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+
+        async def one(user: int):
+            async with gate:
+                await journey(client, recorder, user)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            start = time.perf_counter()
+            # The OTP route prints every code; keep the report readable
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                await asyncio.gather(*(one(user) for user in range(users)))
+            elapsed = time.perf_counter() - start
+
+        await cleanup_journeys()
+
+    results = {}
+    for route in ROUTES:
+        samples = recorder.latencies[route]
+        results[route] = {
+            "name": route,
+            "count": len(samples),
+            "errors": recorder.errors[route],
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "throughput_rps": round(len(samples) / elapsed, 1),
+        }
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "relations": relations,
+        "elapsed_s": round(elapsed, 3),
+        "journeys_per_s": round(users / elapsed, 1),
+        "routes": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Routes whose p95 or throughput regressed beyond tolerance"""
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline["routes"].get(route)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{route}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{route}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500, help="journeys to run")
+    parser.add_argument("--concurrency", type=int, default=50, help="journeys in flight")
+    parser.add_argument("--relations", type=int, default=10000, help="pre-existing relations to seed")
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio")
+    parser.add_argument("--save-baseline", help="write this run's results to a baseline file")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.users, args.concurrency, args.relations))
+
+    for route in ROUTES:
+        print_summary(report["routes"][route])
+        if report["routes"][route]["errors"]:
+            print(f"    errors={report['routes'][route]['errors']}")
+    print(f"{report['journeys_per_s']} journeys/s over {report['elapsed_s']}s")
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("no regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())